@@ -1,14 +1,40 @@
+import os
 from flask import Flask, render_template, jsonify
 from flask_sqlalchemy import SQLAlchemy
 from flask_jwt_extended import JWTManager, jwt_required, get_jwt_identity
 from flask_migrate import Migrate
 from flask_cors import CORS
 from app.config import Config
+from app.jobs import JobQueue
+from app.gemini import ModelRegistry
+from app.cache import ResponseCache
+from app.semantic_cache import SemanticCache
+from app.ratelimit import RateLimiter
+from app.singleflight import SingleFlight
+from app.router import ModelRouter
+from app.utils import setup_logging
+from app.passwords import PasswordHasher
+from app.identity import UserCache
+from app.profiling import RequestProfiler
+
+# Migraciones de Alembic, sin depender del directorio de trabajo
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'migrations')
 
 # Inicialización de extensiones
 db = SQLAlchemy()
 jwt = JWTManager()
 migrate = Migrate()
+job_queue = JobQueue()
+model_registry = ModelRegistry()
+response_cache = ResponseCache('RESPONSE_CACHE')
+title_cache = ResponseCache('TITLE_CACHE')
+semantic_cache = SemanticCache()
+rate_limiter = RateLimiter()
+single_flight = SingleFlight()
+model_router = ModelRouter()
+password_hasher = PasswordHasher()
+user_cache = UserCache()
+request_profiler = RequestProfiler()
 
 def create_app(config_class=Config):
     """Factory pattern para crear la aplicación Flask"""
@@ -17,24 +43,72 @@ def create_app(config_class=Config):
     
     # Inicializar extensiones
     db.init_app(app)
+    # PRAGMA por conexión (SQLite); importado aquí porque usa ``db``
+    from app.database import configure_engine
+    configure_engine(app)
+    # Métricas de Prometheus (/metrics); importado aquí por la misma razón
+    from app.metrics import init_metrics
+    init_metrics(app)
     jwt.init_app(app)
-    migrate.init_app(app, db)
+    user_cache.init_app(app)
+    # Cada token se comprueba contra la caché de usuarios (activo y versión)
+    jwt.token_in_blocklist_loader(user_cache.token_revoked)
+    migrate.init_app(app, db, directory=MIGRATIONS_DIR)
+    job_queue.init_app(app)
+    model_registry.init_app(app)
+    response_cache.init_app(app)
+    title_cache.init_app(app)
+    semantic_cache.init_app(app)
+    rate_limiter.init_app(app)
+    single_flight.init_app(app)
+    model_router.init_app(app)
+    password_hasher.init_app(app)
+    # Perfilado por muestreo (opcional, PROFILE_ENABLED)
+    request_profiler.init_app(app)
     CORS(app)
+    setup_logging(app)
     
     # Ruta principal
     @app.route('/')
     def index():
         return render_template('index.html')
     
+    @app.route('/api/models')
+    def list_models():
+        """Modelos de Gemini disponibles con su latencia reciente"""
+        models = model_router.describe()
+        return jsonify({
+            'available_models': [model['name'] for model in models],
+            'default_model': app.config['GEMINI_DEFAULT_MODEL'],
+            'models': models,
+            'total': len(models)
+        }), 200
+    
+    @app.route('/api/status')
+    @jwt_required(optional=True)
+    def status():
+        """Estado de la API (un token inválido o caducado devuelve 401)"""
+        return jsonify({
+            'status': 'ok',
+            'gemini_configured': bool(app.config.get('GEMINI_API_KEY') or app.config.get('GEMINI_FAKE_MODEL')),
+            'available_models': model_router.models,
+            'authenticated': get_jwt_identity() is not None
+        }), 200
+    
     
     # Registrar blueprints
     from app.routes.auth import auth_bp
     from app.routes.chat import chat_bp
+    from app.routes.admin import admin_bp
     
     app.register_blueprint(auth_bp, url_prefix='/api/auth')
     app.register_blueprint(chat_bp, url_prefix='/api/chat')
+    app.register_blueprint(admin_bp, url_prefix='/api/admin')
     
     # Importar modelos para que Flask-Migrate los detecte
     from app import models
     
+    # Registrar los manejadores de trabajos en segundo plano
+    from app import tasks
+    
     return app 
\ No newline at end of file
@@ -0,0 +1,214 @@
+"""Archivo de conversaciones inactivas
+
+Las conversaciones sin actividad desde hace ``ARCHIVE_AFTER_DAYS`` días pasan
+sus mensajes a ``conversation_archives`` (una fila por conversación con los
+mensajes en JSON comprimido) y salen de ``messages``, que se mantiene pequeña.
+El listado no cambia: el contador y la vista previa siguen en la conversación.
+
+Se archiva por lotes de ``ARCHIVE_BATCH_SIZE`` conversaciones, cada uno en
+una transacción corta. Al leer o escribir en una conversación archivada, sus
+mensajes vuelven a ``messages`` (``restore_conversation``). Mientras están
+archivados no aparecen en la búsqueda.
+"""
+import json
+import time
+import zlib
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy import delete, insert, select, update
+from app import db
+from app.models import Conversation, ConversationArchive, Message
+
+# Ids por sentencia DELETE ... IN
+DELETE_CHUNK = 500
+
+def pack_messages(rows):
+    """Comprimir una lista de mensajes (id, rol, contenido, fecha)"""
+    data = [
+        [row.id, row.role, row.content, row.timestamp.isoformat() if row.timestamp else None]
+        for row in rows
+    ]
+    level = current_app.config['ARCHIVE_COMPRESSION_LEVEL']
+    return zlib.compress(json.dumps(data, ensure_ascii=False).encode('utf-8'), level)
+
+def unpack_messages(data):
+    """Lista de diccionarios con los mensajes de un archivo"""
+    return [
+        {
+            'id': message_id,
+            'role': role,
+            'content': content,
+            'timestamp': datetime.fromisoformat(timestamp) if timestamp else None
+        }
+        for message_id, role, content, timestamp in json.loads(zlib.decompress(data))
+    ]
+
+def archive_batch(cutoff, batch_size):
+    """Archivar hasta ``batch_size`` conversaciones inactivas en una transacción
+
+    Devuelve (conversaciones, mensajes) archivados.
+    """
+    conversations, messages = Conversation.__table__, Message.__table__
+    archives = ConversationArchive.__table__
+
+    inactive = (
+        conversations.c.archived_at.is_(None),
+        conversations.c.updated_at < cutoff,
+        conversations.c.message_count > 0
+    )
+    ids = db.session.execute(
+        select(conversations.c.id).where(*inactive).order_by(conversations.c.id).limit(batch_size)
+    ).scalars().all()
+    if not ids:
+        return 0, 0
+
+    # Marcar primero (la escritura toma el bloqueo): solo se archivan las que
+    # siguen inactivas; updated_at se conserva para no disparar su onupdate
+    now = datetime.utcnow()
+    claimed = db.session.execute(
+        update(conversations)
+        .where(conversations.c.id.in_(ids), *inactive)
+        .values(archived_at=now, updated_at=conversations.c.updated_at)
+        .returning(conversations.c.id)
+    ).scalars().all()
+    if not claimed:
+        db.session.rollback()
+        return 0, 0
+
+    rows = db.session.execute(
+        select(messages.c.id, messages.c.conversation_id, messages.c.role, messages.c.content, messages.c.timestamp)
+        .where(messages.c.conversation_id.in_(claimed))
+        .order_by(messages.c.conversation_id, messages.c.timestamp, messages.c.id)
+    ).all()
+
+    grouped = {}
+    for row in rows:
+        grouped.setdefault(row.conversation_id, []).append(row)
+
+    db.session.execute(insert(archives), [
+        {
+            'conversation_id': conversation_id,
+            'data': pack_messages(conversation_rows),
+            'message_count': len(conversation_rows),
+            'archived_at': now
+        }
+        for conversation_id, conversation_rows in grouped.items()
+    ])
+
+    # Borrar exactamente los mensajes archivados: uno que llegue mientras
+    # tanto se queda en messages y se junta con el archivo al restaurar
+    message_ids = [row.id for row in rows]
+    for start in range(0, len(message_ids), DELETE_CHUNK):
+        db.session.execute(delete(messages).where(messages.c.id.in_(message_ids[start:start + DELETE_CHUNK])))
+
+    db.session.commit()
+    return len(claimed), len(rows)
+
+def archive_conversations(days=None, batch_size=None, limit=None, pause=0.0):
+    """Archivar las conversaciones inactivas por lotes; devuelve los totales
+
+    ``limit`` acota el número de conversaciones de esta ejecución y ``pause``
+    deja unos segundos libres entre lotes para las peticiones en curso.
+    """
+    config = current_app.config
+    days = config['ARCHIVE_AFTER_DAYS'] if days is None else days
+    batch_size = batch_size or config['ARCHIVE_BATCH_SIZE']
+    cutoff = datetime.utcnow() - timedelta(days=days)
+
+    totals = {'conversations': 0, 'messages': 0, 'batches': 0}
+    while limit is None or totals['conversations'] < limit:
+        size = batch_size if limit is None else min(batch_size, limit - totals['conversations'])
+        archived, message_count = archive_batch(cutoff, size)
+        if not archived:
+            break
+        totals['conversations'] += archived
+        totals['messages'] += message_count
+        totals['batches'] += 1
+        if pause:
+            time.sleep(pause)
+    return totals
+
+def restore_conversation(conversation):
+    """Devolver a ``messages`` los mensajes de una conversación archivada
+
+    No hace nada si no está archivada. Los mensajes reciben ids nuevos (en
+    orden cronológico, junto con los que llegaran tras archivarla) y el límite
+    del resumen se traslada al id nuevo. Devuelve True si se restauró.
+    """
+    if conversation.archived_at is None:
+        return False
+
+    conversations, messages = Conversation.__table__, Message.__table__
+    archives = ConversationArchive.__table__
+
+    # Solo una petición restaura; las demás esperan su commit y continúan
+    claimed = db.session.execute(
+        update(conversations)
+        .where(conversations.c.id == conversation.id, conversations.c.archived_at.isnot(None))
+        .values(archived_at=None, updated_at=conversations.c.updated_at)
+    ).rowcount
+    if not claimed:
+        db.session.commit()
+        return False
+
+    data = db.session.execute(
+        select(archives.c.data).where(archives.c.conversation_id == conversation.id)
+    ).scalar()
+    rows = unpack_messages(data) if data is not None else []
+
+    hot = db.session.execute(
+        select(messages.c.id, messages.c.role, messages.c.content, messages.c.timestamp)
+        .where(messages.c.conversation_id == conversation.id)
+        .order_by(messages.c.timestamp, messages.c.id)
+    ).all()
+    if hot:
+        rows += [dict(row._mapping) for row in hot]
+        db.session.execute(delete(messages).where(messages.c.conversation_id == conversation.id))
+
+    # Último mensaje cubierto por el resumen (ids antiguos, comparables entre sí)
+    until = conversation.summary_until_id or 0
+    boundary = None
+    for index, row in enumerate(rows):
+        if row['id'] <= until:
+            boundary = index
+
+    new_rows = [
+        {
+            'conversation_id': conversation.id,
+            'role': row['role'],
+            'content': row['content'],
+            'timestamp': row['timestamp'] or datetime.utcnow()
+        }
+        for row in rows
+    ]
+
+    # Inserción en orden; el mensaje límite aparte para conocer su id nuevo
+    summary_until_id = 0
+    if boundary is None:
+        if new_rows:
+            db.session.execute(insert(messages), new_rows)
+    else:
+        if new_rows[:boundary]:
+            db.session.execute(insert(messages), new_rows[:boundary])
+        summary_until_id = db.session.execute(
+            insert(messages).values(**new_rows[boundary]).returning(messages.c.id)
+        ).scalar_one()
+        if new_rows[boundary + 1:]:
+            db.session.execute(insert(messages), new_rows[boundary + 1:])
+
+    db.session.execute(
+        update(conversations)
+        .where(conversations.c.id == conversation.id)
+        .values(summary_until_id=summary_until_id, updated_at=conversations.c.updated_at)
+    )
+    db.session.execute(delete(archives).where(archives.c.conversation_id == conversation.id))
+    db.session.commit()
+    return True
+
+def archived_messages(conversation_id):
+    """Mensajes archivados de una conversación (sin restaurarla)"""
+    data = db.session.execute(
+        select(ConversationArchive.__table__.c.data)
+        .where(ConversationArchive.__table__.c.conversation_id == conversation_id)
+    ).scalar()
+    return unpack_messages(data) if data is not None else []
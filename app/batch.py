@@ -0,0 +1,296 @@
+import json
+import time
+from collections import OrderedDict
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import datetime
+from flask import current_app
+from sqlalchemy import bindparam, insert, update
+from app import db, response_cache, single_flight, model_router, rate_limiter
+from app.archive import restore_conversation
+from app.context import finish_context, prepare_context
+from app.models import Conversation, Message, PREVIEW_LENGTH
+from app.ratelimit import RateLimitExceeded
+from app.resilience import UpstreamError
+from app.tasks import fallback_title
+from app.utils import get_gemini_model
+
+class _Task:
+    """Un elemento del lote ya preparado para llamar a Gemini"""
+
+    def __init__(self, index, item, conversation_id, prompt, candidates):
+        self.index = index
+        self.ref = item.get('ref')
+        self.content = item['content']
+        self.conversation_id = conversation_id
+        self.prompt = prompt
+        self.candidates = candidates
+        self.cache_key = response_cache.make_key(candidates[0], prompt)
+        self.user_message_id = None
+
+def _error(index, item, message, code, conversation_id=None):
+    return {
+        'index': index,
+        'ref': item.get('ref'),
+        'conversation_id': conversation_id or item.get('conversation_id'),
+        'status': 'error',
+        'code': code,
+        'error': message
+    }
+
+def _task_error(task, message, code):
+    """Error de un elemento cuyo turno del usuario ya está guardado"""
+    result = _error(task.index, {'ref': task.ref}, message, code, task.conversation_id)
+    result['user_message_id'] = task.user_message_id
+    return result
+
+def _rate_limited(index, item, error, conversation_id=None):
+    result = _error(index, item, 'Too many requests, please try again later', 429, conversation_id)
+    result['retry_after'] = round(error.retry_after, 1)
+    return result
+
+def _load_conversations(user_id, items, indexes):
+    """Conversaciones de los elementos ``indexes`` en una consulta; las nuevas se crean de una vez"""
+    ids = {items[index]['conversation_id'] for index in indexes if items[index].get('conversation_id')}
+    conversations = {}
+    if ids:
+        for conversation in Conversation.query.filter(
+            Conversation.user_id == user_id, Conversation.id.in_(ids)
+        ):
+            conversations[conversation.id] = conversation
+
+    created = {}
+    for index in indexes:
+        item = items[index]
+        if not item.get('conversation_id'):
+            created[index] = Conversation(
+                user_id=user_id,
+                title=fallback_title(item['content']),
+                model=item.get('model')
+            )
+    db.session.add_all(created.values())
+    db.session.flush()
+    return conversations, created
+
+def _prepare(user_id, items):
+    """Validar cada elemento, construir su prompt y guardar los turnos del usuario
+
+    Devuelve (tareas, respuestas en caché, errores).
+    """
+    tasks, cached, errors = [], [], []
+
+    # Cada elemento cuenta como una petición, como si se enviara por separado.
+    # Se descuenta antes de crear conversaciones para no dejar vacías las de
+    # los elementos rechazados
+    indexes = []
+    for index, item in enumerate(items):
+        try:
+            rate_limiter.check(user_id, 'requests')
+            indexes.append(index)
+        except RateLimitExceeded as e:
+            errors.append(_rate_limited(index, item, e))
+
+    conversations, created = _load_conversations(user_id, items, indexes)
+
+    for index in indexes:
+        item = items[index]
+        conversation = created.get(index) or conversations.get(item.get('conversation_id'))
+        if conversation is None:
+            errors.append(_error(index, item, 'Conversation not found', 404))
+            continue
+
+        restore_conversation(conversation)
+
+        requested = item.get('model') or conversation.model
+        if requested and not model_router.is_available(requested):
+            errors.append(_error(index, item, f'Unknown model: {requested}', 400, conversation.id))
+            continue
+
+        # Todos los elementos de una conversación parten del contexto previo al lote
+        draft = prepare_context(conversation, item['content'])
+        try:
+            # Como en send_message: si hay que resumir, la cuota se comprueba antes
+            tokens_checked = draft['needs_summary']
+            if tokens_checked:
+                rate_limiter.check(user_id, 'tokens', rate_limiter.estimate_tokens(draft['prompt']))
+            prompt = finish_context(draft, get_gemini_model(requested))
+            task = _Task(index, item, draft['conversation_id'], prompt, model_router.candidates(requested, len(prompt)))
+
+            cached_text = response_cache.get(task.cache_key)
+            if cached_text is not None:
+                cached.append((task, cached_text, task.candidates[0], True))
+                continue
+
+            if not tokens_checked:
+                rate_limiter.check(user_id, 'tokens', rate_limiter.estimate_tokens(prompt))
+        except RateLimitExceeded as e:
+            errors.append(_rate_limited(index, item, e, draft['conversation_id']))
+            continue
+
+        tasks.append(task)
+
+    # Con los turnos del usuario se guardan también las conversaciones nuevas
+    _save_user_messages(sorted(tasks + [task for task, _, _, _ in cached], key=lambda task: task.index))
+    return tasks, cached, errors
+
+def _call_gemini(task):
+    """Ejecutado en el pool: llamada a Gemini (unificada con peticiones idénticas)"""
+    used = {}
+
+    def call():
+        used['model'], response = model_router.generate_content(task.candidates, task.prompt)
+        return response.text
+
+    text, _ = single_flight.do(task.cache_key, call)
+    if not text or not text.strip():
+        raise ValueError('Empty response from Gemini AI')
+    return text, used.get('model', task.candidates[0])
+
+def _update_conversations(per_conversation, now):
+    """Contador y vista previa: una sentencia con los parámetros de todas las conversaciones"""
+    conversations = Conversation.__table__
+    db.session.connection().execute(
+        update(conversations)
+        .where(conversations.c.id == bindparam('conversation_id'))
+        .values(
+            message_count=conversations.c.message_count + bindparam('added'),
+            last_message_preview=bindparam('preview'),
+            updated_at=bindparam('now')
+        ),
+        [
+            {'conversation_id': conversation_id, 'added': added, 'preview': preview, 'now': now}
+            for conversation_id, (added, preview) in per_conversation.items()
+        ]
+    )
+
+def _insert_messages(tasks, contents, role, now):
+    """Insertar un mensaje por tarea y actualizar sus conversaciones; devuelve los ids"""
+    ids = db.session.scalars(
+        insert(Message).returning(Message.id, sort_by_parameter_order=True),
+        [
+            {'conversation_id': task.conversation_id, 'content': content, 'role': role, 'timestamp': now}
+            for task, content in zip(tasks, contents)
+        ]
+    ).all()
+
+    per_conversation = OrderedDict()
+    for task, content in zip(tasks, contents):
+        count, _ = per_conversation.get(task.conversation_id, (0, None))
+        per_conversation[task.conversation_id] = (count + 1, content[:PREVIEW_LENGTH])
+    _update_conversations(per_conversation, now)
+    return ids
+
+def _save_user_messages(tasks):
+    """Guardar los turnos del usuario de todo el lote en un commit, antes de llamar a Gemini
+
+    Como ``_save_user_message`` en las rutas de chat: si la llamada de un
+    elemento falla, su mensaje queda guardado, y durante las llamadas no hay
+    ninguna transacción abierta.
+    """
+    if tasks:
+        ids = _insert_messages(tasks, [task.content for task in tasks], 'user', datetime.utcnow())
+        for task, message_id in zip(tasks, ids):
+            task.user_message_id = message_id
+    db.session.commit()
+
+def _write(completed):
+    """Insertar las respuestas de varios elementos y actualizar sus conversaciones en un commit
+
+    Si la escritura falla, cada elemento se entrega como una línea de error
+    y el lote continúa.
+    """
+    try:
+        ids = _insert_messages(
+            [task for task, _, _, _ in completed], [text for _, text, _, _ in completed], 'assistant', datetime.utcnow()
+        )
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        current_app.logger.error(f"Error guardando respuestas del lote: {e}")
+        for task, _, _, _ in completed:
+            yield _task_error(task, 'Error saving response', 500)
+        return
+
+    for (task, text, model_name, was_cached), ai_message_id in zip(completed, ids):
+        if not was_cached:
+            response_cache.set(task.cache_key, text)
+        yield {
+            'index': task.index,
+            'ref': task.ref,
+            'conversation_id': task.conversation_id,
+            'status': 'ok',
+            'model': model_name,
+            'cached': was_cached,
+            'user_message_id': task.user_message_id,
+            'ai_message_id': ai_message_id,
+            'content': text
+        }
+
+def run_batch(user_id, items, concurrency=None):
+    """Preparar un lote de prompts y devolver un generador con un resultado por elemento
+
+    La validación, los prompts y los turnos del usuario se resuelven aquí,
+    antes de empezar a responder: un fallo en esta fase llega como una
+    respuesta de error normal, no como un stream cortado tras el 200. Después
+    las llamadas a Gemini se ejecutan en un pool de ``BATCH_CONCURRENCY``
+    hilos. Las respuestas se insertan en bloque cada ``BATCH_WRITE_SIZE``
+    (o cada ``BATCH_FLUSH_INTERVAL`` segundos) y sus resultados se entregan
+    al confirmar cada escritura. El orden de los resultados es el de
+    finalización; ``index`` indica la posición en el lote. Los fallos de un
+    elemento (Gemini o escritura) son líneas con ``status: error``.
+    """
+    concurrency = concurrency or current_app.config['BATCH_CONCURRENCY']
+    tasks, completed, errors = _prepare(user_id, items)
+    return _results(tasks, completed, errors, concurrency)
+
+def _results(tasks, completed, errors, concurrency):
+    config = current_app.config
+    write_size = config['BATCH_WRITE_SIZE']
+    flush_interval = config['BATCH_FLUSH_INTERVAL']
+
+    yield from errors
+
+    executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='batch')
+    try:
+        pending = {executor.submit(_call_gemini, task): task for task in tasks}
+        last_flush = time.monotonic()
+
+        while pending or completed:
+            if pending:
+                done, _ = wait(pending, timeout=flush_interval, return_when=FIRST_COMPLETED)
+                for future in done:
+                    task = pending.pop(future)
+                    try:
+                        text, model_name = future.result()
+                        completed.append((task, text, model_name, False))
+                    except Exception as e:
+                        current_app.logger.error(f"Error en lote (elemento {task.index}): {e}")
+                        # Gemini caído o lento se comunica como 503/504; el resto, sin detalles
+                        if isinstance(e, UpstreamError):
+                            code, message = e.code, str(e)
+                        else:
+                            code, message = 500, 'Error generating response'
+                        yield _task_error(task, message, code)
+
+            due = not pending or len(completed) >= write_size or time.monotonic() - last_flush >= flush_interval
+            if completed and due:
+                yield from _write(completed)
+                completed = []
+                last_flush = time.monotonic()
+    finally:
+        # Si el cliente se desconecta, descartar las llamadas que aún no empezaron
+        executor.shutdown(wait=False, cancel_futures=True)
+
+def ndjson_lines(results):
+    """Serializar resultados como NDJSON, con una línea final de resumen"""
+    started = time.monotonic()
+    counts = {'ok': 0, 'error': 0}
+    for result in results:
+        counts[result['status']] += 1
+        yield json.dumps(result, ensure_ascii=False) + '\n'
+
+    yield json.dumps({
+        'done': True,
+        'ok': counts['ok'],
+        'errors': counts['error'],
+        'elapsed_ms': round((time.monotonic() - started) * 1000)
+    }) + '\n'
@@ -0,0 +1,224 @@
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from app.metrics import count_event
+
+def normalize_text(text):
+    """Normalizar texto para la clave de caché: solo se colapsan los espacios
+
+    Las mayúsculas se conservan: cambian el significado (``myVar`` y ``myvar``
+    son variables distintas) y la respuesta puede depender de ellas.
+    """
+    return re.sub(r'\s+', ' ', text).strip()
+
+class MemoryCacheTier:
+    """Caché LRU en memoria del proceso con caducidad (TTL)"""
+
+    def __init__(self, max_entries, ttl):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (value, time.monotonic() + self.ttl)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+class SQLiteCacheTier:
+    """Caché en disco (SQLite) compartida entre los workers de gunicorn
+
+    Cada hilo abre su propia conexión al mismo fichero; el modo WAL permite
+    lecturas concurrentes mientras otro proceso escribe.
+    """
+
+    PRUNE_EVERY = 500
+
+    def __init__(self, path, table, max_entries, ttl):
+        self.path = path
+        self.table = f'cache_{table}'
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._local = threading.local()
+        self._writes = 0
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._connection().execute(
+            f'CREATE TABLE IF NOT EXISTS {self.table} ('
+            'key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL, created_at REAL NOT NULL)'
+        )
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def get(self, key):
+        row = self._connection().execute(
+            f'SELECT value FROM {self.table} WHERE key = ? AND expires_at > ?', (key, time.time())
+        ).fetchone()
+        return row[0] if row else None
+
+    def set(self, key, value):
+        now = time.time()
+        conn = self._connection()
+        conn.execute(
+            f'INSERT OR REPLACE INTO {self.table} (key, value, expires_at, created_at) VALUES (?, ?, ?, ?)',
+            (key, value, now + self.ttl, now)
+        )
+
+        self._writes += 1
+        if self._writes % self.PRUNE_EVERY == 0:
+            self.prune(conn)
+
+    def prune(self, conn=None):
+        """Eliminar entradas caducadas y las más antiguas por encima del límite"""
+        conn = conn or self._connection()
+        conn.execute(f'DELETE FROM {self.table} WHERE expires_at <= ?', (time.time(),))
+        conn.execute(
+            f'DELETE FROM {self.table} WHERE key IN ('
+            f'SELECT key FROM {self.table} ORDER BY created_at DESC LIMIT -1 OFFSET ?)',
+            (self.max_entries,)
+        )
+
+    def clear(self):
+        self._connection().execute(f'DELETE FROM {self.table}')
+
+class ResponseCache:
+    """Caché opcional de respuestas de Gemini para prompts idénticos
+
+    La clave es un hash de (modelo, prompt normalizado), donde el prompt ya
+    incluye el contexto de la conversación. Hay un nivel LRU en memoria y,
+    si se configura ``<PREFIJO>_DB_PATH``, un nivel SQLite compartido entre
+    procesos. Toda la configuración se lee con el prefijo indicado (por
+    ejemplo ``RESPONSE_CACHE_ENABLED`` o ``TITLE_CACHE_TTL``).
+    """
+
+    def __init__(self, config_prefix, app=None):
+        self.config_prefix = config_prefix
+        self.namespace = config_prefix.lower()
+        self.enabled = False
+        self.memory = None
+        self.disk = None
+        self._stats_lock = threading.Lock()
+        self.reset_stats()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        config = app.config
+        prefix = self.config_prefix
+
+        self.enabled = config.get(f'{prefix}_ENABLED', False)
+        max_entries = config.get(f'{prefix}_MAX_ENTRIES', 1000)
+        ttl = config.get(f'{prefix}_TTL', 3600)
+
+        self.memory = MemoryCacheTier(max_entries, ttl)
+        self.disk = None
+        db_path = config.get(f'{prefix}_DB_PATH')
+        if self.enabled and db_path:
+            self.disk = SQLiteCacheTier(db_path, self.namespace, config.get(f'{prefix}_DB_MAX_ENTRIES', 100000), ttl)
+
+        app.extensions[self.namespace] = self
+
+    def make_key(self, model_name, prompt):
+        """Clave de caché para un modelo y un prompt"""
+        raw = json.dumps([self.namespace, model_name, normalize_text(prompt)])
+        return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+    def get(self, key):
+        """Buscar una respuesta en memoria y después en disco"""
+        if not self.enabled:
+            return None
+
+        value = self.memory.get(key)
+        if value is not None:
+            self._count('memory_hits')
+            return value
+
+        if self.disk is not None:
+            try:
+                value = self.disk.get(key)
+            except sqlite3.Error:
+                value = None
+            if value is not None:
+                # Promocionar al nivel en memoria
+                self.memory.set(key, value)
+                self._count('disk_hits')
+                return value
+
+        self._count('misses')
+        return None
+
+    def set(self, key, value):
+        """Guardar una respuesta en todos los niveles"""
+        if not self.enabled or not value:
+            return
+
+        self.memory.set(key, value)
+        if self.disk is not None:
+            try:
+                self.disk.set(key, value)
+            except sqlite3.Error:
+                # La caché en disco es una optimización: no debe romper la petición
+                pass
+        self._count('sets')
+
+    def clear(self):
+        self.memory.clear()
+        if self.disk is not None:
+            self.disk.clear()
+
+    def _count(self, name):
+        with self._stats_lock:
+            self._stats[name] += 1
+        count_event(self.namespace, name)
+
+    def reset_stats(self):
+        self._stats = {'memory_hits': 0, 'disk_hits': 0, 'misses': 0, 'sets': 0}
+
+    def stats(self):
+        """Contadores de aciertos y fallos de este proceso"""
+        with self._stats_lock:
+            stats = dict(self._stats)
+        lookups = stats['memory_hits'] + stats['disk_hits'] + stats['misses']
+        stats['hit_rate'] = (stats['memory_hits'] + stats['disk_hits']) / lookups if lookups else 0.0
+        stats['enabled'] = self.enabled
+        stats['memory_entries'] = len(self.memory) if self.memory is not None else 0
+        stats['disk_enabled'] = self.disk is not None
+        return stats
@@ -1,6 +1,18 @@
 import os
 from datetime import timedelta
 
+def database_url(url):
+    """Normalizar la URL de la base de datos
+
+    Heroku, Render y similares dan ``postgres://``, que SQLAlchemy 1.4+ no
+    acepta. Sin driver explícito se usa psycopg2 (el de requirements.txt;
+    SQLAlchemy 2.1 elegiría psycopg 3).
+    """
+    for prefix in ('postgres://', 'postgresql://'):
+        if url and url.startswith(prefix):
+            return 'postgresql+psycopg2://' + url[len(prefix):]
+    return url
+
 class Config:
     """Configuración base de la aplicación Flask"""
     
@@ -8,16 +20,180 @@ class Config:
     SECRET_KEY = os.environ.get('SECRET_KEY') or 'dev-secret-key-change-in-production'
     
     # Configuración de base de datos
-    SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL') or 'sqlite:///flask_gemini.db'
+    # SQLite por defecto; PostgreSQL con DATABASE_URL=postgresql://... (requiere psycopg2)
+    SQLALCHEMY_DATABASE_URI = database_url(os.environ.get('DATABASE_URL')) or 'sqlite:///flask_gemini.db'
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    # Filas por lote al recorrer consultas grandes (cursor de servidor en PostgreSQL)
+    DB_STREAM_BATCH_SIZE = int(os.environ.get('DB_STREAM_BATCH_SIZE', 1000))
+    # PRAGMA aplicados a cada conexión SQLite nueva (ver ProductionConfig)
+    SQLITE_PRAGMAS = {}
     
     # Configuración JWT
     JWT_SECRET_KEY = os.environ.get('JWT_SECRET_KEY') or 'jwt-secret-string'
     JWT_ACCESS_TOKEN_EXPIRES = timedelta(hours=24)
     JWT_REFRESH_TOKEN_EXPIRES = timedelta(days=30)
+    # Copia de los usuarios en memoria para validar los tokens sin leer la tabla
+    # users en cada petición: una desactivación o revocación tarda como mucho
+    # USER_CACHE_TTL segundos en aplicarse en los demás workers
+    USER_CACHE_TTL = int(os.environ.get('USER_CACHE_TTL', 60))
+    USER_CACHE_MAX_ENTRIES = int(os.environ.get('USER_CACHE_MAX_ENTRIES', 10000))
     
     # Configuración de Gemini AI
     GEMINI_API_KEY = os.environ.get('GEMINI_API_KEY')
+    # 'grpc' (por defecto de la librería) o 'rest'; con workers gevent usar 'rest'
+    GEMINI_TRANSPORT = os.environ.get('GEMINI_TRANSPORT')
+    GEMINI_DEFAULT_MODEL = os.environ.get('GEMINI_DEFAULT_MODEL', 'gemini-1.5-flash')
+    # Modelos disponibles por orden de preferencia (el por defecto va siempre primero)
+    GEMINI_MODELS = os.environ.get('GEMINI_MODELS', 'gemini-1.5-flash,gemini-1.5-pro')
+    # Selección automática: prompts largos a otro modelo, saltar modelos cuyo p95
+    # supere GEMINI_LATENCY_SLO segundos y conmutar al siguiente si uno falla
+    GEMINI_LONG_PROMPT_CHARS = int(os.environ.get('GEMINI_LONG_PROMPT_CHARS', 12000))
+    GEMINI_LONG_PROMPT_MODEL = os.environ.get('GEMINI_LONG_PROMPT_MODEL', 'gemini-1.5-pro')
+    GEMINI_LATENCY_SLO = float(os.environ.get('GEMINI_LATENCY_SLO', 10.0))
+    GEMINI_LATENCY_MIN_SAMPLES = int(os.environ.get('GEMINI_LATENCY_MIN_SAMPLES', 20))
+    GEMINI_LATENCY_WINDOW = int(os.environ.get('GEMINI_LATENCY_WINDOW', 200))
+    GEMINI_FAILOVER = os.environ.get('GEMINI_FAILOVER', 'true').lower() in ('1', 'true', 'yes')
+    # Modelo local simulado (desarrollo sin API key y pruebas de carga)
+    GEMINI_FAKE_MODEL = os.environ.get('GEMINI_FAKE_MODEL', '').lower() in ('1', 'true', 'yes')
+    GEMINI_FAKE_LATENCY = float(os.environ.get('GEMINI_FAKE_LATENCY', 0.0))
+    GEMINI_FAKE_ERROR_RATE = float(os.environ.get('GEMINI_FAKE_ERROR_RATE', 0.0))
+    
+    # Llamadas a Gemini: plazo por intento y total, reintentos de errores
+    # transitorios con backoff y jitter, cortocircuito por tasa de errores y
+    # llamada de cobertura (hedging) si un intento tarda más de GEMINI_HEDGE_DELAY
+    GEMINI_RESILIENCE_ENABLED = os.environ.get('GEMINI_RESILIENCE_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+    GEMINI_TIMEOUT = float(os.environ.get('GEMINI_TIMEOUT', 30.0))
+    GEMINI_DEADLINE = float(os.environ.get('GEMINI_DEADLINE', 60.0))
+    GEMINI_MAX_RETRIES = int(os.environ.get('GEMINI_MAX_RETRIES', 2))
+    GEMINI_RETRY_BASE_DELAY = float(os.environ.get('GEMINI_RETRY_BASE_DELAY', 0.5))
+    GEMINI_RETRY_MAX_DELAY = float(os.environ.get('GEMINI_RETRY_MAX_DELAY', 4.0))
+    GEMINI_HEDGE_DELAY = float(os.environ.get('GEMINI_HEDGE_DELAY', 0))
+    GEMINI_BREAKER_WINDOW = int(os.environ.get('GEMINI_BREAKER_WINDOW', 20))
+    GEMINI_BREAKER_MIN_CALLS = int(os.environ.get('GEMINI_BREAKER_MIN_CALLS', 10))
+    GEMINI_BREAKER_ERROR_RATE = float(os.environ.get('GEMINI_BREAKER_ERROR_RATE', 0.5))
+    GEMINI_BREAKER_OPEN_SECONDS = float(os.environ.get('GEMINI_BREAKER_OPEN_SECONDS', 30.0))
+    # Hilos para las llamadas a Gemini; con workers gevent no se usa (un greenlet por llamada)
+    GEMINI_EXECUTOR_WORKERS = int(os.environ.get('GEMINI_EXECUTOR_WORKERS', 32))
+    
+    # Ventana de contexto enviada a Gemini: últimos N mensajes literales dentro
+    # de un presupuesto de caracteres; lo anterior se resume de forma incremental
+    CONTEXT_MAX_MESSAGES = int(os.environ.get('CONTEXT_MAX_MESSAGES', 20))
+    CONTEXT_MAX_CHARS = int(os.environ.get('CONTEXT_MAX_CHARS', 16000))
+    CONTEXT_SUMMARY_MAX_CHARS = int(os.environ.get('CONTEXT_SUMMARY_MAX_CHARS', 2000))
+    # Bloques de mensajes atrasados (más de dos ventanas sin resumir, p. ej.
+    # conversaciones anteriores al resumen) que se resumen como mucho por turno
+    CONTEXT_SUMMARY_MAX_CHUNKS = int(os.environ.get('CONTEXT_SUMMARY_MAX_CHUNKS', 3))
+    
+    # Caché de respuestas para prompts idénticos (opcional). Con *_DB_PATH se
+    # añade un nivel SQLite compartido entre los workers de gunicorn
+    RESPONSE_CACHE_ENABLED = os.environ.get('RESPONSE_CACHE_ENABLED', '').lower() in ('1', 'true', 'yes')
+    RESPONSE_CACHE_MAX_ENTRIES = int(os.environ.get('RESPONSE_CACHE_MAX_ENTRIES', 1000))
+    RESPONSE_CACHE_TTL = int(os.environ.get('RESPONSE_CACHE_TTL', 3600))
+    RESPONSE_CACHE_DB_PATH = os.environ.get('RESPONSE_CACHE_DB_PATH')
+    RESPONSE_CACHE_DB_MAX_ENTRIES = int(os.environ.get('RESPONSE_CACHE_DB_MAX_ENTRIES', 100000))
+    
+    # Caché de títulos generados (independiente de la de respuestas)
+    TITLE_CACHE_ENABLED = os.environ.get('TITLE_CACHE_ENABLED', '').lower() in ('1', 'true', 'yes')
+    TITLE_CACHE_MAX_ENTRIES = int(os.environ.get('TITLE_CACHE_MAX_ENTRIES', 1000))
+    TITLE_CACHE_TTL = int(os.environ.get('TITLE_CACHE_TTL', 86400))
+    TITLE_CACHE_DB_PATH = os.environ.get('TITLE_CACHE_DB_PATH') or os.environ.get('RESPONSE_CACHE_DB_PATH')
+    
+    # Caché semántica para preguntas parecidas sin contexto (requiere numpy).
+    # SEMANTIC_CACHE_EMBEDDER admite una función 'modulo.funcion' propia
+    SEMANTIC_CACHE_ENABLED = os.environ.get('SEMANTIC_CACHE_ENABLED', '').lower() in ('1', 'true', 'yes')
+    SEMANTIC_CACHE_THRESHOLD = float(os.environ.get('SEMANTIC_CACHE_THRESHOLD', 0.9))
+    SEMANTIC_CACHE_MAX_ENTRIES = int(os.environ.get('SEMANTIC_CACHE_MAX_ENTRIES', 5000))
+    SEMANTIC_CACHE_TTL = int(os.environ.get('SEMANTIC_CACHE_TTL', 3600))
+    SEMANTIC_CACHE_DIM = int(os.environ.get('SEMANTIC_CACHE_DIM', 1024))
+    SEMANTIC_CACHE_EMBEDDER = os.environ.get('SEMANTIC_CACHE_EMBEDDER')
+    
+    # Unificar llamadas idénticas simultáneas a Gemini (single-flight). Con
+    # *_DB_PATH también entre workers mediante una tabla de bloqueos en SQLite
+    SINGLE_FLIGHT_ENABLED = os.environ.get('SINGLE_FLIGHT_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+    SINGLE_FLIGHT_DB_PATH = os.environ.get('SINGLE_FLIGHT_DB_PATH') or os.environ.get('RESPONSE_CACHE_DB_PATH')
+    SINGLE_FLIGHT_TIMEOUT = float(os.environ.get('SINGLE_FLIGHT_TIMEOUT', 60.0))
+    SINGLE_FLIGHT_LOCK_TTL = float(os.environ.get('SINGLE_FLIGHT_LOCK_TTL', 120.0))
+    SINGLE_FLIGHT_RESULT_TTL = float(os.environ.get('SINGLE_FLIGHT_RESULT_TTL', 30.0))
+    SINGLE_FLIGHT_POLL_INTERVAL = float(os.environ.get('SINGLE_FLIGHT_POLL_INTERVAL', 0.1))
+    
+    # Búsqueda de texto completo: solo se ordenan por relevancia las N
+    # coincidencias más recientes (acota el coste con términos muy comunes)
+    SEARCH_MAX_CANDIDATES = int(os.environ.get('SEARCH_MAX_CANDIDATES', 1000))
+    
+    # Archivo de conversaciones inactivas (flask archive-conversations): sus
+    # mensajes pasan comprimidos a conversation_archives y se restauran al abrirlas
+    ARCHIVE_AFTER_DAYS = int(os.environ.get('ARCHIVE_AFTER_DAYS', 90))
+    ARCHIVE_BATCH_SIZE = int(os.environ.get('ARCHIVE_BATCH_SIZE', 100))
+    ARCHIVE_COMPRESSION_LEVEL = int(os.environ.get('ARCHIVE_COMPRESSION_LEVEL', 6))
+    
+    # Contraseñas: método y coste de werkzeug (vacío: el suyo por defecto; los
+    # hashes antiguos se recalculan en el siguiente login), procesos que los
+    # calculan (0: en el propio hilo), operaciones en espera antes de responder
+    # 503 y caché en memoria de las verificaciones correctas
+    PASSWORD_HASH_METHOD = os.environ.get('PASSWORD_HASH_METHOD', '')
+    PASSWORD_HASH_WORKERS = int(os.environ.get('PASSWORD_HASH_WORKERS', 0))
+    PASSWORD_HASH_MAX_PENDING = int(os.environ.get('PASSWORD_HASH_MAX_PENDING', 64))
+    PASSWORD_HASH_TIMEOUT = float(os.environ.get('PASSWORD_HASH_TIMEOUT', 5.0))
+    PASSWORD_CACHE_ENABLED = os.environ.get('PASSWORD_CACHE_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+    PASSWORD_CACHE_MAX_ENTRIES = int(os.environ.get('PASSWORD_CACHE_MAX_ENTRIES', 10000))
+    PASSWORD_CACHE_TTL = int(os.environ.get('PASSWORD_CACHE_TTL', 300))
+    
+    # Importación de exportaciones JSONL (flask import-conversations): filas por commit
+    IMPORT_BATCH_SIZE = int(os.environ.get('IMPORT_BATCH_SIZE', 5000))
+    
+    # Lotes de mensajes (POST /api/chat/batch y flask batch-messages): llamadas
+    # concurrentes a Gemini y escritura de mensajes en bloque
+    BATCH_MAX_ITEMS = int(os.environ.get('BATCH_MAX_ITEMS', 1000))
+    BATCH_CONCURRENCY = int(os.environ.get('BATCH_CONCURRENCY', 8))
+    BATCH_WRITE_SIZE = int(os.environ.get('BATCH_WRITE_SIZE', 100))
+    BATCH_FLUSH_INTERVAL = float(os.environ.get('BATCH_FLUSH_INTERVAL', 1.0))
+    
+    # Límites de uso de Gemini (token bucket): peticiones y tokens estimados,
+    # por usuario y globales. *_BURST es la ráfaga máxima; 0 desactiva la cuota.
+    # Con RATE_LIMIT_DB_PATH los contadores se comparten entre workers (SQLite)
+    # Los benchmarks y pruebas de carga con pocos usuarios deben desactivarlas
+    # (RATE_LIMIT_ENABLED=false): con los valores por defecto casi todo sería 429
+    RATE_LIMIT_ENABLED = os.environ.get('RATE_LIMIT_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+    RATE_LIMIT_DB_PATH = os.environ.get('RATE_LIMIT_DB_PATH')
+    RATE_LIMIT_USER_REQUESTS_PER_MINUTE = int(os.environ.get('RATE_LIMIT_USER_REQUESTS_PER_MINUTE', 20))
+    RATE_LIMIT_USER_REQUESTS_BURST = int(os.environ.get('RATE_LIMIT_USER_REQUESTS_BURST', 10))
+    RATE_LIMIT_USER_TOKENS_PER_MINUTE = int(os.environ.get('RATE_LIMIT_USER_TOKENS_PER_MINUTE', 40000))
+    RATE_LIMIT_USER_TOKENS_BURST = int(os.environ.get('RATE_LIMIT_USER_TOKENS_BURST', 20000))
+    RATE_LIMIT_GLOBAL_REQUESTS_PER_MINUTE = int(os.environ.get('RATE_LIMIT_GLOBAL_REQUESTS_PER_MINUTE', 600))
+    RATE_LIMIT_GLOBAL_REQUESTS_BURST = int(os.environ.get('RATE_LIMIT_GLOBAL_REQUESTS_BURST', 100))
+    RATE_LIMIT_GLOBAL_TOKENS_PER_MINUTE = int(os.environ.get('RATE_LIMIT_GLOBAL_TOKENS_PER_MINUTE', 1000000))
+    RATE_LIMIT_GLOBAL_TOKENS_BURST = int(os.environ.get('RATE_LIMIT_GLOBAL_TOKENS_BURST', 250000))
+    # Tokens de respuesta que se suponen al estimar el coste de una llamada
+    RATE_LIMIT_OUTPUT_TOKENS = int(os.environ.get('RATE_LIMIT_OUTPUT_TOKENS', 512))
+    
+    # Trabajos en segundo plano (títulos automáticos, etc.)
+    JOB_WORKERS = int(os.environ.get('JOB_WORKERS', 2))
+    JOB_POLL_INTERVAL = float(os.environ.get('JOB_POLL_INTERVAL', 1.0))
+    JOB_MAX_ATTEMPTS = int(os.environ.get('JOB_MAX_ATTEMPTS', 5))
+    JOB_RETRY_BASE_DELAY = float(os.environ.get('JOB_RETRY_BASE_DELAY', 2.0))
+    JOB_RETRY_MAX_DELAY = float(os.environ.get('JOB_RETRY_MAX_DELAY', 300.0))
+    JOB_LEASE_SECONDS = int(os.environ.get('JOB_LEASE_SECONDS', 120))
+    
+    # Fichero de log en producción (el directorio se crea si no existe)
+    LOG_FILE = os.environ.get('LOG_FILE', 'logs/flask_gemini.log')
+    
+    # Métricas de Prometheus en /metrics (requiere prometheus_client). Con
+    # varios workers de gunicorn definir PROMETHEUS_MULTIPROC_DIR
+    METRICS_ENABLED = os.environ.get('METRICS_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+    METRICS_PATH = os.environ.get('METRICS_PATH', '/metrics')
+    
+    # Perfilado por muestreo de peticiones (ver app/profiling.py): una fracción
+    # de las peticiones o las que lleven la cabecera PROFILE_HEADER con PROFILE_TOKEN
+    PROFILE_ENABLED = os.environ.get('PROFILE_ENABLED', 'false').lower() in ('1', 'true', 'yes')
+    PROFILE_SAMPLE_RATE = float(os.environ.get('PROFILE_SAMPLE_RATE', 0.01))
+    PROFILE_HEADER = os.environ.get('PROFILE_HEADER', 'X-Profile')
+    PROFILE_TOKEN = os.environ.get('PROFILE_TOKEN', '')
+    PROFILE_INTERVAL_MS = float(os.environ.get('PROFILE_INTERVAL_MS', 5))
+    PROFILE_DIR = os.environ.get('PROFILE_DIR', 'profiles')
+    PROFILE_MAX_CAPTURES = int(os.environ.get('PROFILE_MAX_CAPTURES', 100))
+    
+    # Emails con acceso a /api/admin (separados por comas)
+    ADMIN_EMAILS = [email.strip().lower() for email in os.environ.get('ADMIN_EMAILS', '').split(',') if email.strip()]
     
     # Configuración CORS
     CORS_ORIGINS = os.environ.get('CORS_ORIGINS', '*').split(',')
@@ -27,10 +203,72 @@ class DevelopmentConfig(Config):
     DEBUG = True
 
 class ProductionConfig(Config):
-    """Configuración para producción"""
+    """Configuración para producción
+
+    Con SQLite y varios workers de gunicorn: modo WAL (las lecturas no
+    bloquean a la escritura), fsync solo en los checkpoints, caché de páginas
+    y mmap por conexión, y espera de hasta ``SQLITE_BUSY_TIMEOUT`` ms antes
+    de fallar con "database is locked". El pool mantiene las conexiones
+    abiertas para no perder su caché ni repetir los PRAGMA en cada petición.
+
+    Con PostgreSQL, cada worker mantiene hasta ``DB_POOL_SIZE`` +
+    ``DB_MAX_OVERFLOW`` conexiones (el total entre workers debe quedar por
+    debajo de ``max_connections``). Antes de usar una conexión del pool se
+    comprueba que siga viva y se renueva cada ``DB_POOL_RECYCLE`` segundos,
+    para sobrevivir a reinicios del servidor y a cortes de proxies.
+    """
     DEBUG = False
+    # Hash de contraseñas fuera de los hilos que atienden peticiones
+    PASSWORD_HASH_WORKERS = int(os.environ.get('PASSWORD_HASH_WORKERS', 2))
+    SQLITE_PRAGMAS = {
+        'journal_mode': 'WAL',
+        'synchronous': os.environ.get('SQLITE_SYNCHRONOUS', 'NORMAL'),
+        'busy_timeout': int(os.environ.get('SQLITE_BUSY_TIMEOUT', 5000)),
+        # Negativo: tamaño en KiB (64 MB por conexión)
+        'cache_size': int(os.environ.get('SQLITE_CACHE_SIZE', -65536)),
+        'mmap_size': int(os.environ.get('SQLITE_MMAP_SIZE', 268435456)),
+    }
+    SQLALCHEMY_ENGINE_OPTIONS = {
+        'pool_size': int(os.environ.get('DB_POOL_SIZE', 5)),
+        'max_overflow': int(os.environ.get('DB_MAX_OVERFLOW', 10)),
+        'pool_timeout': 30,
+        'pool_pre_ping': os.environ.get('DB_POOL_PRE_PING', 'true').lower() in ('1', 'true', 'yes'),
+        'pool_recycle': int(os.environ.get('DB_POOL_RECYCLE', 1800)),
+    }
+
+class GeventConfig(ProductionConfig):
+    """Configuración para servir con workers gevent (gunicorn -k gevent)
+
+    Cada worker multiplexa cientos de peticiones concurrentes mientras esperan
+    a Gemini. Con PostgreSQL las consultas ceden el control (ver
+    ``app.database``), así que el pool crece para acompañarlas. sqlite3 es
+    una extensión C bloqueante que gevent no parchea: cada consulta detiene
+    el worker entero mientras dura, y más conexiones solo añadirían
+    contención por el bloqueo de escritura, así que con SQLite se mantiene el
+    pool de ``ProductionConfig``. Las llamadas a Gemini no pasan por el pool
+    de ``GEMINI_EXECUTOR_WORKERS`` hilos sino que cada una va en su greenlet
+    (``app.resilience.GreenletExecutor``).
+    """
+    GEMINI_TRANSPORT = os.environ.get('GEMINI_TRANSPORT') or 'rest'
+    SQLALCHEMY_ENGINE_OPTIONS = dict(
+        ProductionConfig.SQLALCHEMY_ENGINE_OPTIONS,
+        pool_size=int(os.environ.get('DB_POOL_SIZE', 50)),
+        max_overflow=int(os.environ.get('DB_MAX_OVERFLOW', 1000)),
+        pool_timeout=60,
+    ) if ProductionConfig.SQLALCHEMY_DATABASE_URI.startswith('postgresql') else ProductionConfig.SQLALCHEMY_ENGINE_OPTIONS
 
 class TestingConfig(Config):
     """Configuración para testing"""
     TESTING = True
-    SQLALCHEMY_DATABASE_URI = 'sqlite:///:memory:' 
\ No newline at end of file
+    # TEST_DATABASE_URL=postgresql://... para probar contra un PostgreSQL local
+    SQLALCHEMY_DATABASE_URI = database_url(os.environ.get('TEST_DATABASE_URL')) or 'sqlite:///:memory:'
+    # Los tests ejecutan los trabajos explícitamente con job_queue.run_pending()
+    JOB_WORKERS = 0 
+
+config_by_name = {
+    'development': DevelopmentConfig,
+    'production': ProductionConfig,
+    'gevent': GeventConfig,
+    'testing': TestingConfig,
+    'default': Config
+}
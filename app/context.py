@@ -0,0 +1,205 @@
+from flask import current_app
+from sqlalchemy import select, update
+from app import db
+from app.models import Conversation, Message
+
+SUMMARY_PROMPT = """Actualiza el resumen de una conversación entre un usuario y un asistente de IA.
+
+Resumen actual:
+{summary}
+
+Nuevos mensajes a incorporar:
+{messages}
+
+Escribe el resumen actualizado en un máximo de {max_chars} caracteres, conservando los datos, decisiones y preguntas importantes. Responde SOLO con el resumen."""
+
+def _format_message(message):
+    return f"{message.role}: {message.content}"
+
+def _fallback_summary(summary, messages, max_chars):
+    """Resumen de respaldo sin modelo: recortar y concatenar los mensajes"""
+    parts = [summary] if summary else []
+    for message in messages:
+        parts.append(f"{message.role}: {message.content[:200]}")
+
+    text = "\n".join(parts)
+    # Conservar lo más reciente si no cabe
+    return text[-max_chars:]
+
+def summarize_messages(model, summary, messages, max_chars):
+    """Incorporar ``messages`` al resumen existente de la conversación"""
+    prompt = SUMMARY_PROMPT.format(
+        summary=summary or '(vacío)',
+        messages="\n".join(_format_message(m) for m in messages),
+        max_chars=max_chars
+    )
+
+    try:
+        response = model.generate_content(prompt)
+        new_summary = response.text.strip()
+        if new_summary:
+            return new_summary[:max_chars]
+    except Exception as summary_error:
+        current_app.logger.warning(f"Error generando resumen: {summary_error}")
+
+    return _fallback_summary(summary, messages, max_chars)
+
+def _select_window(messages, budget, max_messages):
+    """Índice del primer mensaje que cabe en la ventana (de más nuevo a más viejo)"""
+    used = 0
+    start = len(messages)
+    for index in range(len(messages) - 1, -1, -1):
+        size = len(messages[index].content) + len(messages[index].role) + 3
+        if len(messages) - index > max_messages or used + size > budget:
+            break
+        used += size
+        start = index
+    return start
+
+def _unsummarized(conversation_id, after_id, before_id=None, limit=None, newest=False):
+    """Mensajes sin resumir como filas (no caducan con el commit, a diferencia del ORM)"""
+    messages = Message.__table__
+    query = select(messages.c.id, messages.c.role, messages.c.content).where(
+        messages.c.conversation_id == conversation_id,
+        messages.c.id > after_id
+    )
+    if before_id is not None:
+        query = query.where(messages.c.id < before_id)
+    query = query.order_by(messages.c.id.desc() if newest else messages.c.id).limit(limit)
+
+    rows = db.session.execute(query).all()
+    if newest:
+        rows.reverse()
+    return rows
+
+def _fold(conversation_id, summary, until_id, messages, model, max_chars):
+    """Incorporar ``messages`` al resumen y guardarlo; devuelve (resumen, hasta)
+
+    La llamada al modelo se hace sin transacción abierta y el resumen se guarda
+    en su propio commit corto, así que no se pierde aunque la petición falle
+    después. Solo se escribe si nadie lo ha avanzado mientras tanto (otra
+    petición de la misma conversación); ``updated_at`` no cambia.
+    """
+    # Sin transacción abierta durante la llamada al modelo
+    db.session.commit()
+    summary = summarize_messages(model, summary, messages, max_chars)
+
+    conversations = Conversation.__table__
+    db.session.execute(
+        update(conversations)
+        .where(conversations.c.id == conversation_id, conversations.c.summary_until_id == until_id)
+        .values(summary=summary, summary_until_id=messages[-1].id, updated_at=conversations.c.updated_at)
+    )
+    db.session.commit()
+    return summary, messages[-1].id
+
+def _summarize_backlog(draft, model, chunk_size, max_chunks, max_chars):
+    """Resumir los mensajes sin resumir anteriores a la ventana por bloques
+
+    Devuelve el resumen, hasta dónde llega y si aún quedan mensajes atrasados
+    tras ``max_chunks`` bloques.
+    """
+    conversation_id = draft['conversation_id']
+    summary, until_id = draft['summary'], draft['summary_until_id']
+    before_id = draft['pending'][0].id
+
+    for _ in range(max_chunks):
+        chunk = _unsummarized(conversation_id, until_id, before_id, chunk_size)
+        if not chunk:
+            return summary, until_id, False
+        summary, until_id = _fold(conversation_id, summary, until_id, chunk, model, max_chars)
+        if len(chunk) < chunk_size:
+            return summary, until_id, False
+
+    # ¿Queda algo entre lo resumido y la ventana?
+    backlog = bool(_unsummarized(conversation_id, until_id, before_id, 1))
+    db.session.commit()
+    return summary, until_id, backlog
+
+def _render(summary, messages, content):
+    context = []
+    if summary:
+        context.append(f"Resumen de la conversación anterior: {summary}")
+
+    for message in messages:
+        context.append(_format_message(message))
+
+    # Añadir el nuevo mensaje
+    context.append(f"user: {content}")
+
+    return "\n".join(context)
+
+def prepare_context(conversation, content):
+    """Leer lo necesario para el prompt, sin llamar al modelo
+
+    Devuelve un borrador con el prompt provisional (con el resumen actual) en
+    ``prompt``, si es el primer mensaje de la conversación y si hará falta
+    resumir (``needs_summary``). Así la cuota de tokens se comprueba antes de
+    pagar ningún resumen; el prompt definitivo lo da ``finish_context``.
+    """
+    config = current_app.config
+    max_messages = config['CONTEXT_MAX_MESSAGES']
+
+    # Lectura acotada: como mucho dos ventanas de mensajes sin resumir
+    pending = _unsummarized(conversation.id, conversation.summary_until_id, limit=max_messages * 2, newest=True)
+
+    budget = max(config['CONTEXT_MAX_CHARS'] - len(content) - len(conversation.summary or ''), 0)
+    start = _select_window(pending, budget, max_messages)
+
+    return {
+        'conversation_id': conversation.id,
+        'summary': conversation.summary,
+        'summary_until_id': conversation.summary_until_id,
+        'content': content,
+        'pending': pending,
+        'is_first_message': conversation.message_count == 0,
+        'needs_summary': start > 0,
+        'prompt': _render(conversation.summary, pending[start:], content)
+    }
+
+def finish_context(draft, model):
+    """Prompt definitivo: resumir lo que sale de la ventana si hace falta
+
+    Solo se leen los mensajes posteriores al último resumido. Los más recientes
+    se envían literalmente (hasta ``CONTEXT_MAX_MESSAGES`` y ``CONTEXT_MAX_CHARS``);
+    cuando alguno sale de la ventana se incorpora al resumen persistido en la
+    conversación. Para no resumir en cada turno, al hacerlo se deja la ventana a
+    la mitad, de modo que el resumen se recalcula cada pocos turnos.
+
+    Si hay más de dos ventanas sin resumir (conversaciones antiguas, que
+    empiezan con ``summary_until_id`` a 0), los atrasados se resumen del más
+    antiguo al más nuevo en bloques de dos ventanas, como mucho
+    ``CONTEXT_SUMMARY_MAX_CHUNKS`` por turno. Mientras quede atraso no se
+    envían los mensajes intermedios (ni se resumen los que salen de la
+    ventana), pero ninguno se salta: ``summary_until_id`` solo avanza sobre
+    mensajes ya resumidos.
+
+    Cada resumen se genera sin transacción abierta y se guarda en su propio
+    commit (ver ``_fold``): al volver, la sesión no tiene cambios pendientes.
+    """
+    if not draft['needs_summary']:
+        return draft['prompt']
+
+    config = current_app.config
+    max_messages = config['CONTEXT_MAX_MESSAGES']
+    summary_max_chars = config['CONTEXT_SUMMARY_MAX_CHARS']
+    chunk_size = max_messages * 2
+    pending = draft['pending']
+
+    summary, until_id, backlog = draft['summary'], draft['summary_until_id'], False
+    if len(pending) == chunk_size:
+        summary, until_id, backlog = _summarize_backlog(
+            draft, model, chunk_size, config['CONTEXT_SUMMARY_MAX_CHUNKS'], summary_max_chars
+        )
+
+    budget = max(config['CONTEXT_MAX_CHARS'] - len(draft['content']) - len(summary or ''), 0)
+    start = _select_window(pending, budget, max_messages)
+
+    if start > 0 and not backlog:
+        # Hay mensajes fuera de la ventana: resumirlos dejando margen para los próximos turnos
+        start = max(start, _select_window(pending, budget // 2, max(max_messages // 2, 1)))
+        summary, until_id = _fold(
+            draft['conversation_id'], summary, until_id, pending[:start], model, summary_max_chars
+        )
+
+    return _render(summary, pending[start:], draft['content'])
@@ -0,0 +1,78 @@
+"""Ajustes del motor de base de datos según el driver
+
+Con SQLite, cada conexión nueva del pool recibe los PRAGMA de
+``SQLITE_PRAGMAS`` (en producción: WAL, ``synchronous=NORMAL``, mmap, caché de
+páginas y ``busy_timeout``). Son ajustes por conexión salvo ``journal_mode``,
+que queda guardado en el fichero. Con PostgreSQL el pool se configura en
+``SQLALCHEMY_ENGINE_OPTIONS`` y las lecturas grandes usan ``stream_results``.
+
+psycopg2 es una extensión C que bloquea mientras espera al servidor. Con
+workers gevent se instala ``psycopg2.extras.wait_select`` como callback de
+espera: usa ``select`` (parcheado por gevent), de modo que cada consulta cede
+el control al resto de peticiones. sqlite3 no tiene equivalente y bloquea el
+worker durante cada consulta.
+"""
+from flask import current_app
+from sqlalchemy import event
+from app import db
+
+# Orden de aplicación: busy_timeout primero para que el resto espere si hay bloqueo
+_PRAGMA_ORDER = ('busy_timeout', 'journal_mode', 'synchronous', 'cache_size', 'mmap_size')
+
+def _sqlite_pragmas(pragmas):
+    ordered = [name for name in _PRAGMA_ORDER if name in pragmas]
+    ordered += [name for name in pragmas if name not in _PRAGMA_ORDER]
+    return [f'PRAGMA {name}={pragmas[name]}' for name in ordered]
+
+def _gevent_patched():
+    """True si gevent ha parcheado los sockets (worker gevent)"""
+    try:
+        from gevent import monkey
+    except ImportError:
+        return False
+    return monkey.is_module_patched('socket')
+
+def configure_engine(app):
+    """Registrar los ajustes por conexión del motor de la aplicación"""
+    with app.app_context():
+        engine = db.engine
+
+    if engine.dialect.name == 'postgresql' and _gevent_patched():
+        import psycopg2.extensions
+        import psycopg2.extras
+        psycopg2.extensions.set_wait_callback(psycopg2.extras.wait_select)
+
+    if engine.dialect.name != 'sqlite':
+        return
+
+    statements = _sqlite_pragmas(app.config.get('SQLITE_PRAGMAS') or {})
+    if not statements:
+        return
+
+    @event.listens_for(engine, 'connect')
+    def apply_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for statement in statements:
+                cursor.execute(statement)
+        finally:
+            cursor.close()
+
+def sqlite_settings(connection):
+    """PRAGMA efectivos de una conexión (para diagnóstico y benchmarks)"""
+    settings = {}
+    for name in _PRAGMA_ORDER:
+        settings[name] = connection.exec_driver_sql(f'PRAGMA {name}').scalar()
+    return settings
+
+def stream_results(statement, batch_size=None):
+    """Ejecutar una consulta grande leyendo las filas por lotes
+
+    ``yield_per`` activa ``stream_results``: en PostgreSQL (psycopg2) se usa
+    un cursor con nombre en el servidor y solo hay ``batch_size`` filas en
+    memoria a la vez; SQLite ya lee del cursor bajo demanda. Con entidades del
+    ORM usar ``.scalars()`` sobre el resultado. Hay que consumirlo entero o
+    cerrarlo (``result.close()``) para liberar el cursor.
+    """
+    batch_size = batch_size or current_app.config['DB_STREAM_BATCH_SIZE']
+    return db.session.execute(statement.execution_options(yield_per=batch_size))
@@ -0,0 +1,324 @@
+"""Exportación e importación de conversaciones en JSONL (opcionalmente comprimido)
+
+Formato: una primera línea de cabecera y, por cada conversación, una línea
+``conversation`` seguida de sus mensajes en orden::
+
+    {"type": "export", "version": 1, "exported_at": "..."}
+    {"type": "conversation", "id": 7, "user": "ana@example.com", "title": "...", ...}
+    {"type": "message", "id": 120, "conversation_id": 7, "role": "user", "content": "...", "timestamp": "..."}
+
+La exportación recorre una única consulta por lotes (``stream_results``) y
+comprime a medida que genera, así que la memoria no depende del volumen. La
+importación inserta conversaciones y mensajes en bloques de
+``IMPORT_BATCH_SIZE`` filas. Los ids se asignan de nuevo al importar.
+"""
+import gzip
+import io
+import json
+import zlib
+from datetime import datetime
+from flask import current_app
+from sqlalchemy import bindparam, insert, select, update
+from app import db
+from app.archive import archived_messages
+from app.database import stream_results
+from app.models import User, Conversation, Message
+
+FORMAT_VERSION = 1
+
+# Compresión admitida: extensión del fichero y tipo MIME
+COMPRESSIONS = {
+    'none': ('.jsonl', 'application/x-ndjson'),
+    'gzip': ('.jsonl.gz', 'application/gzip'),
+    'zstd': ('.jsonl.zst', 'application/zstd'),
+}
+
+GZIP_MAGIC = b'\x1f\x8b'
+ZSTD_MAGIC = b'\x28\xb5\x2f\xfd'
+
+# Tamaño de los bloques que se comprimen y envían
+CHUNK_SIZE = 64 * 1024
+
+# Un único codificador para no crearlo en cada línea
+_encode = json.JSONEncoder(ensure_ascii=False).encode
+
+class ImportFormatError(ValueError):
+    """Fichero de importación con un formato no reconocido"""
+
+def _zstandard():
+    try:
+        import zstandard
+    except ImportError:
+        raise ValueError('zstd compression requires the zstandard package')
+    return zstandard
+
+def check_compression(compression):
+    """Validar la compresión pedida antes de empezar a generar la exportación"""
+    if compression not in COMPRESSIONS:
+        raise ValueError(f'Unknown compression: {compression}')
+    if compression == 'zstd':
+        _zstandard()
+
+def compression_from_filename(filename):
+    """Compresión según la extensión (``.gz``, ``.zst``; si no, sin comprimir)"""
+    if filename.endswith('.gz'):
+        return 'gzip'
+    if filename.endswith('.zst') or filename.endswith('.zstd'):
+        return 'zstd'
+    return 'none'
+
+def _isoformat(value):
+    return value.isoformat() if value is not None else None
+
+def export_records(user_id=None):
+    """Generar los registros de la exportación (de un usuario o de todos)"""
+    users, conversations, messages = User.__table__, Conversation.__table__, Message.__table__
+
+    statement = (
+        select(
+            conversations.c.id, users.c.email, conversations.c.title, conversations.c.model,
+            conversations.c.created_at, conversations.c.updated_at, conversations.c.summary,
+            conversations.c.summary_until_id, conversations.c.message_count,
+            conversations.c.last_message_preview, conversations.c.archived_at,
+            messages.c.id.label('message_id'), messages.c.role, messages.c.content, messages.c.timestamp
+        )
+        .select_from(
+            conversations
+            .join(users, users.c.id == conversations.c.user_id)
+            .outerjoin(messages, messages.c.conversation_id == conversations.c.id)
+        )
+        # Mismo orden que el índice (conversation_id, timestamp, id)
+        .order_by(conversations.c.id, messages.c.timestamp, messages.c.id)
+    )
+    if user_id is not None:
+        statement = statement.where(conversations.c.user_id == user_id)
+
+    yield {'type': 'export', 'version': FORMAT_VERSION, 'exported_at': datetime.utcnow().isoformat()}
+
+    current = None
+    result = stream_results(statement)
+    try:
+        for row in result:
+            if row.id != current:
+                current = row.id
+                yield {
+                    'type': 'conversation',
+                    'id': row.id,
+                    'user': row.email,
+                    'title': row.title,
+                    'model': row.model,
+                    'created_at': _isoformat(row.created_at),
+                    'updated_at': _isoformat(row.updated_at),
+                    'summary': row.summary,
+                    'summary_until_id': row.summary_until_id,
+                    'message_count': row.message_count,
+                    'last_message_preview': row.last_message_preview
+                }
+                # Archivada: primero los mensajes del archivo (los de la tabla son posteriores)
+                if row.archived_at is not None:
+                    for message in archived_messages(row.id):
+                        yield {
+                            'type': 'message',
+                            'id': message['id'],
+                            'conversation_id': row.id,
+                            'role': message['role'],
+                            'content': message['content'],
+                            'timestamp': _isoformat(message['timestamp'])
+                        }
+            if row.message_id is not None:
+                yield {
+                    'type': 'message',
+                    'id': row.message_id,
+                    'conversation_id': row.id,
+                    'role': row.role,
+                    'content': row.content,
+                    'timestamp': _isoformat(row.timestamp)
+                }
+    finally:
+        result.close()
+
+def _compressor(compression):
+    if compression == 'gzip':
+        # wbits=31: formato gzip (cabecera y CRC), compatible con gunzip
+        return zlib.compressobj(6, zlib.DEFLATED, 31)
+    if compression == 'zstd':
+        return _zstandard().ZstdCompressor(level=3).compressobj()
+    return None
+
+def export_chunks(records, compression='gzip'):
+    """Serializar registros como JSONL y comprimirlos en bloques de ~64 KB"""
+    check_compression(compression)
+    compressor = _compressor(compression)
+
+    buffer, size = [], 0
+    for record in records:
+        line = (_encode(record) + '\n').encode('utf-8')
+        buffer.append(line)
+        size += len(line)
+        if size >= CHUNK_SIZE:
+            data = b''.join(buffer)
+            buffer, size = [], 0
+            data = compressor.compress(data) if compressor else data
+            if data:
+                yield data
+
+    data = b''.join(buffer)
+    if compressor:
+        data = compressor.compress(data) + compressor.flush()
+    if data:
+        yield data
+
+def open_import_file(path):
+    """Abrir un fichero JSONL detectando la compresión por sus primeros bytes"""
+    with open(path, 'rb') as f:
+        magic = f.read(4)
+
+    if magic.startswith(GZIP_MAGIC):
+        return gzip.open(path, 'rt', encoding='utf-8')
+    if magic.startswith(ZSTD_MAGIC):
+        raw = open(path, 'rb')
+        reader = _zstandard().ZstdDecompressor().stream_reader(raw, closefd=True)
+        return io.TextIOWrapper(reader, encoding='utf-8')
+    return open(path, 'r', encoding='utf-8')
+
+def _parse_datetime(value):
+    return datetime.fromisoformat(value) if value else datetime.utcnow()
+
+class _Importer:
+    """Acumular conversaciones y mensajes y escribirlos por bloques"""
+
+    def __init__(self, user_id, batch_size):
+        self.user_id = user_id
+        self.batch_size = batch_size
+        self.user_ids = {}
+        self.conversations = []
+        self.messages = []
+        self.current = None
+        self.stats = {'conversations': 0, 'messages': 0, 'skipped': 0}
+
+    def _resolve_user(self, email):
+        if self.user_id is not None:
+            return self.user_id
+        if email not in self.user_ids:
+            self.user_ids[email] = db.session.execute(
+                select(User.__table__.c.id).where(User.__table__.c.email == email)
+            ).scalar()
+        return self.user_ids[email]
+
+    def add(self, record):
+        kind = record.get('type')
+        if kind == 'conversation':
+            user_id = self._resolve_user(record.get('user'))
+            if user_id is None:
+                # Usuario inexistente: se omiten la conversación y sus mensajes
+                self.current = None
+                self.stats['skipped'] += 1
+                return
+            self.current = {
+                'row': {
+                    'user_id': user_id,
+                    'title': record['title'],
+                    'model': record.get('model'),
+                    'created_at': _parse_datetime(record.get('created_at')),
+                    'updated_at': _parse_datetime(record.get('updated_at')),
+                    'summary': record.get('summary'),
+                    'summary_until_id': 0,
+                    'message_count': record.get('message_count') or 0,
+                    'last_message_preview': record.get('last_message_preview')
+                },
+                'id': None,
+                'summary_until_id': record.get('summary_until_id') or 0
+            }
+            self.conversations.append(self.current)
+            if len(self.conversations) >= self.batch_size:
+                self.flush()
+        elif kind == 'message':
+            if self.current is None:
+                self.stats['skipped'] += 1
+                return
+            self.messages.append((self.current, record))
+            if len(self.messages) >= self.batch_size:
+                self.flush()
+        elif kind != 'export':
+            raise ImportFormatError(f'Unknown record type: {kind}')
+
+    def flush(self):
+        """Insertar las conversaciones y los mensajes pendientes en un commit"""
+        conversations, messages = Conversation.__table__, Message.__table__
+
+        pending = [conversation for conversation in self.conversations if conversation['id'] is None]
+        if pending:
+            ids = db.session.execute(
+                insert(conversations).returning(conversations.c.id, sort_by_parameter_order=True),
+                [conversation['row'] for conversation in pending]
+            ).scalars().all()
+            for conversation, new_id in zip(pending, ids):
+                conversation['id'] = new_id
+            self.stats['conversations'] += len(pending)
+
+        if self.messages:
+            connection = db.session.connection()
+            segment, boundaries = [], []
+            for conversation, record in self.messages:
+                row = {
+                    'conversation_id': conversation['id'],
+                    'role': record['role'],
+                    'content': record['content'],
+                    'timestamp': _parse_datetime(record.get('timestamp'))
+                }
+                if not conversation['summary_until_id'] or record.get('id') != conversation['summary_until_id']:
+                    segment.append(row)
+                    continue
+
+                # El resumen cubre hasta este mensaje: insertarlo aparte para
+                # conocer su id nuevo (RETURNING en bloque iría fila a fila)
+                if segment:
+                    connection.execute(insert(messages), segment)
+                    segment = []
+                new_id = connection.execute(insert(messages).values(**row).returning(messages.c.id)).scalar_one()
+                boundaries.append({'conversation_id': conversation['id'], 'until': new_id})
+
+            if segment:
+                connection.execute(insert(messages), segment)
+            self.stats['messages'] += len(self.messages)
+
+            if boundaries:
+                # updated_at explícito: si no, el onupdate lo pondría a la hora actual
+                connection.execute(
+                    update(conversations)
+                    .where(conversations.c.id == bindparam('conversation_id'))
+                    .values(summary_until_id=bindparam('until'), updated_at=conversations.c.updated_at),
+                    boundaries
+                )
+
+        db.session.commit()
+        # Solo la conversación en curso puede recibir más mensajes
+        self.conversations = [self.current] if self.current is not None else []
+        self.messages = []
+
+def import_records(records, user_id=None, batch_size=None):
+    """Importar registros de una exportación; devuelve contadores
+
+    Con ``user_id`` todo se asigna a ese usuario; si no, cada conversación va
+    al usuario con el email indicado (las de usuarios inexistentes se omiten).
+    """
+    batch_size = batch_size or current_app.config['IMPORT_BATCH_SIZE']
+    importer = _Importer(user_id, batch_size)
+
+    for number, record in enumerate(records, start=1):
+        if number == 1 and (record.get('type') != 'export' or record.get('version') != FORMAT_VERSION):
+            raise ImportFormatError('Missing or unsupported export header')
+        importer.add(record)
+
+    importer.flush()
+    return importer.stats
+
+def read_records(lines):
+    """Decodificar las líneas JSONL (se ignoran las vacías)"""
+    for number, line in enumerate(lines, start=1):
+        if not line.strip():
+            continue
+        try:
+            yield json.loads(line)
+        except ValueError:
+            raise ImportFormatError(f'Invalid JSON on line {number}')
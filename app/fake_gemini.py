@@ -0,0 +1,85 @@
+import random
+import threading
+import time
+
+class FakeUpstreamError(Exception):
+    """Error simulado de la API con código HTTP (como los de google.api_core)"""
+    
+    def __init__(self, code=503, message='Service unavailable (simulated)'):
+        self.code = code
+        super().__init__(message)
+
+class FakeResponse:
+    """Respuesta mínima compatible con la de google.generativeai"""
+    
+    def __init__(self, text):
+        self.text = text
+
+class FakeGeminiModel:
+    """Modelo local que imita a genai.GenerativeModel sin llamar a la API
+
+    Útil para tests y pruebas de carga: responde con un texto fijo (o un eco
+    del prompt) tras esperar ``latency`` segundos, de forma que simula una
+    llamada de red lenta.
+
+    También puede inyectar fallos: ``fail_times`` hace fallar las primeras N
+    llamadas, ``error_rate`` falla al azar con esa probabilidad (``error``
+    es la excepción o la fábrica de excepciones a lanzar) y, con
+    ``tail_rate``, una fracción de llamadas tarda ``tail_latency`` en lugar de
+    ``latency`` para simular la cola lenta de latencias.
+    """
+    
+    def __init__(self, reply=None, latency=0.0, chunk_size=4, error_rate=0.0, fail_times=0,
+                 error=None, tail_rate=0.0, tail_latency=0.0, seed=None):
+        self.reply = reply
+        self.latency = latency
+        self.chunk_size = chunk_size
+        self.error_rate = error_rate
+        self.fail_times = fail_times
+        self.error = error or FakeUpstreamError
+        self.tail_rate = tail_rate
+        self.tail_latency = tail_latency
+        self.calls = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+    
+    def _next_call(self):
+        """Registrar la llamada y decidir su latencia y si debe fallar"""
+        with self._lock:
+            self.calls += 1
+            fails = self.calls <= self.fail_times or self._random.random() < self.error_rate
+            slow = self.tail_rate and self._random.random() < self.tail_rate
+        
+        latency = self.tail_latency if slow else self.latency
+        if fails:
+            if latency:
+                time.sleep(latency)
+            raise self.error() if callable(self.error) else self.error
+        return latency
+    
+    def _reply_for(self, prompt):
+        if self.reply is not None:
+            return self.reply
+        last_line = str(prompt).strip().splitlines()[-1] if str(prompt).strip() else ''
+        return f"Respuesta simulada a: {last_line[:200]}"
+    
+    def generate_content(self, prompt, stream=False, **kwargs):
+        """Generar una respuesta simulada (o un iterador de fragmentos si stream=True)"""
+        latency = self._next_call()
+        text = self._reply_for(prompt)
+        
+        if stream:
+            return self._stream(text, latency)
+        
+        if latency:
+            time.sleep(latency)
+        return FakeResponse(text)
+    
+    def _stream(self, text, latency):
+        words = text.split(' ')
+        chunks = [' '.join(words[i:i + self.chunk_size]) for i in range(0, len(words), self.chunk_size)]
+        delay = latency / max(len(chunks), 1)
+        for index, chunk in enumerate(chunks):
+            if delay:
+                time.sleep(delay)
+            yield FakeResponse(chunk if index == len(chunks) - 1 else chunk + ' ')
@@ -0,0 +1,118 @@
+import json
+import threading
+import google.generativeai as genai
+from app.fake_gemini import FakeGeminiModel
+from app.resilience import CircuitBreaker, ResilientModel, make_executor
+
+def _config_key(generation_config):
+    """Clave hashable para una configuración de generación (dict o None)"""
+    if not generation_config:
+        return None
+    return json.dumps(generation_config, sort_keys=True, default=str)
+
+class ModelRegistry:
+    """Registro de modelos de Gemini compartidos por todo el proceso
+
+    ``genai.configure`` se llama una sola vez en ``init_app`` y los
+    ``GenerativeModel`` se construyen una vez por (nombre, configuración de
+    generación) y se reutilizan en todas las peticiones, junto con el cliente
+    y las conexiones que la librería mantiene por debajo.
+
+    Para tests se puede inyectar un modelo local con ``use_model()`` o una
+    fábrica con ``set_factory()``; con ``GEMINI_FAKE_MODEL`` se usa
+    ``FakeGeminiModel`` sin necesidad de API key.
+
+    Salvo con ``GEMINI_RESILIENCE_ENABLED`` desactivado, cada modelo se
+    entrega envuelto en ``ResilientModel`` (plazos, reintentos y un
+    cortocircuito compartido por todas las configuraciones del mismo modelo).
+    """
+    
+    def __init__(self, app=None):
+        self.app = None
+        self._models = {}
+        self._factory = None
+        self._breakers = {}
+        self._executor = None
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+    
+    def init_app(self, app):
+        self.app = app
+        self._models = {}
+        self._factory = None
+        self._breakers = {}
+        app.extensions['model_registry'] = self
+        
+        if app.config.get('GEMINI_RESILIENCE_ENABLED', True) and self._executor is None:
+            self._executor = make_executor(app.config)
+        
+        if app.config.get('GEMINI_FAKE_MODEL'):
+            latency = app.config.get('GEMINI_FAKE_LATENCY', 0.0)
+            error_rate = app.config.get('GEMINI_FAKE_ERROR_RATE', 0.0)
+            self._factory = lambda model_name, generation_config: FakeGeminiModel(
+                latency=latency, error_rate=error_rate
+            )
+        
+        api_key = app.config.get('GEMINI_API_KEY')
+        if api_key:
+            transport = app.config.get('GEMINI_TRANSPORT')
+            if transport:
+                genai.configure(api_key=api_key, transport=transport)
+            else:
+                genai.configure(api_key=api_key)
+        
+        # Construir por adelantado el modelo por defecto
+        if api_key or self._factory:
+            self.get(app.config['GEMINI_DEFAULT_MODEL'])
+    
+    def set_factory(self, factory):
+        """Inyectar una fábrica ``factory(model_name, generation_config)`` de modelos"""
+        with self._lock:
+            self._factory = factory
+            self._models = {}
+    
+    def use_model(self, model):
+        """Usar siempre el mismo modelo (p. ej. un modelo falso en tests)"""
+        self.set_factory(lambda model_name, generation_config: model)
+    
+    def get(self, model_name=None, generation_config=None):
+        """Obtener (o construir la primera vez) el modelo indicado"""
+        model_name = model_name or self.app.config['GEMINI_DEFAULT_MODEL']
+        key = (model_name, _config_key(generation_config))
+        
+        model = self._models.get(key)
+        if model is not None:
+            return model
+        
+        with self._lock:
+            model = self._models.get(key)
+            if model is None:
+                model = self._build(model_name, generation_config)
+                self._models[key] = model
+        return model
+    
+    def breaker(self, model_name):
+        """Cortocircuito compartido por todas las instancias de un modelo"""
+        breaker = self._breakers.get(model_name)
+        if breaker is None:
+            config = self.app.config
+            breaker = self._breakers.setdefault(model_name, CircuitBreaker(
+                window=config.get('GEMINI_BREAKER_WINDOW', 20),
+                min_calls=config.get('GEMINI_BREAKER_MIN_CALLS', 10),
+                error_rate=config.get('GEMINI_BREAKER_ERROR_RATE', 0.5),
+                open_seconds=config.get('GEMINI_BREAKER_OPEN_SECONDS', 30.0)
+            ))
+        return breaker
+    
+    def _build(self, model_name, generation_config):
+        if self._factory is not None:
+            model = self._factory(model_name, generation_config)
+        elif not self.app.config.get('GEMINI_API_KEY'):
+            raise ValueError('GEMINI_API_KEY not found in configuration')
+        else:
+            model = genai.GenerativeModel(model_name, generation_config=generation_config)
+        
+        if self._executor is None:
+            return model
+        return ResilientModel(model, self.breaker(model_name), self._executor, self.app.config)
@@ -0,0 +1,121 @@
+"""Identidad del usuario en los tokens y caché de usuarios
+
+Los tokens llevan, además del id, ``username``, ``is_active`` y ``ver`` (la
+``token_version`` del usuario). En cada petición autenticada se comprueba
+contra una copia del usuario guardada en memoria del proceso durante
+``USER_CACHE_TTL`` segundos, así que las rutas de chat no leen la tabla users
+salvo al caducar la entrada. Un token deja de valer cuando el usuario se
+desactiva o su ``token_version`` cambia (``revoke_tokens``); en el proceso que
+hace el cambio es inmediato y en los demás tarda como mucho ``USER_CACHE_TTL``.
+"""
+import threading
+from sqlalchemy import select, update
+from app.cache import MemoryCacheTier
+from app.metrics import count_event
+
+def token_claims(user):
+    """Claims adicionales del token a partir de un usuario en caché"""
+    return {
+        'username': user['username'],
+        'is_active': user['is_active'],
+        'ver': user['token_version']
+    }
+
+class UserCache:
+    """Copias de los usuarios en memoria con caducidad (TTL)"""
+
+    def __init__(self, app=None):
+        self.memory = None
+        self._stats_lock = threading.Lock()
+        self.reset_stats()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        config = app.config
+        self.memory = MemoryCacheTier(config.get('USER_CACHE_MAX_ENTRIES', 10000), config.get('USER_CACHE_TTL', 60))
+        app.extensions['user_cache'] = self
+
+    @staticmethod
+    def snapshot(user):
+        """Datos del usuario que se guardan en caché (lo de ``to_dict`` y la versión)"""
+        data = user.to_dict() if hasattr(user, 'to_dict') else {
+            'id': user.id,
+            'username': user.username,
+            'email': user.email,
+            'created_at': user.created_at.isoformat(),
+            'is_active': user.is_active
+        }
+        data['token_version'] = user.token_version or 0
+        return data
+
+    def store(self, user):
+        """Guardar (o refrescar) un usuario recién leído; devuelve su copia"""
+        data = self.snapshot(user)
+        self.memory.set(data['id'], data)
+        return data
+
+    def get(self, user_id):
+        """Usuario en caché o leído de la base de datos; None si no existe"""
+        from app import db
+        from app.models import User
+
+        user_id = int(user_id)
+        data = self.memory.get(user_id)
+        if data is not None:
+            self._count('hits')
+            return data
+
+        self._count('misses')
+        users = User.__table__
+        row = db.session.execute(
+            select(users.c.id, users.c.username, users.c.email, users.c.created_at,
+                   users.c.is_active, users.c.token_version)
+            .where(users.c.id == user_id)
+        ).first()
+        if row is None:
+            return None
+        return self.store(row)
+
+    def invalidate(self, user_id):
+        self.memory.delete(int(user_id))
+
+    def revoke_tokens(self, user_id):
+        """Invalidar todos los tokens emitidos a un usuario (sube su token_version)"""
+        from app import db
+        from app.models import User
+
+        users = User.__table__
+        db.session.execute(
+            update(users).where(users.c.id == int(user_id)).values(token_version=users.c.token_version + 1)
+        )
+        db.session.commit()
+        self.invalidate(user_id)
+
+    def token_revoked(self, jwt_header, jwt_payload):
+        """Cargador de flask-jwt-extended: True si el token ya no es válido"""
+        user = self.get(jwt_payload['sub'])
+        if user is None or not user['is_active']:
+            return True
+        # Los tokens emitidos antes de existir la claim equivalen a la versión 0
+        return jwt_payload.get('ver', 0) != user['token_version']
+
+    def clear(self):
+        if self.memory is not None:
+            self.memory.clear()
+
+    def _count(self, name):
+        with self._stats_lock:
+            self._stats[name] += 1
+        count_event('user_cache', name)
+
+    def reset_stats(self):
+        self._stats = {'hits': 0, 'misses': 0}
+
+    def stats(self):
+        with self._stats_lock:
+            stats = dict(self._stats)
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_rate'] = stats['hits'] / lookups if lookups else 0.0
+        stats['entries'] = len(self.memory) if self.memory is not None else 0
+        return stats
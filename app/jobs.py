@@ -0,0 +1,165 @@
+import json
+import random
+import threading
+from datetime import datetime, timedelta
+from sqlalchemy import or_, and_
+
+class JobQueue:
+    """Cola de trabajos en segundo plano persistida en la tabla ``jobs``
+
+    Los trabajos se encolan dentro de la misma transacción que los genera y un
+    pool de hilos del propio proceso los ejecuta. Como el estado vive en la base
+    de datos, los trabajos sobreviven a reinicios y varios workers de gunicorn
+    pueden compartir la cola: cada trabajo se reclama con un UPDATE condicional
+    y, si un worker muere, se recupera cuando expira su ``JOB_LEASE_SECONDS``.
+    Los fallos se reintentan con backoff exponencial hasta ``max_attempts``.
+    """
+
+    def __init__(self, app=None):
+        self.handlers = {}
+        self.app = None
+        self._threads = []
+        self._wakeup = threading.Event()
+        self._start_lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        app.extensions['job_queue'] = self
+
+        # Los workers arrancan con la primera petición (no en comandos CLI)
+        @app.before_request
+        def _start_job_workers():
+            self.start()
+
+    def handler(self, kind):
+        """Decorador para registrar la función que procesa un tipo de trabajo"""
+        def decorator(func):
+            self.handlers[kind] = func
+            return func
+        return decorator
+
+    def enqueue(self, kind, payload, user_id=None, max_attempts=None):
+        """Añadir un trabajo a la sesión actual (se guarda con el siguiente commit)"""
+        from app import db
+        from app.models import Job
+
+        job = Job(
+            kind=kind,
+            payload=json.dumps(payload),
+            user_id=user_id,
+            max_attempts=max_attempts or self.app.config['JOB_MAX_ATTEMPTS'],
+            run_at=datetime.utcnow()
+        )
+        db.session.add(job)
+        return job
+
+    def notify(self):
+        """Despertar a los workers tras hacer commit de trabajos nuevos"""
+        self._wakeup.set()
+
+    def start(self):
+        """Arrancar el pool de hilos si no está en marcha"""
+        if self._threads or self.app.config['JOB_WORKERS'] <= 0:
+            return
+
+        with self._start_lock:
+            if self._threads:
+                return
+            for index in range(self.app.config['JOB_WORKERS']):
+                thread = threading.Thread(target=self._worker_loop, name=f'job-worker-{index}', daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def _worker_loop(self):
+        poll_interval = self.app.config['JOB_POLL_INTERVAL']
+        while True:
+            # Limpiar antes de mirar la cola, no después de esperar: un notify()
+            # que llegue mientras tanto deja el evento activo y wait() no se lo pierde
+            self._wakeup.clear()
+            try:
+                processed = self.run_pending(max_jobs=10)
+            except Exception as e:
+                self.app.logger.error(f"Error en worker de trabajos: {e}")
+                processed = 0
+
+            if not processed:
+                self._wakeup.wait(poll_interval)
+
+    def run_pending(self, max_jobs=None):
+        """Ejecutar trabajos pendientes en este hilo; devuelve cuántos procesó"""
+        processed = 0
+        while max_jobs is None or processed < max_jobs:
+            with self.app.app_context():
+                job_id = self._claim_next()
+                if job_id is None:
+                    break
+                self._execute(job_id)
+            processed += 1
+        return processed
+
+    def _claim_next(self):
+        """Reclamar el siguiente trabajo disponible con un UPDATE condicional"""
+        from app import db
+        from app.models import Job
+
+        now = datetime.utcnow()
+        lease_expired = now - timedelta(seconds=self.app.config['JOB_LEASE_SECONDS'])
+        available = or_(
+            and_(Job.status == 'pending', Job.run_at <= now),
+            and_(Job.status == 'running', Job.locked_at < lease_expired)
+        )
+
+        for _ in range(5):
+            candidate = db.session.query(Job.id).filter(available).order_by(Job.run_at.asc()).first()
+            if candidate is None:
+                db.session.rollback()
+                return None
+
+            claimed = Job.query.filter(Job.id == candidate.id, available).update({
+                'status': 'running',
+                'locked_at': now,
+                'attempts': Job.attempts + 1
+            }, synchronize_session=False)
+            db.session.commit()
+
+            if claimed:
+                return candidate.id
+            # Otro worker lo reclamó primero: probar con el siguiente
+        return None
+
+    def _execute(self, job_id):
+        from app import db
+        from app.models import Job
+
+        job = db.session.get(Job, job_id)
+        handler = self.handlers.get(job.kind)
+
+        try:
+            if handler is None:
+                raise ValueError(f'No handler registered for job kind {job.kind}')
+            result = handler(json.loads(job.payload))
+            job.status = 'done'
+            job.result = json.dumps(result) if result is not None else None
+            job.last_error = None
+            db.session.commit()
+
+        except Exception as e:
+            db.session.rollback()
+            job = db.session.get(Job, job_id)
+            job.last_error = str(e)
+            if job.attempts >= job.max_attempts:
+                job.status = 'failed'
+                self.app.logger.error(f"Trabajo {job.id} ({job.kind}) falló definitivamente: {e}")
+            else:
+                job.status = 'pending'
+                job.run_at = datetime.utcnow() + timedelta(seconds=self._backoff(job.attempts))
+            job.locked_at = None
+            db.session.commit()
+
+    def _backoff(self, attempts):
+        """Espera antes del siguiente intento: exponencial con jitter"""
+        base = self.app.config['JOB_RETRY_BASE_DELAY']
+        delay = min(base * (2 ** (attempts - 1)), self.app.config['JOB_RETRY_MAX_DELAY'])
+        return delay * random.uniform(0.5, 1.0)
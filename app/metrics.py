@@ -0,0 +1,178 @@
+"""Métricas de Prometheus (requiere prometheus_client)
+
+``GET /metrics`` expone en formato de texto de Prometheus:
+
+- ``http_request_duration_seconds``: latencia por endpoint (``blueprint.vista``),
+  método y código. En las respuestas en streaming mide hasta que la vista
+  devuelve la respuesta, no hasta el último fragmento.
+- ``gemini_request_duration_seconds`` y ``gemini_prompt_chars``: cada intento
+  contra un modelo (resultado ``ok`` o ``error``) y el tamaño del prompt.
+- ``db_query_duration_seconds`` por tipo de sentencia, y consultas y tiempo de
+  base de datos por petición (``db_queries_per_request``,
+  ``db_time_per_request_seconds``).
+- ``cache_events_total``: aciertos, fallos y escrituras de cada caché; la tasa
+  de aciertos se calcula en la consulta (``rate(hits) / rate(hits + misses)``).
+
+Con gunicorn hay que definir ``PROMETHEUS_MULTIPROC_DIR`` (un directorio vacío
+al arrancar): cada worker escribe sus valores en ficheros mmap de ese
+directorio y ``/metrics`` los suma, atienda el worker que atienda la petición.
+Cada observación cuesta unos microsegundos. Sin prometheus_client, o con
+``METRICS_ENABLED`` desactivado, las funciones de este módulo no hacen nada.
+"""
+import os
+import time
+from flask import Response, g, has_request_context, jsonify, request
+from sqlalchemy import event
+
+try:
+    import prometheus_client
+except ImportError:
+    prometheus_client = None
+
+REQUEST_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+GEMINI_BUCKETS = (0.1, 0.25, 0.5, 1, 2, 4, 8, 15, 30, 60)
+PROMPT_BUCKETS = (256, 1024, 2048, 4096, 8192, 16384, 32768, 65536, 131072)
+QUERY_BUCKETS = (0.0001, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.5, 1)
+QUERIES_PER_REQUEST_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 100)
+
+_OPERATIONS = ('select', 'insert', 'update', 'delete')
+
+# Objetos de métricas del proceso (se crean una vez, aunque haya varias apps)
+_metrics = None
+_enabled = False
+# Series ya resueltas por etiquetas: evita el ``labels()`` (y su lock) en cada observación
+_children = {}
+
+def _create_metrics():
+    from prometheus_client import Counter, Histogram
+
+    return {
+        'request_duration': Histogram(
+            'http_request_duration_seconds', 'Duración de las peticiones HTTP',
+            ['endpoint', 'method', 'status'], buckets=REQUEST_BUCKETS
+        ),
+        'gemini_duration': Histogram(
+            'gemini_request_duration_seconds', 'Duración de cada intento contra un modelo de Gemini',
+            ['model', 'outcome'], buckets=GEMINI_BUCKETS
+        ),
+        'prompt_chars': Histogram(
+            'gemini_prompt_chars', 'Tamaño en caracteres de los prompts enviados a Gemini',
+            ['model'], buckets=PROMPT_BUCKETS
+        ),
+        'query_duration': Histogram(
+            'db_query_duration_seconds', 'Duración de cada sentencia SQL',
+            ['operation'], buckets=QUERY_BUCKETS
+        ),
+        'queries_per_request': Histogram(
+            'db_queries_per_request', 'Sentencias SQL por petición HTTP',
+            ['endpoint'], buckets=QUERIES_PER_REQUEST_BUCKETS
+        ),
+        'db_time_per_request': Histogram(
+            'db_time_per_request_seconds', 'Tiempo total en la base de datos por petición HTTP',
+            ['endpoint'], buckets=REQUEST_BUCKETS
+        ),
+        'cache_events': Counter(
+            'cache_events_total', 'Eventos de las cachés (aciertos, fallos, escrituras...)',
+            ['cache', 'event']
+        ),
+    }
+
+def _child(metric, *labels):
+    key = (metric,) + labels
+    child = _children.get(key)
+    if child is None:
+        child = _children[key] = _metrics[metric].labels(*labels)
+    return child
+
+def count_event(cache, name):
+    """Contar un evento de una caché (``hits``, ``misses``, ``sets``...)"""
+    if _enabled:
+        _child('cache_events', cache, name).inc()
+
+def observe_gemini(model_name, seconds, success):
+    """Registrar la duración de un intento contra un modelo"""
+    if _enabled:
+        _child('gemini_duration', model_name, 'ok' if success else 'error').observe(seconds)
+
+def observe_prompt(model_name, prompt):
+    """Registrar el tamaño de un prompt enviado a un modelo"""
+    if _enabled:
+        _child('prompt_chars', model_name).observe(len(prompt))
+
+def _operation(statement):
+    word = statement.lstrip()[:6].lower()
+    return word if word in _OPERATIONS else 'other'
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('query_started', []).append(time.perf_counter())
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info['query_started'].pop()
+    elapsed = time.perf_counter() - started
+    _child('query_duration', _operation(statement)).observe(elapsed)
+    if has_request_context():
+        g.db_queries = g.get('db_queries', 0) + 1
+        g.db_time = g.get('db_time', 0.0) + elapsed
+
+def _handle_error(exception_context):
+    # La sentencia falló: retirar su marca de inicio
+    connection = exception_context.connection
+    if connection is not None and connection.info.get('query_started'):
+        connection.info['query_started'].pop()
+
+def _before_request():
+    g.request_started = time.perf_counter()
+    g.db_queries = 0
+    g.db_time = 0.0
+
+def _after_request(response):
+    started = g.get('request_started')
+    if started is not None:
+        endpoint = request.endpoint or 'unmatched'
+        _child('request_duration', endpoint, request.method, str(response.status_code)).observe(
+            time.perf_counter() - started
+        )
+        _child('queries_per_request', endpoint).observe(g.get('db_queries', 0))
+        _child('db_time_per_request', endpoint).observe(g.get('db_time', 0.0))
+    return response
+
+def metrics_view():
+    """Exposición en formato de texto de Prometheus"""
+    if not _enabled:
+        return jsonify({'error': 'Metrics are disabled'}), 503
+
+    from prometheus_client import CONTENT_TYPE_LATEST, CollectorRegistry, REGISTRY, generate_latest
+
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        # Sumar los ficheros de todos los workers
+        from prometheus_client import multiprocess
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return Response(generate_latest(registry), mimetype=CONTENT_TYPE_LATEST)
+
+def init_metrics(app):
+    """Registrar las métricas de la aplicación y la ruta ``/metrics``"""
+    global _metrics, _enabled
+
+    app.add_url_rule(app.config.get('METRICS_PATH', '/metrics'), 'metrics', metrics_view)
+    if not app.config.get('METRICS_ENABLED', True):
+        return
+    if prometheus_client is None:
+        app.logger.warning('METRICS_ENABLED requires prometheus_client; metrics disabled')
+        return
+
+    if _metrics is None:
+        _metrics = _create_metrics()
+    _enabled = True
+
+    app.before_request(_before_request)
+    app.after_request(_after_request)
+
+    from app import db
+    with app.app_context():
+        engine = db.engine
+    event.listen(engine, 'before_cursor_execute', _before_cursor_execute)
+    event.listen(engine, 'after_cursor_execute', _after_cursor_execute)
+    event.listen(engine, 'handle_error', _handle_error)
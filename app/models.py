@@ -1,6 +1,10 @@
+import json
 from datetime import datetime
-from werkzeug.security import generate_password_hash, check_password_hash
 from app import db
+from app.passwords import hash_password, password_needs_rehash, verify_password
+
+# Longitud de la vista previa del último mensaje en el listado
+PREVIEW_LENGTH = 200
 
 class User(db.Model):
     """Modelo de usuario"""
@@ -12,17 +16,23 @@ class User(db.Model):
     password_hash = db.Column(db.String(255), nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     is_active = db.Column(db.Boolean, default=True)
+    # Se incrementa para invalidar todos los tokens emitidos al usuario
+    token_version = db.Column(db.Integer, nullable=False, default=0, server_default='0')
     
     # Relación con conversaciones
     conversations = db.relationship('Conversation', backref='user', lazy=True, cascade='all, delete-orphan')
     
     def set_password(self, password):
         """Establecer contraseña hasheada"""
-        self.password_hash = generate_password_hash(password)
+        self.password_hash = hash_password(password)
     
     def check_password(self, password):
         """Verificar contraseña"""
-        return check_password_hash(self.password_hash, password)
+        return verify_password(self.password_hash, password)
+    
+    def password_needs_rehash(self):
+        """True si el hash se generó con otro método o coste que el actual"""
+        return password_needs_rehash(self.password_hash)
     
     def to_dict(self):
         """Convertir a diccionario para JSON"""
@@ -34,9 +44,20 @@ class User(db.Model):
             'is_active': self.is_active
         }
 
+class UsernameCounter(db.Model):
+    """Último sufijo asignado a cada base de username (info, info1, info2...)"""
+    __tablename__ = 'username_counters'
+    
+    base = db.Column(db.String(80), primary_key=True)
+    last_suffix = db.Column(db.Integer, nullable=False, default=0)
+
 class Conversation(db.Model):
     """Modelo de conversación con Gemini"""
     __tablename__ = 'conversations'
+    __table_args__ = (
+        # Paginación por cursor del listado: (updated_at, id) por usuario
+        db.Index('ix_conversations_user_updated_id', 'user_id', 'updated_at', 'id'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
@@ -44,8 +65,23 @@ class Conversation(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
+    # Resumen de los mensajes que ya no caben en la ventana de contexto
+    summary = db.Column(db.Text, nullable=True)
+    summary_until_id = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    
+    # Datos desnormalizados para listar conversaciones sin leer sus mensajes
+    message_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    last_message_preview = db.Column(db.String(PREVIEW_LENGTH), nullable=True)
+    
+    # Modelo de Gemini elegido para la conversación (None: selección automática)
+    model = db.Column(db.String(50), nullable=True)
+    
+    # Fecha de archivo: sus mensajes están en conversation_archives, no en messages
+    archived_at = db.Column(db.DateTime, nullable=True)
+    
     # Relación con mensajes
     messages = db.relationship('Message', backref='conversation', lazy=True, cascade='all, delete-orphan')
+    archive = db.relationship('ConversationArchive', uselist=False, lazy=True, cascade='all, delete-orphan')
     
     def to_dict(self):
         """Convertir a diccionario para JSON"""
@@ -54,12 +90,19 @@ class Conversation(db.Model):
             'title': self.title,
             'created_at': self.created_at.isoformat(),
             'updated_at': self.updated_at.isoformat(),
-            'message_count': len(self.messages)
+            'message_count': self.message_count,
+            'last_message_preview': self.last_message_preview,
+            'model': self.model,
+            'archived': self.archived_at is not None
         }
 
 class Message(db.Model):
     """Modelo de mensaje individual en una conversación"""
     __tablename__ = 'messages'
+    __table_args__ = (
+        # Paginación por cursor de los mensajes: (timestamp, id) por conversación
+        db.Index('ix_messages_conversation_timestamp_id', 'conversation_id', 'timestamp', 'id'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     conversation_id = db.Column(db.Integer, db.ForeignKey('conversations.id'), nullable=False)
@@ -74,4 +117,46 @@ class Message(db.Model):
             'content': self.content,
             'role': self.role,
             'timestamp': self.timestamp.isoformat()
-        } 
\ No newline at end of file
+        } 
+
+class ConversationArchive(db.Model):
+    """Mensajes de una conversación archivada (lista JSON comprimida con zlib)"""
+    __tablename__ = 'conversation_archives'
+    
+    conversation_id = db.Column(db.Integer, db.ForeignKey('conversations.id'), primary_key=True)
+    data = db.Column(db.LargeBinary, nullable=False)
+    message_count = db.Column(db.Integer, nullable=False)
+    archived_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+class Job(db.Model):
+    """Trabajo en segundo plano (cola persistente en base de datos)"""
+    __tablename__ = 'jobs'
+    __table_args__ = (
+        db.Index('ix_jobs_status_run_at', 'status', 'run_at'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(50), nullable=False)
+    payload = db.Column(db.Text, nullable=False, default='{}')
+    status = db.Column(db.String(20), nullable=False, default='pending')  # pending, running, done, failed
+    user_id = db.Column(db.Integer, nullable=True, index=True)
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    max_attempts = db.Column(db.Integer, nullable=False, default=5)
+    run_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    locked_at = db.Column(db.DateTime, nullable=True)
+    last_error = db.Column(db.Text, nullable=True)
+    result = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    def to_dict(self):
+        """Convertir a diccionario para JSON"""
+        return {
+            'id': self.id,
+            'kind': self.kind,
+            'status': self.status,
+            'attempts': self.attempts,
+            'result': json.loads(self.result) if self.result else None,
+            'created_at': self.created_at.isoformat(),
+            'updated_at': self.updated_at.isoformat()
+        }
\ No newline at end of file
@@ -0,0 +1,224 @@
+"""Hash y verificación de contraseñas
+
+``PASSWORD_HASH_METHOD`` fija el algoritmo y su coste con la sintaxis de
+werkzeug (``pbkdf2:sha256:600000``, ``scrypt:32768:8:1``...). Al iniciar
+sesión con un hash creado con otros parámetros se vuelve a calcular con los
+actuales (``needs_rehash``), así que cambiar el coste no obliga a nadie a
+cambiar la contraseña. ``calibrate_method`` propone un número de iteraciones
+para un tiempo objetivo en la máquina actual (``flask calibrate-password-hash``).
+
+El cálculo es CPU pura y dura decenas o cientos de milisegundos: con
+``PASSWORD_HASH_WORKERS`` > 0 se hace en un pool de procesos acotado, y como
+mucho ``PASSWORD_HASH_MAX_PENDING`` operaciones esperan turno; si no hay hueco
+en ``PASSWORD_HASH_TIMEOUT`` segundos se responde 503 en lugar de acumular
+peticiones. Las verificaciones correctas se recuerdan ``PASSWORD_CACHE_TTL``
+segundos en memoria del proceso, con una clave HMAC aleatoria que nunca sale
+de él: repetir el login con la misma contraseña y el mismo hash no recalcula.
+
+Los procesos del pool se crean con ``spawn`` (no heredan los hilos del
+worker), así que importan el script principal: gunicorn, ``flask`` y
+``run.py`` ya lo protegen con ``if __name__ == '__main__'``.
+"""
+import hashlib
+import hmac
+import math
+import multiprocessing
+import os
+import threading
+import time
+from functools import lru_cache
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from flask import current_app, jsonify
+from werkzeug.security import check_password_hash, generate_password_hash
+from app.cache import MemoryCacheTier
+from app.metrics import count_event
+
+# Mínimo que acepta calibrate_method para PBKDF2-SHA256
+MIN_PBKDF2_ITERATIONS = 100000
+
+class PasswordHashBusy(Exception):
+    """No hay hueco en el pool de hash dentro del plazo"""
+    code = 503
+
+    def __init__(self, retry_after):
+        self.retry_after = retry_after
+        super().__init__('Password hashing pool is busy')
+
+def hash_method(stored_hash):
+    """Método y parámetros de un hash de werkzeug (lo anterior al primer '$')"""
+    return stored_hash.split('$', 1)[0]
+
+@lru_cache(maxsize=None)
+def normalize_method(method):
+    """Método completo con los parámetros por defecto que werkzeug rellena
+
+    Se obtiene calculando un hash de prueba (una vez por proceso y método).
+    """
+    return hash_method(generate_password_hash('', method=method))
+
+def calibrate_method(target_ms, minimum=MIN_PBKDF2_ITERATIONS):
+    """Iteraciones de PBKDF2-SHA256 que tardan ~``target_ms`` en esta máquina"""
+    probe = 50000
+    started = time.perf_counter()
+    hashlib.pbkdf2_hmac('sha256', b'calibration', os.urandom(16), probe)
+    elapsed = time.perf_counter() - started
+
+    iterations = int(probe * (target_ms / 1000.0) / elapsed)
+    # Múltiplos de 10000 para que dos calibraciones parecidas den el mismo valor
+    iterations = max(minimum, iterations // 10000 * 10000)
+    return f'pbkdf2:sha256:{iterations}'
+
+class PasswordHasher:
+    """Política de coste, pool de procesos y caché de verificaciones"""
+
+    def __init__(self, app=None):
+        self.method = None
+        self.workers = 0
+        self.timeout = 5.0
+        self.cache = None
+        self._executor = None
+        self._executor_lock = threading.Lock()
+        self._slots = None
+        self._key = os.urandom(32)
+        self._stats_lock = threading.Lock()
+        self.reset_stats()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        config = app.config
+        # Vacío: el método por defecto de werkzeug
+        self.method = config.get('PASSWORD_HASH_METHOD') or 'pbkdf2'
+        self.workers = config.get('PASSWORD_HASH_WORKERS', 0)
+        self.timeout = config.get('PASSWORD_HASH_TIMEOUT', 5.0)
+        # Operaciones admitidas a la vez (en ejecución más en cola)
+        self._slots = threading.BoundedSemaphore(max(self.workers, 1) + config.get('PASSWORD_HASH_MAX_PENDING', 64))
+
+        self.cache = None
+        if config.get('PASSWORD_CACHE_ENABLED', True):
+            self.cache = MemoryCacheTier(config.get('PASSWORD_CACHE_MAX_ENTRIES', 10000), config.get('PASSWORD_CACHE_TTL', 300))
+
+        app.extensions['password_hasher'] = self
+
+    def _pool(self):
+        with self._executor_lock:
+            if self._executor is None:
+                # spawn: los procesos no heredan hilos ni conexiones del worker
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context('spawn')
+                )
+            return self._executor
+
+    def _run(self, func, *args):
+        """Ejecutar ``func`` en el pool (o aquí mismo sin pool) respetando el límite
+
+        La plaza se libera cuando el trabajo termina (o se cancela), no cuando
+        se deja de esperarlo: un hash que sigue en el pool tras el timeout
+        sigue contando para el límite.
+        """
+        if not self._slots.acquire(timeout=self.timeout):
+            self._count('rejected')
+            raise PasswordHashBusy(self.timeout)
+
+        if not self.workers:
+            try:
+                return func(*args)
+            finally:
+                self._slots.release()
+
+        try:
+            future = self._pool().submit(func, *args)
+        except BaseException:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeoutError:
+            future.cancel()
+            self._count('rejected')
+            raise PasswordHashBusy(self.timeout)
+
+    def _cache_key(self, stored_hash, password):
+        message = f'{stored_hash}\0{password}'.encode('utf-8')
+        return hmac.new(self._key, message, hashlib.sha256).hexdigest()
+
+    def hash(self, password):
+        """Hash con el método configurado"""
+        self._count('hashes')
+        return self._run(generate_password_hash, password, self.method)
+
+    def verify(self, stored_hash, password):
+        """Comprobar una contraseña; solo se cachean los aciertos"""
+        if not stored_hash:
+            return False
+
+        key = None
+        if self.cache is not None:
+            key = self._cache_key(stored_hash, password)
+            if self.cache.get(key):
+                self._count('cache_hits')
+                return True
+
+        self._count('verifications')
+        valid = self._run(check_password_hash, stored_hash, password)
+        if valid and key is not None:
+            self.cache.set(key, True)
+        return valid
+
+    def needs_rehash(self, stored_hash):
+        """True si el hash se creó con otro método o coste que el configurado"""
+        return hash_method(stored_hash) != normalize_method(self.method)
+
+    def shutdown(self):
+        with self._executor_lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+    def _count(self, name):
+        with self._stats_lock:
+            self._stats[name] += 1
+        count_event('password_hasher', name)
+
+    def reset_stats(self):
+        self._stats = {'hashes': 0, 'verifications': 0, 'cache_hits': 0, 'rejected': 0}
+
+    def stats(self):
+        with self._stats_lock:
+            stats = dict(self._stats)
+        stats['method'] = self.method
+        stats['workers'] = self.workers
+        return stats
+
+def _hasher():
+    return current_app.extensions.get('password_hasher')
+
+def hash_password(password):
+    """Hash de una contraseña con la política de la aplicación"""
+    hasher = _hasher()
+    return hasher.hash(password) if hasher else generate_password_hash(password)
+
+def password_needs_rehash(stored_hash):
+    """True si el hash no sigue la política actual"""
+    hasher = _hasher()
+    return hasher.needs_rehash(stored_hash) if hasher else False
+
+def verify_password(stored_hash, password):
+    """Comprobar una contraseña contra su hash"""
+    hasher = _hasher()
+    return hasher.verify(stored_hash, password) if hasher else check_password_hash(stored_hash, password)
+
+def password_busy_response(error):
+    """Respuesta 503 con la cabecera Retry-After"""
+    retry_after = max(1, math.ceil(error.retry_after))
+    response = jsonify({
+        'error': 'Server is busy, please try again later',
+        'retry_after': retry_after
+    })
+    response.status_code = 503
+    response.headers['Retry-After'] = str(retry_after)
+    return response
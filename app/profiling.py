@@ -0,0 +1,348 @@
+"""Perfilado por muestreo de peticiones (opcional, ``PROFILE_ENABLED``)
+
+Se perfila una fracción ``PROFILE_SAMPLE_RATE`` de las peticiones, y las que
+llevan la cabecera ``PROFILE_HEADER`` con el valor de ``PROFILE_TOKEN`` (sin
+token configurado la cabecera se ignora). Mientras dura la petición un hilo
+toma cada ``PROFILE_INTERVAL_MS`` la pila del hilo que la atiende
+(``sys._current_frames``): es un perfil de tiempo real, así que también
+aparecen las esperas a Gemini o a la base de datos. Las peticiones no
+perfiladas no pagan nada más que el sorteo.
+
+Cada captura se guarda en ``PROFILE_DIR`` en dos formatos, y sus datos (ruta,
+duración, tramos...) en ``<id>.meta.json``:
+
+- ``<id>.collapsed``: pilas colapsadas (``flamegraph.pl``, speedscope,
+  inferno...), una línea por pila con su número de muestras.
+- ``<id>.speedscope.json``: perfil ``sampled`` de https://www.speedscope.app
+  con las muestras en orden y su duración real.
+
+Cada muestra se asigna a un tramo según el primer marco reconocible desde la
+raíz de la pila: ``context`` (``app/context.py``), ``model`` (router, cliente
+de Gemini y espera a la llamada compartida), ``serialization`` (marshmallow,
+JSON y ``to_dict``), ``db`` (SQLAlchemy y drivers) u ``other``. Así las consultas
+de ``app/context.py`` cuentan como construcción del contexto; el tiempo
+total en la base de datos está en ``db_time_ms`` si las métricas están
+activas.
+
+El listado se lee del directorio, no de la memoria del proceso: con varios
+workers de gunicorn que comparten ``PROFILE_DIR`` se ven las capturas de
+todos. Se conservan las ``PROFILE_MAX_CAPTURES`` más recientes del
+directorio; cada captura nueva borra las que sobran.
+
+Con workers gevent el hilo de muestreo sería un greenlet más y no vería las
+demás pilas, así que el perfilado se desactiva.
+"""
+import json
+import os
+import random
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+from itertools import count
+from flask import g, request
+
+SPANS = ('context', 'db', 'serialization', 'model', 'other')
+
+# (fragmento de la ruta del fichero, tramo), comprobados en orden
+_SPAN_PATHS = (
+    (os.path.join('app', 'context.py'), 'context'),
+    (os.path.join('app', 'router.py'), 'model'),
+    (os.path.join('app', 'gemini.py'), 'model'),
+    (os.path.join('app', 'fake_gemini.py'), 'model'),
+    (os.path.join('app', 'singleflight.py'), 'model'),
+    (os.sep + os.path.join('google', ''), 'model'),
+    (os.sep + os.path.join('marshmallow', ''), 'serialization'),
+    (os.sep + os.path.join('json', ''), 'serialization'),
+    (os.path.join('app', 'schemas.py'), 'serialization'),
+    (os.sep + os.path.join('sqlalchemy', ''), 'db'),
+    (os.sep + os.path.join('psycopg2', ''), 'db'),
+    (os.sep + os.path.join('sqlite3', ''), 'db'),
+)
+
+# Endpoints que no se perfilan
+_SKIP_ENDPOINTS = ('static', 'metrics')
+
+# Ficheros de cada captura por formato
+_EXTENSIONS = {'meta': 'meta.json', 'collapsed': 'collapsed', 'speedscope': 'speedscope.json'}
+
+# Ids de captura válidos (fecha-hora-pid-n): nunca se construyen rutas con otros
+_CAPTURE_ID = re.compile(r'\d{8}-\d{6}-\d+-\d+')
+
+def _threads_patched():
+    """True si gevent ha sustituido los hilos por greenlets"""
+    try:
+        from gevent import monkey
+    except ImportError:
+        return False
+    return monkey.is_module_patched('threading')
+
+class StackSampler(threading.Thread):
+    """Hilo que toma la pila de otro hilo a intervalos regulares"""
+
+    def __init__(self, thread_id, interval):
+        super().__init__(name='profile-sampler', daemon=True)
+        self.thread_id = thread_id
+        self.interval = interval
+        self.frames = {}     # clave del marco -> índice
+        self.samples = []    # (tupla de índices desde la raíz, segundos)
+        self._stop_event = threading.Event()
+
+    def run(self):
+        last = time.perf_counter()
+        while not self._stop_event.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            now = time.perf_counter()
+            if frame is not None:
+                self.samples.append((self._stack(frame), now - last))
+            last = now
+
+    def _stack(self, frame):
+        stack = []
+        while frame is not None:
+            code = frame.f_code
+            key = (code.co_filename, code.co_name, code.co_firstlineno)
+            index = self.frames.get(key)
+            if index is None:
+                index = self.frames[key] = len(self.frames)
+            stack.append(index)
+            frame = frame.f_back
+        stack.reverse()
+        return tuple(stack)
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+class RequestProfiler:
+    """Perfilado de peticiones por muestreo y registro de las capturas recientes"""
+
+    def __init__(self, app=None):
+        self.enabled = False
+        self._ids = count(1)
+        self._short_paths = {}
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        config = app.config
+        self.enabled = config.get('PROFILE_ENABLED', False)
+        self.sample_rate = config.get('PROFILE_SAMPLE_RATE', 0.01)
+        self.header = config.get('PROFILE_HEADER', 'X-Profile')
+        self.token = config.get('PROFILE_TOKEN', '')
+        self.interval = config.get('PROFILE_INTERVAL_MS', 5) / 1000
+        self.directory = config.get('PROFILE_DIR', 'profiles')
+        self.max_captures = config.get('PROFILE_MAX_CAPTURES', 100)
+        app.extensions['request_profiler'] = self
+
+        if not self.enabled:
+            return
+        if _threads_patched():
+            app.logger.warning('PROFILE_ENABLED is not supported with gevent workers; profiling disabled')
+            self.enabled = False
+            return
+
+        os.makedirs(self.directory, exist_ok=True)
+        app.before_request(self._before_request)
+        app.after_request(self._after_request)
+        app.teardown_request(self._teardown_request)
+
+    def _wanted(self):
+        if request.endpoint is None or request.endpoint in _SKIP_ENDPOINTS or request.blueprint == 'admin':
+            return False
+        if self.token and request.headers.get(self.header) == self.token:
+            return True
+        return random.random() < self.sample_rate
+
+    def _before_request(self):
+        if not self._wanted():
+            return
+        sampler = StackSampler(threading.get_ident(), self.interval)
+        g.profile = {
+            'sampler': sampler,
+            'started': time.perf_counter(),
+            'started_at': datetime.utcnow()
+        }
+        sampler.start()
+
+    def _after_request(self, response):
+        profile = g.pop('profile', None)
+        if profile is None:
+            return response
+
+        profile.update({
+            'endpoint': request.endpoint,
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code
+        })
+        # Consultas y tiempo de base de datos de app.metrics (si está activo)
+        if 'db_time' in g:
+            profile['db_queries'] = g.db_queries
+            profile['db_time_ms'] = round(g.db_time * 1000, 3)
+
+        # En streaming la petición sigue hasta que se envía el último fragmento
+        if response.is_streamed:
+            response.call_on_close(lambda: self._finish(profile))
+        else:
+            self._finish(profile)
+        return response
+
+    def _teardown_request(self, exception):
+        # La vista lanzó una excepción sin after_request: parar el muestreo
+        profile = g.pop('profile', None)
+        if profile is not None:
+            profile['sampler'].stop()
+
+    def _finish(self, profile):
+        sampler = profile.pop('sampler')
+        sampler.stop()
+        duration = time.perf_counter() - profile.pop('started')
+
+        capture_id = f"{profile['started_at']:%Y%m%d-%H%M%S}-{os.getpid()}-{next(self._ids)}"
+        names = [None] * len(sampler.frames)
+        for key, index in sampler.frames.items():
+            names[index] = key
+        spans = self._spans(names, sampler.samples)
+
+        capture = {
+            'id': capture_id,
+            'endpoint': profile['endpoint'],
+            'method': profile['method'],
+            'path': profile['path'],
+            'status': profile['status'],
+            'started_at': profile['started_at'].isoformat(),
+            'duration_ms': round(duration * 1000, 3),
+            'samples': len(sampler.samples),
+            'spans_ms': {span: round(seconds * 1000, 3) for span, seconds in spans.items()}
+        }
+        for key in ('db_queries', 'db_time_ms'):
+            if key in profile:
+                capture[key] = profile[key]
+
+        try:
+            self._write(capture, names, sampler.samples, duration)
+            self._evict()
+        except OSError:
+            # Sin disco la captura se descarta, la petición no se ve afectada
+            pass
+
+    def _spans(self, names, samples):
+        """Segundos muestreados por tramo"""
+        span_of = [self._span_of(key) for key in names]
+        spans = dict.fromkeys(SPANS, 0.0)
+        for stack, seconds in samples:
+            span = 'other'
+            for index in stack:
+                if span_of[index] is not None:
+                    span = span_of[index]
+                    break
+            spans[span] += seconds
+        return spans
+
+    @staticmethod
+    def _span_of(key):
+        filename, name, _ = key
+        if name == 'to_dict':
+            return 'serialization'
+        for fragment, span in _SPAN_PATHS:
+            if fragment in filename:
+                return span
+        return None
+
+    def _label(self, key):
+        filename, name, line = key
+        return f'{name} ({self._short_path(filename)}:{line})'
+
+    def _short_path(self, filename):
+        """Ruta relativa a sys.path (``app/context.py``, ``sqlalchemy/orm/query.py``)"""
+        short = self._short_paths.get(filename)
+        if short is None:
+            short = filename
+            for prefix in sorted((path for path in sys.path if path), key=len, reverse=True):
+                if filename.startswith(prefix + os.sep):
+                    short = filename[len(prefix) + 1:]
+                    break
+            self._short_paths[filename] = short
+        return short
+
+    def _write(self, capture, names, samples, duration):
+        capture_id = capture['id']
+        labels = [self._label(key) for key in names]
+
+        stacks = Counter(stack for stack, _ in samples)
+        with open(self.path(capture_id, 'collapsed'), 'w', encoding='utf-8') as collapsed:
+            for stack, samples_count in stacks.items():
+                collapsed.write(';'.join(labels[index].replace(';', ',') for index in stack))
+                collapsed.write(f' {samples_count}\n')
+
+        speedscope = {
+            '$schema': 'https://www.speedscope.app/file-format-schema.json',
+            'shared': {'frames': [
+                {'name': name, 'file': self._short_path(filename), 'line': line}
+                for filename, name, line in names
+            ]},
+            'profiles': [{
+                'type': 'sampled',
+                'name': capture_id,
+                'unit': 'seconds',
+                'startValue': 0,
+                'endValue': duration,
+                'samples': [list(stack) for stack, _ in samples],
+                'weights': [seconds for _, seconds in samples]
+            }],
+            'name': capture_id,
+            'exporter': 'flask-gemini'
+        }
+        with open(self.path(capture_id, 'speedscope'), 'w', encoding='utf-8') as output:
+            json.dump(speedscope, output)
+
+        # Los datos, los últimos y con un rename atómico: el listado solo ve capturas completas
+        meta = self.path(capture_id, 'meta')
+        with open(meta + '.tmp', 'w', encoding='utf-8') as output:
+            json.dump(capture, output)
+        os.replace(meta + '.tmp', meta)
+
+    def _capture_ids(self):
+        """Ids de las capturas del directorio, de la más antigua a la más reciente"""
+        suffix = '.' + _EXTENSIONS['meta']
+        ids = [name[:-len(suffix)] for name in os.listdir(self.directory) if name.endswith(suffix)]
+        # El id empieza por la fecha y hora de la petición y termina con un contador del proceso
+        return sorted(ids, key=lambda capture_id: (capture_id.split('-')[:2], int(capture_id.rsplit('-', 1)[1])))
+
+    def _evict(self):
+        """Borrar las capturas más antiguas por encima de ``PROFILE_MAX_CAPTURES``"""
+        ids = self._capture_ids()
+        for capture_id in ids[:max(len(ids) - self.max_captures, 0)]:
+            # Otro worker puede estar borrándolas a la vez
+            for fmt in _EXTENSIONS:
+                try:
+                    os.remove(self.path(capture_id, fmt))
+                except OSError:
+                    pass
+
+    def path(self, capture_id, fmt):
+        return os.path.join(self.directory, f'{capture_id}.{_EXTENSIONS[fmt]}')
+
+    def get(self, capture_id):
+        """Datos de una captura, o None si no existe"""
+        if not _CAPTURE_ID.fullmatch(capture_id):
+            return None
+        try:
+            with open(self.path(capture_id, 'meta'), encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def slowest(self, limit=20):
+        """Capturas del directorio (de todos los procesos), de la más lenta a la más rápida
+
+        Devuelve las ``limit`` primeras y el total de capturas guardadas.
+        """
+        if not os.path.isdir(self.directory):
+            return [], 0
+        captures = [capture for capture in map(self.get, self._capture_ids()) if capture is not None]
+        captures.sort(key=lambda capture: capture['duration_ms'], reverse=True)
+        return captures[:limit], len(captures)
@@ -0,0 +1,215 @@
+import math
+import os
+import sqlite3
+import threading
+import time
+from collections import namedtuple
+from functools import wraps
+from flask import jsonify
+from flask_jwt_extended import get_jwt_identity
+
+# Capacidad máxima (ráfaga) y recarga en unidades por segundo
+Bucket = namedtuple('Bucket', ['capacity', 'rate'])
+
+class RateLimitExceeded(Exception):
+    """Se superó una cuota; ``retry_after`` son los segundos hasta poder reintentar"""
+    code = 429
+
+    def __init__(self, scope, budget, retry_after):
+        self.scope = scope
+        self.budget = budget
+        self.retry_after = retry_after
+        super().__init__(f'Rate limit exceeded ({scope} {budget})')
+
+def _refill(tokens, updated_at, bucket, now):
+    return min(bucket.capacity, tokens + max(now - updated_at, 0.0) * bucket.rate)
+
+class MemoryBucketStore:
+    """Cubetas en memoria del proceso (cada worker de gunicorn tiene las suyas)"""
+
+    def __init__(self):
+        self._state = {}
+        self._lock = threading.Lock()
+
+    def consume(self, charges, now):
+        """Descontar todas las cargas o ninguna; devuelve la carga que falló o None
+
+        ``charges`` es una lista de ``(clave, Bucket, cantidad)``.
+        """
+        with self._lock:
+            levels = []
+            for key, bucket, amount in charges:
+                tokens, updated_at = self._state.get(key, (bucket.capacity, now))
+                level = _refill(tokens, updated_at, bucket, now)
+                if level < amount:
+                    return key, bucket, amount, level
+                levels.append(level - amount)
+
+            for (key, _, _), level in zip(charges, levels):
+                self._state[key] = (level, now)
+            return None
+
+    def clear(self):
+        with self._lock:
+            self._state.clear()
+
+class SQLiteBucketStore:
+    """Cubetas en un fichero SQLite compartido por todos los workers
+
+    Cada comprobación es una transacción ``BEGIN IMMEDIATE`` corta: leer las
+    cubetas implicadas, recargarlas y escribirlas con un UPSERT. Los contadores
+    son efímeros, así que se usa ``synchronous=OFF``.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._connection().execute(
+            'CREATE TABLE IF NOT EXISTS rate_limit_buckets ('
+            'key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated_at REAL NOT NULL)'
+        )
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=OFF')
+            self._local.conn = conn
+        return conn
+
+    def consume(self, charges, now):
+        conn = self._connection()
+        keys = [key for key, _, _ in charges]
+
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            rows = conn.execute(
+                f'SELECT key, tokens, updated_at FROM rate_limit_buckets WHERE key IN ({",".join("?" * len(keys))})',
+                keys
+            ).fetchall()
+            state = {key: (tokens, updated_at) for key, tokens, updated_at in rows}
+
+            levels = []
+            for key, bucket, amount in charges:
+                tokens, updated_at = state.get(key, (bucket.capacity, now))
+                level = _refill(tokens, updated_at, bucket, now)
+                if level < amount:
+                    conn.execute('ROLLBACK')
+                    return key, bucket, amount, level
+                levels.append((key, level - amount, now))
+
+            conn.executemany(
+                'INSERT INTO rate_limit_buckets (key, tokens, updated_at) VALUES (?, ?, ?) '
+                'ON CONFLICT(key) DO UPDATE SET tokens = excluded.tokens, updated_at = excluded.updated_at',
+                levels
+            )
+            conn.execute('COMMIT')
+            return None
+        except BaseException:
+            if conn.in_transaction:
+                conn.execute('ROLLBACK')
+            raise
+
+    def clear(self):
+        self._connection().execute('DELETE FROM rate_limit_buckets')
+
+class RateLimiter:
+    """Cuotas por usuario y globales con cubetas de tokens (token bucket)
+
+    Se llevan por separado dos presupuestos: número de peticiones y tokens
+    estimados enviados a Gemini. Cada uno tiene una cubeta por usuario y otra
+    global para todo el servicio. Con ``RATE_LIMIT_DB_PATH`` las cubetas se
+    comparten entre workers a través de SQLite; si no, viven en memoria.
+    Un límite a 0 desactiva esa cubeta.
+    """
+
+    def __init__(self, app=None):
+        self.enabled = False
+        self.store = None
+        self.buckets = {}
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        config = app.config
+        self.enabled = config.get('RATE_LIMIT_ENABLED', True)
+        self.output_tokens = config.get('RATE_LIMIT_OUTPUT_TOKENS', 512)
+
+        self.buckets = {}
+        for scope in ('user', 'global'):
+            for budget in ('requests', 'tokens'):
+                prefix = f'RATE_LIMIT_{scope.upper()}_{budget.upper()}'
+                per_minute = config.get(f'{prefix}_PER_MINUTE', 0)
+                if per_minute > 0:
+                    burst = config.get(f'{prefix}_BURST') or per_minute
+                    self.buckets[(scope, budget)] = Bucket(float(burst), per_minute / 60.0)
+
+        db_path = config.get('RATE_LIMIT_DB_PATH')
+        self.store = SQLiteBucketStore(db_path) if self.enabled and db_path else MemoryBucketStore()
+
+        app.extensions['rate_limiter'] = self
+
+    def estimate_tokens(self, prompt):
+        """Estimación barata de tokens: ~4 caracteres por token más la respuesta"""
+        return math.ceil(len(prompt) / 4) + self.output_tokens
+
+    def check(self, user_id, budget, amount=1):
+        """Consumir ``amount`` de la cubeta del usuario y de la global
+
+        Lanza ``RateLimitExceeded`` sin consumir nada si alguna no alcanza.
+        """
+        if not self.enabled:
+            return
+
+        charges = []
+        for scope, key in (('user', f'user:{user_id}:{budget}'), ('global', f'global:{budget}')):
+            bucket = self.buckets.get((scope, budget))
+            if bucket is not None:
+                # Una petición mayor que la ráfaga nunca cabría: se limita a la capacidad
+                charges.append((key, bucket, min(amount, bucket.capacity)))
+
+        if not charges:
+            return
+
+        failed = self.store.consume(charges, time.time())
+        if failed is not None:
+            key, bucket, needed, level = failed
+            scope = key.split(':', 1)[0]
+            raise RateLimitExceeded(scope, budget, (needed - level) / bucket.rate)
+
+    def clear(self):
+        if self.store is not None:
+            self.store.clear()
+
+def rate_limit_response(error):
+    """Respuesta 429 con la cabecera Retry-After"""
+    retry_after = max(1, math.ceil(error.retry_after))
+    response = jsonify({
+        'error': 'Too many requests, please try again later',
+        'scope': error.scope,
+        'budget': error.budget,
+        'retry_after': retry_after
+    })
+    response.status_code = 429
+    response.headers['Retry-After'] = str(retry_after)
+    return response
+
+def rate_limited(view):
+    """Decorador: descontar una petición de las cuotas del usuario autenticado
+
+    Debe ir después de ``@jwt_required()``.
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        from app import rate_limiter
+
+        try:
+            rate_limiter.check(get_jwt_identity(), 'requests')
+        except RateLimitExceeded as e:
+            return rate_limit_response(e)
+        return view(*args, **kwargs)
+    return wrapper
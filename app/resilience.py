@@ -0,0 +1,288 @@
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+
+# Códigos HTTP que indican un fallo transitorio del servicio (merece reintento)
+TRANSIENT_CODES = {408, 429, 500, 502, 503, 504}
+
+_END = object()
+
+class UpstreamError(Exception):
+    """Error de Gemini que se devuelve al cliente como 503/504"""
+    code = 503
+
+    def __init__(self, message, retry_after=None):
+        self.retry_after = retry_after
+        super().__init__(message)
+
+class UpstreamTimeout(UpstreamError):
+    code = 504
+
+class CircuitOpenError(UpstreamError):
+    """El circuito está abierto: se rechaza la llamada sin contactar con Gemini"""
+
+def is_transient(error):
+    """Determinar si un error de la llamada a Gemini merece reintento"""
+    if isinstance(error, (UpstreamTimeout, TimeoutError, ConnectionError)):
+        return True
+    code = getattr(error, 'code', None)
+    # google.api_core expone el código HTTP como entero en ``code``
+    return isinstance(code, int) and code in TRANSIENT_CODES
+
+class CircuitBreaker:
+    """Cortocircuito por tasa de errores sobre las últimas ``window`` llamadas
+
+    Cerrado: las llamadas pasan. Si con al menos ``min_calls`` resultados la
+    proporción de fallos llega a ``error_rate``, se abre durante
+    ``open_seconds`` y las llamadas fallan al instante. Pasado ese tiempo
+    (semiabierto) se deja pasar una única llamada de prueba: si va bien se
+    cierra y si falla vuelve a abrirse.
+    """
+
+    def __init__(self, window=20, min_calls=10, error_rate=0.5, open_seconds=30.0):
+        self.window = window
+        self.min_calls = min_calls
+        self.error_rate = error_rate
+        self.open_seconds = open_seconds
+        self._results = deque(maxlen=window)
+        self._opened_at = None
+        self._probing = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        with self._lock:
+            return self._state(time.monotonic())
+
+    def _state(self, now):
+        if self._opened_at is None:
+            return 'closed'
+        if now - self._opened_at < self.open_seconds:
+            return 'open'
+        return 'half_open'
+
+    def allow(self):
+        """Comprobar si se puede llamar; lanza ``CircuitOpenError`` si no"""
+        with self._lock:
+            now = time.monotonic()
+            state = self._state(now)
+            if state == 'closed':
+                return
+            if state == 'half_open' and not self._probing:
+                self._probing = True
+                return
+            retry_after = max(self.open_seconds - (now - self._opened_at), 1.0)
+        raise CircuitOpenError('Gemini is temporarily unavailable', retry_after=retry_after)
+
+    def record(self, success):
+        with self._lock:
+            if self._opened_at is not None:
+                # Resultado de la llamada de prueba (o de una anterior a la apertura)
+                if self._probing:
+                    self._probing = False
+                    if success:
+                        self._opened_at = None
+                        self._results.clear()
+                    else:
+                        self._opened_at = time.monotonic()
+                return
+
+            self._results.append(success)
+            failures = self._results.count(False)
+            if len(self._results) >= self.min_calls and failures / len(self._results) >= self.error_rate:
+                self._opened_at = time.monotonic()
+
+    def stats(self):
+        with self._lock:
+            results = list(self._results)
+            state = self._state(time.monotonic())
+        return {
+            'state': state,
+            'recent_calls': len(results),
+            'recent_failures': results.count(False)
+        }
+
+class ResilientModel:
+    """Envoltorio de un modelo de Gemini con plazos, reintentos y cortocircuito
+
+    Cada intento se ejecuta en el ejecutor (``make_executor``) para poder
+    abandonarlo al superar ``GEMINI_TIMEOUT`` (la llamada no se cancela, pero
+    el worker deja de esperarla). Los errores transitorios se reintentan con backoff
+    exponencial con jitter mientras quede plazo (``GEMINI_DEADLINE``). Con
+    ``GEMINI_HEDGE_DELAY`` > 0, si un intento no ha respondido en ese tiempo se
+    lanza una segunda llamada idéntica y se usa la primera que termine.
+
+    En streaming solo se reintenta hasta recibir el primer fragmento; después
+    el plazo se aplica a la espera entre fragmentos.
+    """
+
+    def __init__(self, model, breaker, executor, config):
+        self.model = model
+        self.breaker = breaker
+        self.executor = executor
+        self.timeout = config.get('GEMINI_TIMEOUT', 30.0)
+        self.deadline = config.get('GEMINI_DEADLINE', 60.0)
+        self.max_retries = config.get('GEMINI_MAX_RETRIES', 2)
+        self.retry_base_delay = config.get('GEMINI_RETRY_BASE_DELAY', 0.5)
+        self.retry_max_delay = config.get('GEMINI_RETRY_MAX_DELAY', 4.0)
+        self.hedge_delay = config.get('GEMINI_HEDGE_DELAY', 0.0)
+        self.stats = {'calls': 0, 'retries': 0, 'timeouts': 0, 'hedges': 0, 'hedge_wins': 0, 'rejected': 0}
+
+    def __getattr__(self, name):
+        # Atributos propios del modelo envuelto (p. ej. ``calls`` del modelo falso)
+        return getattr(self.model, name)
+
+    def generate_content(self, prompt, stream=False, **kwargs):
+        if stream:
+            return self._stream(prompt, kwargs)
+        return self._with_retries(
+            lambda timeout: self._attempt(lambda: self.model.generate_content(prompt, **kwargs), timeout, hedge=True)
+        )
+
+    def _with_retries(self, attempt):
+        """Ejecutar ``attempt(timeout)`` con cortocircuito y reintentos hasta el plazo total"""
+        started = time.monotonic()
+        last_error = UpstreamTimeout('Gemini deadline exceeded')
+        for retry in range(self.max_retries + 1):
+            remaining = self.deadline - (time.monotonic() - started)
+            if remaining <= 0:
+                break
+
+            try:
+                self.breaker.allow()
+            except CircuitOpenError:
+                self.stats['rejected'] += 1
+                raise
+
+            self.stats['calls'] += 1
+            try:
+                result = attempt(min(self.timeout, remaining))
+            except Exception as e:
+                if not is_transient(e):
+                    # Error de la petición (p. ej. 400): el servicio sí responde
+                    self.breaker.record(True)
+                    raise
+                self.breaker.record(False)
+                last_error = e
+            else:
+                self.breaker.record(True)
+                return result
+
+            if retry < self.max_retries:
+                delay = min(self.retry_base_delay * (2 ** retry), self.retry_max_delay) * random.uniform(0.5, 1.0)
+                if time.monotonic() - started + delay >= self.deadline:
+                    break
+                self.stats['retries'] += 1
+                time.sleep(delay)
+
+        raise self._upstream_error(last_error) from last_error
+
+    def _upstream_error(self, error):
+        if isinstance(error, UpstreamError):
+            return error
+        if isinstance(error, TimeoutError) or getattr(error, 'code', None) in (408, 504):
+            return UpstreamTimeout('Gemini did not respond in time')
+        return UpstreamError('Gemini is temporarily unavailable')
+
+    def _attempt(self, fn, timeout, hedge=False):
+        """Ejecutar ``fn`` en el ejecutor con plazo y, opcionalmente, una llamada de cobertura"""
+        started = time.monotonic()
+        futures = [self.executor.submit(fn)]
+
+        if hedge and 0 < self.hedge_delay < timeout:
+            done, _ = wait(futures, timeout=self.hedge_delay)
+            if not done:
+                self.stats['hedges'] += 1
+                futures.append(self.executor.submit(fn))
+
+        error = None
+        while futures:
+            remaining = timeout - (time.monotonic() - started)
+            if remaining <= 0:
+                break
+            done, _ = wait(futures, timeout=remaining, return_when=FIRST_COMPLETED)
+            if not done:
+                break
+            for future in done:
+                if future.exception() is None:
+                    if len(futures) > 1 and future is futures[1]:
+                        self.stats['hedge_wins'] += 1
+                    return future.result()
+                error = future.exception()
+            futures = [future for future in futures if future not in done]
+
+        if error is not None and not futures:
+            raise error
+        self.stats['timeouts'] += 1
+        raise UpstreamTimeout(f'Gemini did not respond within {timeout:.1f}s')
+
+    def _stream(self, prompt, kwargs):
+        def start(timeout):
+            response = self._attempt(lambda: self.model.generate_content(prompt, stream=True, **kwargs), timeout)
+            iterator = iter(response)
+            return iterator, self._attempt(lambda: next(iterator, _END), timeout)
+
+        iterator, chunk = self._with_retries(start)
+        while chunk is not _END:
+            yield chunk
+            try:
+                chunk = self._attempt(lambda: next(iterator, _END), self.timeout)
+            except Exception as e:
+                if is_transient(e):
+                    self.breaker.record(False)
+                    raise self._upstream_error(e) from e
+                raise
+
+class GreenletExecutor:
+    """Ejecutor para workers gevent: cada llamada en su propio greenlet
+
+    Sin pool ni cola: un greenlet cuesta poco y la espera de red cede el
+    control, así que hay tantas llamadas en vuelo como peticiones (hasta
+    ``worker_connections``). Con un pool de tamaño fijo las llamadas que
+    esperan turno gastarían su plazo en la cola, y eso acabaría en
+    reintentos y en la apertura del cortocircuito.
+    """
+
+    def submit(self, fn, *args, **kwargs):
+        import gevent
+
+        future = Future()
+
+        def run():
+            if not future.set_running_or_notify_cancel():
+                return
+            try:
+                result = fn(*args, **kwargs)
+            except BaseException as e:
+                future.set_exception(e)
+            else:
+                future.set_result(result)
+
+        gevent.spawn(run)
+        return future
+
+    def shutdown(self, wait=True, cancel_futures=False):
+        pass
+
+def _threads_patched():
+    """True si gevent ha sustituido los hilos por greenlets"""
+    try:
+        from gevent import monkey
+    except ImportError:
+        return False
+    return monkey.is_module_patched('threading')
+
+def make_executor(config):
+    """Ejecutor compartido por todos los modelos del proceso
+
+    Un pool de ``GEMINI_EXECUTOR_WORKERS`` hilos o, con workers gevent, un
+    greenlet por llamada (``GreenletExecutor``).
+    """
+    if _threads_patched():
+        return GreenletExecutor()
+    return ThreadPoolExecutor(
+        max_workers=config.get('GEMINI_EXECUTOR_WORKERS', 32),
+        thread_name_prefix='gemini-call'
+    )
@@ -0,0 +1,176 @@
+import threading
+import time
+from collections import deque
+from app.resilience import UpstreamError
+from app.metrics import observe_gemini, observe_prompt
+
+class LatencyStats:
+    """Latencias y resultados recientes de un modelo (en memoria del proceso)
+
+    Guarda las últimas ``window`` mediciones del tiempo hasta la respuesta (o
+    hasta el primer fragmento en streaming).
+    """
+
+    def __init__(self, window=200):
+        self._durations = deque(maxlen=window)
+        self._results = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, duration, success):
+        with self._lock:
+            if success:
+                self._durations.append(duration)
+            self._results.append(success)
+
+    def samples(self):
+        with self._lock:
+            return len(self._durations)
+
+    def percentile(self, fraction):
+        with self._lock:
+            durations = sorted(self._durations)
+        if not durations:
+            return None
+        return durations[min(int(len(durations) * fraction), len(durations) - 1)]
+
+    def snapshot(self):
+        p50 = self.percentile(0.5)
+        p95 = self.percentile(0.95)
+        with self._lock:
+            results = list(self._results)
+        return {
+            'samples': len(results),
+            'p50_ms': round(p50 * 1000, 1) if p50 is not None else None,
+            'p95_ms': round(p95 * 1000, 1) if p95 is not None else None,
+            'error_rate': round(results.count(False) / len(results), 3) if results else 0.0
+        }
+
+class ModelRouter:
+    """Elegir el modelo de Gemini para cada llamada y conmutar si falla
+
+    ``GEMINI_MODELS`` es la lista de modelos disponibles por orden de
+    preferencia (del más barato al más caro). Si la petición o la conversación
+    no fijan un modelo se elige automáticamente: los prompts de más de
+    ``GEMINI_LONG_PROMPT_CHARS`` van a ``GEMINI_LONG_PROMPT_MODEL`` y se salta
+    un modelo con el cortocircuito abierto o cuyo p95 observado supera
+    ``GEMINI_LATENCY_SLO``. Si la llamada al modelo elegido falla, se reintenta
+    con el siguiente candidato (``GEMINI_FAILOVER``).
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        self.models = []
+        self._stats = {}
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        config = app.config
+        default = config['GEMINI_DEFAULT_MODEL']
+
+        models = [name.strip() for name in config.get('GEMINI_MODELS', '').split(',') if name.strip()]
+        if default in models:
+            models.remove(default)
+        self.models = [default] + models
+
+        self.long_prompt_chars = config.get('GEMINI_LONG_PROMPT_CHARS', 0)
+        self.long_prompt_model = config.get('GEMINI_LONG_PROMPT_MODEL')
+        self.latency_slo = config.get('GEMINI_LATENCY_SLO', 0)
+        self.min_samples = config.get('GEMINI_LATENCY_MIN_SAMPLES', 20)
+        self.failover = config.get('GEMINI_FAILOVER', True)
+        self.stats_window = config.get('GEMINI_LATENCY_WINDOW', 200)
+        self._stats = {}
+        app.extensions['model_router'] = self
+
+    def is_available(self, model_name):
+        return model_name in self.models
+
+    def stats(self, model_name):
+        stats = self._stats.get(model_name)
+        if stats is None:
+            with self._lock:
+                stats = self._stats.setdefault(model_name, LatencyStats(self.stats_window))
+        return stats
+
+    def _healthy(self, model_name):
+        registry = self.app.extensions['model_registry']
+        if registry.breaker(model_name).state == 'open':
+            return False
+        if self.latency_slo:
+            stats = self.stats(model_name)
+            p95 = stats.percentile(0.95)
+            if p95 is not None and stats.samples() >= self.min_samples and p95 > self.latency_slo:
+                return False
+        return True
+
+    def candidates(self, requested=None, prompt_length=0):
+        """Modelos a probar en orden: el elegido primero y después los de reserva"""
+        if requested:
+            preferred = [requested]
+        else:
+            preferred = list(self.models)
+            if self.long_prompt_model and self.long_prompt_chars and prompt_length > self.long_prompt_chars:
+                preferred = [self.long_prompt_model] + [name for name in preferred if name != self.long_prompt_model]
+
+            healthy = [name for name in preferred if self._healthy(name)]
+            if healthy:
+                preferred = healthy + [name for name in preferred if name not in healthy]
+            else:
+                # Todos lentos o caídos: empezar por el de menor p95 observado
+                preferred.sort(key=lambda name: self.stats(name).percentile(0.95) or 0.0)
+
+        if not self.failover:
+            return preferred[:1]
+        return preferred + [name for name in self.models if name not in preferred]
+
+    def generate_content(self, candidates, prompt, stream=False):
+        """Llamar al primer candidato que responda; devuelve (modelo usado, respuesta)
+
+        Solo se conmuta ante ``UpstreamError`` (plazos, cortocircuito, errores
+        transitorios tras los reintentos). En streaming se conmuta hasta
+        recibir el primer fragmento; el iterador devuelto empieza por él.
+        """
+        registry = self.app.extensions['model_registry']
+        last_error = None
+
+        for model_name in candidates:
+            model = registry.get(model_name)
+            observe_prompt(model_name, prompt)
+            started = time.monotonic()
+            try:
+                if stream:
+                    chunks = iter(model.generate_content(prompt, stream=True))
+                    first = next(chunks, None)
+                    response = self._prepend(first, chunks)
+                else:
+                    response = model.generate_content(prompt)
+            except UpstreamError as e:
+                elapsed = time.monotonic() - started
+                self.stats(model_name).record(elapsed, False)
+                observe_gemini(model_name, elapsed, False)
+                self.app.logger.warning(f"Modelo {model_name} no disponible, probando el siguiente: {e}")
+                last_error = e
+                continue
+
+            elapsed = time.monotonic() - started
+            self.stats(model_name).record(elapsed, True)
+            observe_gemini(model_name, elapsed, True)
+            return model_name, response
+
+        raise last_error or UpstreamError('No Gemini model available')
+
+    @staticmethod
+    def _prepend(first, chunks):
+        if first is not None:
+            yield first
+        yield from chunks
+
+    def describe(self):
+        """Modelos disponibles con sus latencias recientes y estado del cortocircuito"""
+        registry = self.app.extensions['model_registry']
+        return [
+            dict(name=name, circuit=registry.breaker(name).state, **self.stats(name).snapshot())
+            for name in self.models
+        ]
@@ -0,0 +1,76 @@
+import os
+from functools import wraps
+from flask import Blueprint, current_app, request, jsonify, send_file
+from flask_jwt_extended import jwt_required, get_jwt_identity
+from marshmallow import ValidationError
+from app import request_profiler, user_cache
+from app.schemas import ProfileListSchema, ProfileFileSchema
+from app.utils import handle_error
+
+admin_bp = Blueprint('admin', __name__)
+
+def admin_required(view):
+    """Decorador: solo usuarios con email en ``ADMIN_EMAILS`` (403 si no)
+
+    Debe ir después de ``@jwt_required()``.
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        user = user_cache.get(get_jwt_identity())
+        if user is None or user['email'].lower() not in current_app.config.get('ADMIN_EMAILS', []):
+            return jsonify({'error': 'Admin access required'}), 403
+        return view(*args, **kwargs)
+    return wrapper
+
+@admin_bp.route('/profiles', methods=['GET'])
+@jwt_required()
+@admin_required
+def list_profiles():
+    """Peticiones perfiladas recientes, de la más lenta a la más rápida
+
+    Incluye las de todos los workers que comparten ``PROFILE_DIR``. Cada una
+    con su duración y el tiempo muestreado en cada tramo (contexto, base de
+    datos, serialización, modelo y resto).
+    """
+    try:
+        params = ProfileListSchema().load(request.args)
+        profiles, total = request_profiler.slowest(params['limit'])
+        
+        return jsonify({
+            'enabled': request_profiler.enabled,
+            'profiles': profiles,
+            'total': total
+        }), 200
+        
+    except ValidationError as e:
+        return jsonify({'errors': e.messages}), 400
+    except Exception as e:
+        return handle_error(e)
+
+@admin_bp.route('/profiles/<capture_id>', methods=['GET'])
+@jwt_required()
+@admin_required
+def download_profile(capture_id):
+    """Descargar un perfil capturado (``?format=speedscope`` o ``collapsed``)"""
+    try:
+        params = ProfileFileSchema().load(request.args)
+        
+        # Solo capturas existentes con un id válido: nunca se construyen rutas arbitrarias
+        if request_profiler.get(capture_id) is None:
+            return jsonify({'error': 'Profile not found'}), 404
+        
+        path = request_profiler.path(capture_id, params['format'])
+        mimetype = 'application/json' if params['format'] == 'speedscope' else 'text/plain'
+        return send_file(
+            path if os.path.isabs(path) else os.path.join(os.getcwd(), path),
+            mimetype=mimetype,
+            as_attachment=True,
+            download_name=os.path.basename(path)
+        )
+        
+    except ValidationError as e:
+        return jsonify({'errors': e.messages}), 400
+    except FileNotFoundError:
+        return jsonify({'error': 'Profile not found'}), 404
+    except Exception as e:
+        return handle_error(e)
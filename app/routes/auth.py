@@ -1,8 +1,11 @@
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import create_access_token, create_refresh_token, jwt_required, get_jwt_identity
 from marshmallow import ValidationError
-from app import db
+from app import db, user_cache
+from app.identity import token_claims
 from app.models import User
+from app.passwords import PasswordHashBusy, password_busy_response
+from app.usernames import EmailAlreadyExists, add_user
 from app.schemas import UserRegistrationSchema, UserLoginSchema
 from app.utils import handle_error
 
@@ -32,29 +35,18 @@ def register():
         if User.query.filter_by(email=email).first():
             return jsonify({'error': 'Email already exists'}), 400
         
-        # Crear username basado en email (parte antes del @)
-        username = email.split('@')[0]
-        
-        # Asegurar que el username sea único
-        counter = 1
-        original_username = username
-        while User.query.filter_by(username=username).first():
-            username = f"{original_username}{counter}"
-            counter += 1
-        
-        # Crear nuevo usuario
-        user = User(
-            username=username,
-            email=email
-        )
+        # Crear nuevo usuario; el username (parte del email antes de la @ más
+        # un sufijo si ya existe) se reserva con un contador atómico
+        user = User(email=email)
         user.set_password(password)
         
-        db.session.add(user)
+        add_user(user)
         db.session.commit()
         
-        # Crear tokens (convertir ID a string)
-        access_token = create_access_token(identity=str(user.id))
-        refresh_token = create_refresh_token(identity=str(user.id))
+        # Crear tokens (convertir ID a string) con los datos del usuario como claims
+        claims = token_claims(user_cache.store(user))
+        access_token = create_access_token(identity=str(user.id), additional_claims=claims)
+        refresh_token = create_refresh_token(identity=str(user.id), additional_claims=claims)
         
         return jsonify({
             'message': 'User registered successfully',
@@ -64,6 +56,12 @@ def register():
             'refresh_token': refresh_token
         }), 201
         
+    except EmailAlreadyExists:
+        db.session.rollback()
+        return jsonify({'error': 'Email already exists'}), 400
+    except PasswordHashBusy as e:
+        db.session.rollback()
+        return password_busy_response(e)
     except Exception as e:
         db.session.rollback()
         return handle_error(e)
@@ -94,9 +92,15 @@ def login():
         if not user.is_active:
             return jsonify({'error': 'Account is disabled'}), 401
         
-        # Crear tokens (convertir ID a string)
-        access_token = create_access_token(identity=str(user.id))
-        refresh_token = create_refresh_token(identity=str(user.id))
+        # Hash creado con otro método o coste: actualizarlo ahora que se conoce la contraseña
+        if user.password_needs_rehash():
+            user.set_password(password)
+            db.session.commit()
+        
+        # Crear tokens (convertir ID a string) con los datos del usuario como claims
+        claims = token_claims(user_cache.store(user))
+        access_token = create_access_token(identity=str(user.id), additional_claims=claims)
+        refresh_token = create_refresh_token(identity=str(user.id), additional_claims=claims)
         
         return jsonify({
             'message': 'Login successful',
@@ -106,6 +110,9 @@ def login():
             'refresh_token': refresh_token
         }), 200
         
+    except PasswordHashBusy as e:
+        db.session.rollback()
+        return password_busy_response(e)
     except Exception as e:
         return handle_error(e)
 
@@ -115,7 +122,9 @@ def refresh():
     """Refrescar token de acceso"""
     try:
         current_user_id = get_jwt_identity()
-        new_token = create_access_token(identity=str(current_user_id))
+        # El token ya se validó contra la caché: el usuario existe y está activo
+        user = user_cache.get(current_user_id)
+        new_token = create_access_token(identity=str(current_user_id), additional_claims=token_claims(user))
         
         return jsonify({
             'access_token': new_token
@@ -130,14 +139,32 @@ def get_profile():
     """Obtener perfil del usuario actual"""
     try:
         current_user_id = int(get_jwt_identity())  # Convertir de string a int
-        user = User.query.get(current_user_id)
+        user = user_cache.get(current_user_id)
         
         if not user:
             return jsonify({'error': 'User not found'}), 404
         
+        profile = dict(user)
+        profile.pop('token_version')
+        return jsonify({
+            'user': profile
+        }), 200
+        
+    except Exception as e:
+        return handle_error(e)
+
+@auth_bp.route('/revoke', methods=['POST'])
+@jwt_required()
+def revoke_tokens():
+    """Cerrar todas las sesiones: invalida los tokens emitidos hasta ahora"""
+    try:
+        current_user_id = int(get_jwt_identity())
+        user_cache.revoke_tokens(current_user_id)
+        
         return jsonify({
-            'user': user.to_dict()
+            'message': 'All tokens revoked'
         }), 200
         
     except Exception as e:
+        db.session.rollback()
         return handle_error(e) 
\ No newline at end of file
@@ -1,11 +1,20 @@
-from flask import Blueprint, request, jsonify
+import json
+from datetime import datetime
+from flask import Blueprint, Response, current_app, request, jsonify, stream_with_context
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from marshmallow import ValidationError
-import google.generativeai as genai
-from app import db
-from app.models import User, Conversation, Message
-from app.schemas import ChatMessageSchema, ConversationSchema
-from app.utils import handle_error, configure_gemini
+from sqlalchemy import insert, tuple_, update
+from app import db, job_queue, response_cache, title_cache, semantic_cache, rate_limiter, single_flight, model_router
+from app.models import User, Conversation, Message, Job, PREVIEW_LENGTH
+from app.schemas import ChatMessageSchema, ConversationSchema, PaginationSchema, SearchSchema, BatchSchema, ExportSchema
+from app.search import search_messages
+from app.batch import run_batch, ndjson_lines
+from app.export import COMPRESSIONS, check_compression, export_chunks, export_records
+from app.archive import restore_conversation
+from app.ratelimit import RateLimitExceeded, rate_limited, rate_limit_response
+from app.context import finish_context, prepare_context
+from app.tasks import DEFAULT_TITLE, fallback_title
+from app.utils import handle_error, get_gemini_model, encode_cursor, decode_cursor
 from app.config import Config
 
 chat_bp = Blueprint('chat', __name__)
@@ -13,15 +22,35 @@ chat_bp = Blueprint('chat', __name__)
 @chat_bp.route('/conversations', methods=['GET'])
 @jwt_required()
 def get_conversations():
-    """Obtener todas las conversaciones del usuario"""
+    """Obtener las conversaciones del usuario, de la más reciente a la más antigua
+
+    Paginación por cursor sobre (updated_at, id): ``?limit=50&before=<cursor>``.
+    """
     try:
         current_user_id = int(get_jwt_identity())
-        conversations = Conversation.query.filter_by(user_id=current_user_id).order_by(Conversation.updated_at.desc()).all()
+        params = PaginationSchema().load(request.args)
+        limit = params['limit']
+        
+        query = Conversation.query.filter_by(user_id=current_user_id)
+        if params.get('before'):
+            query = query.filter(tuple_(Conversation.updated_at, Conversation.id) < decode_cursor(params['before']))
+        
+        conversations = query.order_by(Conversation.updated_at.desc(), Conversation.id.desc()).limit(limit + 1).all()
+        has_more = len(conversations) > limit
+        conversations = conversations[:limit]
+        
+        next_cursor = None
+        if has_more:
+            next_cursor = encode_cursor(conversations[-1].updated_at, conversations[-1].id)
         
         return jsonify({
-            'conversations': [conv.to_dict() for conv in conversations]
+            'conversations': [conv.to_dict() for conv in conversations],
+            'has_more': has_more,
+            'next_cursor': next_cursor
         }), 200
         
+    except ValidationError as e:
+        return jsonify({'errors': e.messages}), 400
     except Exception as e:
         return handle_error(e)
 
@@ -34,9 +63,13 @@ def create_conversation():
         schema = ConversationSchema()
         data = schema.load(request.json)
         
+        if data.get('model') and not model_router.is_available(data['model']):
+            return jsonify({'errors': {'model': [f"Unknown model: {data['model']}"]}}), 400
+        
         conversation = Conversation(
             user_id=current_user_id,
-            title=data.get('title', 'Nueva Conversación')
+            title=data.get('title', DEFAULT_TITLE),
+            model=data.get('model')
         )
         
         db.session.add(conversation)
@@ -55,28 +88,252 @@ def create_conversation():
 @chat_bp.route('/conversations/<int:conversation_id>/messages', methods=['GET'])
 @jwt_required()
 def get_messages(conversation_id):
-    """Obtener mensajes de una conversación"""
+    """Obtener mensajes de una conversación (paginados por cursor)
+
+    Sin parámetros devuelve los ``limit`` mensajes más recientes. ``before``
+    carga los anteriores a un cursor y ``after`` los posteriores. Los mensajes
+    se devuelven siempre en orden cronológico.
+    """
     try:
         current_user_id = int(get_jwt_identity())
+        params = PaginationSchema().load(request.args)
+        limit = params['limit']
         
         # Verificar que la conversación pertenece al usuario
         conversation = Conversation.query.filter_by(id=conversation_id, user_id=current_user_id).first()
         if not conversation:
             return jsonify({'error': 'Conversation not found'}), 404
         
-        messages = Message.query.filter_by(conversation_id=conversation_id).order_by(Message.timestamp.asc()).all()
+        # Conversación archivada: sus mensajes vuelven a la tabla al abrirla
+        restore_conversation(conversation)
+        
+        key = tuple_(Message.timestamp, Message.id)
+        query = Message.query.filter_by(conversation_id=conversation_id)
+        
+        if params.get('after'):
+            query = query.filter(key > decode_cursor(params['after']))
+            messages = query.order_by(Message.timestamp.asc(), Message.id.asc()).limit(limit + 1).all()
+            has_more = len(messages) > limit
+            messages = messages[:limit]
+        else:
+            if params.get('before'):
+                query = query.filter(key < decode_cursor(params['before']))
+            messages = query.order_by(Message.timestamp.desc(), Message.id.desc()).limit(limit + 1).all()
+            has_more = len(messages) > limit
+            messages = messages[:limit]
+            messages.reverse()
+        
+        cursors = {'before': None, 'after': None}
+        if messages:
+            cursors['before'] = encode_cursor(messages[0].timestamp, messages[0].id)
+            cursors['after'] = encode_cursor(messages[-1].timestamp, messages[-1].id)
         
         return jsonify({
-            'messages': [msg.to_dict() for msg in messages]
+            'messages': [msg.to_dict() for msg in messages],
+            'has_more': has_more,
+            'cursors': cursors
         }), 200
         
+    except ValidationError as e:
+        return jsonify({'errors': e.messages}), 400
     except Exception as e:
         return handle_error(e)
 
+def _wants_stream():
+    """Determinar si el cliente pidió la respuesta en streaming (SSE)"""
+    if request.args.get('stream', '').lower() in ('1', 'true', 'yes'):
+        return True
+    return request.accept_mimetypes.best == 'text/event-stream'
+
+def _sse_event(event, data):
+    """Formatear un evento Server-Sent Events con datos JSON"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+def _save_user_message(conversation, content):
+    """Guardar el mensaje del usuario en su propio commit, antes de llamar a Gemini
+
+    Así el turno del usuario queda guardado aunque Gemini falle y no hay
+    ninguna transacción abierta durante la llamada. Se usan sentencias Core
+    (INSERT ... RETURNING y UPDATE) y se devuelve un ``Message`` sin sesión
+    con los valores guardados; después no hay que volver a leer nada del ORM.
+    """
+    now = datetime.utcnow()
+    messages, conversations = Message.__table__, Conversation.__table__
+    # Leído antes del commit: después el objeto caduca y acceder a él abriría
+    # otra transacción que quedaría abierta durante la llamada a Gemini
+    conversation_id = conversation.id
+    
+    message_id = db.session.execute(
+        insert(messages)
+        .values(conversation_id=conversation_id, content=content, role='user', timestamp=now)
+        .returning(messages.c.id)
+    ).scalar_one()
+    
+    # Incremento en SQL para no perder mensajes con peticiones concurrentes
+    db.session.execute(
+        update(conversations)
+        .where(conversations.c.id == conversation_id)
+        .values(
+            message_count=conversations.c.message_count + 1,
+            last_message_preview=content[:PREVIEW_LENGTH],
+            updated_at=now
+        )
+    )
+    db.session.commit()
+    
+    return Message(id=message_id, conversation_id=conversation_id, content=content, role='user', timestamp=now)
+
+def _finish_exchange(conversation_id, user_id, user_message, ai_text, needs_title):
+    """Guardar la respuesta de Gemini y actualizar la conversación en un commit
+
+    En el primer mensaje la conversación recibe al instante un título de
+    respaldo y se encola un trabajo que lo sustituye por uno generado por
+    Gemini. Devuelve el mensaje de la IA, la conversación actualizada (sin
+    sesión) y el trabajo de título (o None).
+    """
+    # Hora de Python (no func.now()) para que el formato coincida con el resto
+    # de filas y la paginación por (updated_at, id) ordene bien en SQLite
+    now = datetime.utcnow()
+    messages, conversations = Message.__table__, Conversation.__table__
+    
+    ai_message_id = db.session.execute(
+        insert(messages)
+        .values(conversation_id=conversation_id, content=ai_text, role='assistant', timestamp=now)
+        .returning(messages.c.id)
+    ).scalar_one()
+    
+    # Contador, vista previa, timestamp y (si es el primer mensaje) título
+    values = {
+        'message_count': conversations.c.message_count + 1,
+        'last_message_preview': ai_text[:PREVIEW_LENGTH],
+        'updated_at': now
+    }
+    title_job = None
+    if needs_title:
+        values['title'] = fallback_title(user_message.content)
+        title_job = job_queue.enqueue('generate_title', {
+            'conversation_id': conversation_id,
+            'content': user_message.content,
+            'fallback_title': values['title']
+        }, user_id=user_id)
+    
+    row = db.session.execute(
+        update(conversations)
+        .where(conversations.c.id == conversation_id)
+        .values(**values)
+        .returning(*conversations.c)
+    ).one()
+    
+    db.session.commit()
+    
+    if title_job is not None:
+        job_queue.notify()
+    
+    ai_message = Message(id=ai_message_id, conversation_id=conversation_id, content=ai_text, role='assistant', timestamp=now)
+    return ai_message, Conversation(**row._mapping), title_job
+
+def _exchange_response(user_message, ai_message, conversation, title_job, model_name):
+    """Datos de respuesta comunes a la versión JSON y a la de streaming"""
+    response_data = {
+        'user_message': user_message.to_dict(),
+        'ai_response': ai_message.to_dict(),
+        'model': model_name
+    }
+    
+    # Incluir la conversación con el título provisional y el trabajo a consultar
+    if title_job is not None:
+        response_data['conversation_updated'] = conversation.to_dict()
+        response_data['title_job_id'] = title_job.id
+    
+    return response_data
+
+def _cached_response(cache_key, model_name, content, is_first_message):
+    """Buscar la respuesta en la caché exacta y, sin contexto, en la semántica"""
+    cached_text = response_cache.get(cache_key)
+    if cached_text is None and is_first_message:
+        cached_text = semantic_cache.get(model_name, content)
+    return cached_text
+
+def _store_response(cache_key, model_name, content, is_first_message, ai_text):
+    """Guardar la respuesta generada en las cachés que correspondan"""
+    response_cache.set(cache_key, ai_text)
+    if is_first_message:
+        semantic_cache.set(model_name, content, ai_text)
+
+def _requested_model(data, conversation):
+    """Modelo pedido en el mensaje o fijado en la conversación (None: automático)"""
+    model_name = data.get('model') or conversation.model
+    if model_name and not model_router.is_available(model_name):
+        raise ValidationError({'model': [f'Unknown model: {model_name}']})
+    return model_name
+
+def _stream_message(conversation_id, user_id, candidates, user_message, prompt, is_first_message,
+                    needs_title, cache_key, cached_text):
+    """Respuesta SSE: reenviar los fragmentos de Gemini y guardar al terminar"""
+    def generate():
+        yield _sse_event('start', {'conversation_id': conversation_id})
+        
+        try:
+            model_name = candidates[0]
+            ai_text = cached_text
+            flight = None
+            if ai_text is None:
+                # Si otra petición ya está generando este mismo prompt, esperar su resultado
+                flight = single_flight.acquire(cache_key)
+                if not flight.leader:
+                    ai_text = flight.wait()
+            
+            if ai_text is not None:
+                # Respuesta en caché o compartida: se envía entera como un único fragmento
+                yield _sse_event('token', {'text': ai_text})
+            else:
+                try:
+                    chunks = []
+                    # El router conmuta de modelo si falla antes del primer fragmento
+                    model_name, stream = model_router.generate_content(candidates, prompt, stream=True)
+                    for chunk in stream:
+                        text = getattr(chunk, 'text', '')
+                        if not text:
+                            continue
+                        chunks.append(text)
+                        yield _sse_event('token', {'text': text})
+                    
+                    ai_text = ''.join(chunks)
+                    if not ai_text.strip():
+                        raise ValueError('Empty response from Gemini AI')
+                except BaseException as e:
+                    # También si el cliente corta la conexión (GeneratorExit)
+                    flight.fail(e)
+                    raise
+                flight.complete(ai_text)
+                _store_response(cache_key, candidates[0], user_message.content, is_first_message, ai_text)
+            
+            ai_message, conversation, title_job = _finish_exchange(
+                conversation_id, user_id, user_message, ai_text, needs_title
+            )
+            
+            yield _sse_event('done', _exchange_response(user_message, ai_message, conversation, title_job, model_name))
+            
+        except Exception as e:
+            db.session.rollback()
+            current_app.logger.error(f"Error: {str(e)}")
+            yield _sse_event('error', {'error': 'Error generating response'})
+    
+    response = Response(stream_with_context(generate()), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
 @chat_bp.route('/conversations/<int:conversation_id>/messages', methods=['POST'])
 @jwt_required()
+@rate_limited
 def send_message(conversation_id):
-    """Enviar mensaje y obtener respuesta de Gemini"""
+    """Enviar mensaje y obtener respuesta de Gemini
+
+    Con ``?stream=true`` (o ``Accept: text/event-stream``) la respuesta se
+    envía como Server-Sent Events a medida que Gemini genera el texto.
+    Sujeto a las cuotas de peticiones y de tokens (429 con Retry-After).
+    """
     try:
         current_user_id = int(get_jwt_identity())
         schema = ChatMessageSchema()
@@ -87,98 +344,117 @@ def send_message(conversation_id):
         if not conversation:
             return jsonify({'error': 'Conversation not found'}), 404
         
-        # Configurar y usar Gemini
-        configure_gemini()
-        model = genai.GenerativeModel('gemini-1.5-flash')
+        # El contexto se construye con los mensajes de la tabla: restaurar si está archivada
+        restore_conversation(conversation)
         
-        # Obtener historial de la conversación para contexto ANTES de agregar el nuevo mensaje
-        previous_messages = Message.query.filter_by(conversation_id=conversation_id).order_by(Message.timestamp.asc()).all()
+        requested_model = _requested_model(data, conversation)
         
-        # Verificar si es el primer mensaje para generar título automático
-        is_first_message = len(previous_messages) == 0
+        # Construir contexto (ventana reciente + resumen) ANTES de agregar el nuevo mensaje
+        draft = prepare_context(conversation, data['content'])
+        is_first_message = draft['is_first_message']
+        needs_title = is_first_message and conversation.title == DEFAULT_TITLE
         
+        # El resumen también llama al modelo: la cuota se comprueba antes de
+        # pagarlo, con el prompt provisional (con resumen nuevo no habrá caché)
+        tokens_checked = draft['needs_summary']
+        if tokens_checked:
+            rate_limiter.check(current_user_id, 'tokens', rate_limiter.estimate_tokens(draft['prompt']))
+        prompt = finish_context(draft, get_gemini_model(requested_model))
         
-        # Guardar mensaje del usuario
-        user_message = Message(
-            conversation_id=conversation_id,
-            content=data['content'],
-            role='user'
-        )
-        db.session.add(user_message)
+        # Modelos a probar: el pedido o el elegido por longitud y latencia, y los de reserva
+        candidates = model_router.candidates(requested_model, len(prompt))
+        model_name = candidates[0]
         
-        # Construir contexto para Gemini
-        context = []
-        for msg in previous_messages:
-            context.append(f"{msg.role}: {msg.content}")
+        # La caché (opcional) se consulta por modelo y prompt completo con contexto
+        cache_key = response_cache.make_key(model_name, prompt)
+        cached_text = _cached_response(cache_key, model_name, data['content'], is_first_message)
         
-        # Añadir el nuevo mensaje
-        context.append(f"user: {data['content']}")
+        # Solo las llamadas reales a Gemini consumen la cuota de tokens
+        if cached_text is None and not tokens_checked:
+            rate_limiter.check(current_user_id, 'tokens', rate_limiter.estimate_tokens(prompt))
         
-        # Generar respuesta
-        prompt = "\n".join(context)
-        response = model.generate_content(prompt)
+        # Guardar el mensaje del usuario; a partir de aquí no se usa la sesión
+        # hasta tener la respuesta (sin transacción abierta durante la llamada)
+        user_message = _save_user_message(conversation, data['content'])
         
-        # Guardar respuesta de Gemini
-        ai_message = Message(
-            conversation_id=conversation_id,
-            content=response.text,
-            role='assistant'
-        )
-        db.session.add(ai_message)
-        
-        # Si es el primer mensaje, generar título automático
-        conversation_updated = False
-        if is_first_message and conversation.title == 'Nueva Conversación':
-            try:
-                # Generar título basado en el primer mensaje
-                title_prompt = f"""Genera un título descriptivo y conciso (máximo 6 palabras) para una conversación que comienza con este mensaje: "{data['content']}"
-
-Responde SOLO con el título, sin comillas ni explicaciones adicionales. El título debe ser claro y representar el tema principal."""
-                
-                title_response = model.generate_content(title_prompt)
-                generated_title = title_response.text.strip()
-                
-                # Limpiar el título (remover comillas si las hay)
-                generated_title = generated_title.replace('"', '').replace("'", "").strip()
-                
-                # Validar que el título no esté vacío y no sea muy largo
-                if generated_title and len(generated_title) <= 50:
-                    conversation.title = generated_title
-                    conversation_updated = True
-                else:
-                    # Fallback: usar las primeras palabras del mensaje
-                    words = data['content'].split()[:6]
-                    conversation.title = ' '.join(words) + ('...' if len(data['content'].split()) > 6 else '')
-                    conversation_updated = True
-                    
-            except Exception as title_error:
-                print(f"Error generando título: {title_error}")
-                # Fallback: usar las primeras palabras del mensaje
-                words = data['content'].split()[:6]
-                conversation.title = ' '.join(words) + ('...' if len(data['content'].split()) > 6 else '')
-                conversation_updated = True
+        if _wants_stream():
+            return _stream_message(
+                conversation_id, current_user_id, candidates, user_message, prompt,
+                is_first_message, needs_title, cache_key, cached_text
+            )
         
-        # Actualizar timestamp de la conversación
-        conversation.updated_at = db.func.now()
+        # Generar respuesta (o reutilizar una idéntica o parecida de la caché)
+        ai_text = cached_text
+        if ai_text is None:
+            # Peticiones simultáneas con el mismo prompt comparten una sola llamada
+            used = {}
+            
+            def call_gemini():
+                used['model'], response = model_router.generate_content(candidates, prompt)
+                return response.text
+            
+            ai_text, shared = single_flight.do(cache_key, call_gemini)
+            if not shared:
+                _store_response(cache_key, model_name, data['content'], is_first_message, ai_text)
+            model_name = used.get('model', model_name)
         
-        db.session.commit()
+        ai_message, conversation, title_job = _finish_exchange(
+            conversation_id, current_user_id, user_message, ai_text, needs_title
+        )
         
-        response_data = {
-            'user_message': user_message.to_dict(),
-            'ai_response': ai_message.to_dict()
-        }
+        return jsonify(_exchange_response(user_message, ai_message, conversation, title_job, model_name)), 200
         
-        # Incluir información de la conversación actualizada si cambió el título
-        if conversation_updated:
-            response_data['conversation_updated'] = conversation.to_dict()
+    except ValidationError as e:
+        return jsonify({'errors': e.messages}), 400
+    except RateLimitExceeded as e:
+        db.session.rollback()
+        return rate_limit_response(e)
+    except Exception as e:
+        return handle_error(e)
+
+@chat_bp.route('/batch', methods=['POST'])
+@jwt_required()
+def send_batch():
+    """Enviar un lote de mensajes y recibir los resultados como NDJSON
+
+    Cuerpo: ``{"items": [{"conversation_id": 1, "content": "...", "ref": "a"}, ...]}``.
+    Cada línea de la respuesta es el resultado de un elemento (en orden de
+    finalización) y la última resume el lote. Cada elemento descuenta una
+    petición y sus tokens de las cuotas; los que no caben terminan en 429.
+    """
+    try:
+        current_user_id = int(get_jwt_identity())
+        data = BatchSchema().load(request.json)
         
-        return jsonify(response_data), 200
+        if len(data['items']) > current_app.config['BATCH_MAX_ITEMS']:
+            return jsonify({'errors': {'items': [f"At most {current_app.config['BATCH_MAX_ITEMS']} items per batch"]}}), 400
+        
+        results = run_batch(current_user_id, data['items'], data.get('concurrency'))
+        return Response(stream_with_context(ndjson_lines(results)), mimetype='application/x-ndjson')
         
     except ValidationError as e:
         return jsonify({'errors': e.messages}), 400
     except Exception as e:
         return handle_error(e)
 
+@chat_bp.route('/conversations/<int:conversation_id>', methods=['GET'])
+@jwt_required()
+def get_conversation(conversation_id):
+    """Obtener una conversación (sin mensajes), aunque no esté en la página cargada del listado"""
+    try:
+        current_user_id = int(get_jwt_identity())
+        
+        conversation = Conversation.query.filter_by(id=conversation_id, user_id=current_user_id).first()
+        if not conversation:
+            return jsonify({'error': 'Conversation not found'}), 404
+        
+        return jsonify({
+            'conversation': conversation.to_dict()
+        }), 200
+        
+    except Exception as e:
+        return handle_error(e)
+
 @chat_bp.route('/conversations/<int:conversation_id>', methods=['DELETE'])
 @jwt_required()
 def delete_conversation(conversation_id):
@@ -198,4 +474,91 @@ def delete_conversation(conversation_id):
         }), 200
         
     except Exception as e:
-        return handle_error(e) 
\ No newline at end of file
+        return handle_error(e) 
+
+@chat_bp.route('/jobs/<int:job_id>', methods=['GET'])
+@jwt_required()
+def get_job(job_id):
+    """Consultar el estado de un trabajo en segundo plano (p. ej. el título automático)"""
+    try:
+        current_user_id = int(get_jwt_identity())
+        
+        job = Job.query.filter_by(id=job_id, user_id=current_user_id).first()
+        if not job:
+            return jsonify({'error': 'Job not found'}), 404
+        
+        return jsonify({
+            'job': job.to_dict()
+        }), 200
+        
+    except Exception as e:
+        return handle_error(e)
+
+@chat_bp.route('/search', methods=['GET'])
+@jwt_required()
+def search():
+    """Buscar texto en todas las conversaciones del usuario
+
+    ``?q=texto&limit=20&offset=0``; los resultados vienen ordenados por
+    relevancia con un fragmento resaltado del mensaje.
+    """
+    try:
+        current_user_id = int(get_jwt_identity())
+        params = SearchSchema().load(request.args)
+        
+        results, has_more = search_messages(current_user_id, params['q'], params['limit'], params['offset'])
+        
+        return jsonify({
+            'results': results,
+            'has_more': has_more,
+            'next_offset': params['offset'] + len(results) if has_more else None
+        }), 200
+        
+    except ValidationError as e:
+        return jsonify({'errors': e.messages}), 400
+    except Exception as e:
+        return handle_error(e)
+
+@chat_bp.route('/export', methods=['GET'])
+@jwt_required()
+def export_conversations():
+    """Descargar todas las conversaciones del usuario en JSONL
+
+    ``?compression=gzip`` (por defecto), ``zstd`` o ``none``. Se genera en
+    streaming por lotes: la memoria no depende del tamaño del historial.
+    """
+    try:
+        current_user_id = int(get_jwt_identity())
+        params = ExportSchema().load(request.args)
+        compression = params['compression']
+        check_compression(compression)
+        
+        extension, mimetype = COMPRESSIONS[compression]
+        filename = f"chat-export-{datetime.utcnow().strftime('%Y%m%d')}{extension}"
+        
+        chunks = export_chunks(export_records(current_user_id), compression)
+        response = Response(stream_with_context(chunks), mimetype=mimetype)
+        response.headers['Content-Disposition'] = f'attachment; filename="{filename}"'
+        return response
+        
+    except ValidationError as e:
+        return jsonify({'errors': e.messages}), 400
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return handle_error(e)
+
+@chat_bp.route('/cache/stats', methods=['GET'])
+@jwt_required()
+def get_cache_stats():
+    """Estadísticas de las cachés y de llamadas unificadas de este proceso"""
+    try:
+        return jsonify({
+            'response_cache': response_cache.stats(),
+            'title_cache': title_cache.stats(),
+            'semantic_cache': semantic_cache.stats(),
+            'single_flight': single_flight.stats()
+        }), 200
+        
+    except Exception as e:
+        return handle_error(e)
\ No newline at end of file
@@ -1,4 +1,4 @@
-from marshmallow import Schema, fields, validate, validates, ValidationError
+from marshmallow import Schema, fields, validate, validates, validates_schema, ValidationError
 import re
 
 class UserRegistrationSchema(Schema):
@@ -20,6 +20,7 @@ class UserLoginSchema(Schema):
 class ConversationSchema(Schema):
     """Esquema para validar creación de conversación"""
     title = fields.Str(validate=validate.Length(max=200), missing='Nueva Conversación')
+    model = fields.Str(validate=validate.Length(max=50), allow_none=True)
 
 class ChatMessageSchema(Schema):
     """Esquema para validar mensajes de chat"""
@@ -27,6 +28,55 @@ class ChatMessageSchema(Schema):
         validate.Length(min=1, max=5000),
         lambda x: x.strip() != '' or ValidationError('Message cannot be empty')
     ])
+    # Modelo para esta petición (tiene prioridad sobre el de la conversación)
+    model = fields.Str(validate=validate.Length(max=50))
+
+class BatchItemSchema(Schema):
+    """Esquema para un elemento de un lote de mensajes"""
+    content = fields.Str(required=True, validate=[
+        validate.Length(min=1, max=5000),
+        lambda x: x.strip() != '' or ValidationError('Message cannot be empty')
+    ])
+    # Sin conversation_id se crea una conversación nueva para el elemento
+    conversation_id = fields.Int(allow_none=True)
+    model = fields.Str(validate=validate.Length(max=50))
+    # Referencia libre del cliente que se devuelve en el resultado
+    ref = fields.Raw(allow_none=True)
+
+class BatchSchema(Schema):
+    """Esquema para validar un lote de mensajes"""
+    items = fields.List(fields.Nested(BatchItemSchema), required=True, validate=validate.Length(min=1))
+    concurrency = fields.Int(validate=validate.Range(min=1, max=64))
+
+class PaginationSchema(Schema):
+    """Esquema para validar parámetros de paginación por cursor"""
+    before = fields.Str()
+    after = fields.Str()
+    limit = fields.Int(validate=validate.Range(min=1, max=200), missing=50)
+    
+    @validates_schema
+    def validate_cursors(self, data, **kwargs):
+        """No se puede paginar hacia atrás y hacia delante a la vez"""
+        if data.get('before') and data.get('after'):
+            raise ValidationError('Use either before or after, not both')
+
+class SearchSchema(Schema):
+    """Esquema para validar parámetros de búsqueda"""
+    q = fields.Str(required=True, validate=validate.Length(min=1, max=200))
+    limit = fields.Int(validate=validate.Range(min=1, max=100), missing=20)
+    offset = fields.Int(validate=validate.Range(min=0, max=10000), missing=0)
+
+class ExportSchema(Schema):
+    """Esquema para validar parámetros de exportación"""
+    compression = fields.Str(validate=validate.OneOf(['gzip', 'zstd', 'none']), missing='gzip')
+
+class ProfileListSchema(Schema):
+    """Esquema para validar el listado de perfiles capturados"""
+    limit = fields.Int(validate=validate.Range(min=1, max=200), missing=20)
+
+class ProfileFileSchema(Schema):
+    """Esquema para validar el formato de descarga de un perfil"""
+    format = fields.Str(validate=validate.OneOf(['speedscope', 'collapsed']), missing='speedscope')
 
 class UserUpdateSchema(Schema):
     """Esquema para actualizar perfil de usuario"""
@@ -0,0 +1,135 @@
+import re
+from weakref import WeakKeyDictionary
+from flask import current_app
+from sqlalchemy import DateTime, bindparam, text
+from app import db
+from app.models import Conversation, Message
+
+SNIPPET_TOKENS = 12
+
+# Motor -> si tiene la tabla messages_fts (se comprueba una vez por motor)
+_fts_tables = WeakKeyDictionary()
+
+def fts_available():
+    """La búsqueda por FTS5 solo existe en SQLite con la tabla de las migraciones
+
+    Una base creada solo con ``db.create_all()`` no tiene ``messages_fts``:
+    entonces se usa la búsqueda por LIKE.
+    """
+    engine = db.engine
+    available = _fts_tables.get(engine)
+    if available is None:
+        available = engine.dialect.name == 'sqlite' and db.session.execute(text(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'messages_fts'"
+        )).first() is not None
+        _fts_tables[engine] = available
+    return available
+
+def escape_like(term):
+    """Escapar los comodines de LIKE (``%`` y ``_``) con ``\\``"""
+    return term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+def build_match_query(user_id, query):
+    """Construir la expresión MATCH de FTS5 a partir del texto del usuario
+
+    Cada palabra se entrecomilla (así los operadores de FTS5 no se interpretan)
+    y la última admite prefijo para buscar mientras se escribe. El filtro por
+    propietario se hace dentro del índice con la columna ``owner``.
+    """
+    terms = re.findall(r'\w+', query)
+    if not terms:
+        return None
+    
+    phrases = [f'"{term}"' for term in terms]
+    phrases[-1] += '*'
+    return f'owner : u{user_id} AND content : ({" ".join(phrases)})'
+
+def search_messages(user_id, query, limit, offset):
+    """Buscar en los mensajes del usuario; devuelve (resultados, hay_más)"""
+    if fts_available():
+        rows = _search_fts(user_id, query, limit + 1, offset)
+    else:
+        rows = _search_like(user_id, query, limit + 1, offset)
+    
+    return rows[:limit], len(rows) > limit
+
+def _search_fts(user_id, query, limit, offset):
+    match = build_match_query(user_id, query)
+    if match is None:
+        return []
+    
+    # Ordenar por bm25 solo las coincidencias más recientes: con términos muy
+    # frecuentes puntuar todas costaría cientos de ms en tablas grandes
+    ranked = db.session.execute(text("""
+        SELECT rowid, score FROM (
+            SELECT rowid, bm25(messages_fts) AS score
+            FROM messages_fts
+            WHERE messages_fts MATCH :match
+            ORDER BY rowid DESC
+            LIMIT :candidates
+        )
+        ORDER BY score, rowid DESC
+        LIMIT :limit OFFSET :offset
+    """), {
+        'match': match,
+        'candidates': current_app.config['SEARCH_MAX_CANDIDATES'],
+        'limit': limit,
+        'offset': offset
+    }).all()
+    
+    if not ranked:
+        return []
+    
+    # Fragmentos y datos de la conversación solo para la página devuelta. Se
+    # recorre el rango de rowids una sola vez (con IN, FTS5 repetiría la
+    # consulta por cada id) y el CASE evita calcular el resto de fragmentos
+    ids = [row.rowid for row in ranked]
+    details = db.session.execute(text(f"""
+        SELECT m.id, m.conversation_id, m.role, m.timestamp, c.title,
+               CASE WHEN messages_fts.rowid IN :ids
+                    THEN snippet(messages_fts, 0, '<mark>', '</mark>', '…', {SNIPPET_TOKENS})
+               END AS snippet
+        FROM messages_fts
+        JOIN messages m ON m.id = messages_fts.rowid
+        JOIN conversations c ON c.id = m.conversation_id
+        WHERE messages_fts MATCH :match
+          AND messages_fts.rowid BETWEEN :first_id AND :last_id
+    """).bindparams(bindparam('ids', expanding=True)).columns(timestamp=DateTime), {
+        'match': match,
+        'ids': ids,
+        'first_id': min(ids),
+        'last_id': max(ids)
+    }).mappings().all()
+    
+    by_id = {row['id']: row for row in details if row['snippet'] is not None}
+    return [
+        _result(by_id[row.rowid], by_id[row.rowid]['snippet'], row.score)
+        for row in ranked if row.rowid in by_id
+    ]
+
+def _search_like(user_id, query, limit, offset):
+    """Alternativa sin FTS5 (p. ej. PostgreSQL): coincidencia simple por ILIKE"""
+    terms = re.findall(r'\w+', query)
+    if not terms:
+        return []
+    
+    q = db.session.query(
+        Message.id, Message.conversation_id, Message.role, Message.timestamp,
+        Conversation.title, Message.content
+    ).join(Conversation, Conversation.id == Message.conversation_id).filter(Conversation.user_id == user_id)
+    for term in terms:
+        q = q.filter(Message.content.ilike(f'%{escape_like(term)}%', escape='\\'))
+    
+    rows = q.order_by(Message.timestamp.desc()).limit(limit).offset(offset).all()
+    return [_result(row._mapping, row.content[:200], None) for row in rows]
+
+def _result(row, snippet, score):
+    return {
+        'message_id': row['id'],
+        'conversation_id': row['conversation_id'],
+        'conversation_title': row['title'],
+        'role': row['role'],
+        'timestamp': row['timestamp'].isoformat(),
+        'snippet': snippet,
+        'score': score
+    }
@@ -0,0 +1,185 @@
+import re
+import threading
+import time
+import zlib
+from importlib import import_module
+from app.cache import normalize_text
+from app.metrics import count_event
+
+# Palabras vacías (español e inglés) que no aportan al significado de la pregunta
+STOPWORDS = {
+    'a', 'al', 'como', 'con', 'cual', 'de', 'del', 'el', 'en', 'es', 'esta', 'este', 'la', 'las',
+    'lo', 'los', 'me', 'mi', 'para', 'por', 'puedo', 'que', 'se', 'su', 'un', 'una', 'y', 'yo',
+    'an', 'and', 'are', 'can', 'do', 'does', 'how', 'i', 'in', 'is', 'it', 'me', 'my', 'of', 'on',
+    'please', 'the', 'to', 'what', 'with', 'you'
+}
+
+class HashingEmbedder:
+    """Embedding local por hashing de palabras, pares de palabras y trigramas
+
+    No necesita entrenamiento ni red: cada palabra (sin palabras vacías), sus
+    trigramas de caracteres y cada par de palabras consecutivas se proyectan a
+    ``dim`` dimensiones con un hash estable y el vector resultante se
+    normaliza. Dos paráfrasis con las mismas palabras clave en el mismo orden
+    ("how do I reverse a list in python" / "how can I reverse a list in
+    python?") quedan muy cerca. Los pares tienen en cuenta el orden: "convert
+    int to str" y "convert str to int" quedan por debajo del umbral (a cambio,
+    reordenar las palabras clave también deja de coincidir, lo que solo cuesta
+    una llamada a Gemini). Se puede sustituir por cualquier ``fn(texto) -> vector``.
+    """
+
+    # Peso de los pares de palabras frente al de cada palabra
+    BIGRAM_WEIGHT = 1.0
+
+    def __init__(self, dim=1024):
+        self.dim = dim
+
+    def _features(self, text):
+        words = [w for w in re.findall(r'\w+', normalize_text(text).casefold()) if w not in STOPWORDS]
+        for word in words:
+            yield word, 1.0
+            padded = f'#{word}#'
+            for i in range(len(padded) - 2):
+                yield padded[i:i + 3], 0.3
+        for first, second in zip(words, words[1:]):
+            yield f'{first} {second}', self.BIGRAM_WEIGHT
+
+    def __call__(self, text):
+        import numpy as np
+
+        vector = np.zeros(self.dim, dtype=np.float32)
+        for feature, weight in self._features(text):
+            bucket = zlib.crc32(feature.encode('utf-8'))
+            sign = 1.0 if bucket & 0x80000000 else -1.0
+            vector[bucket % self.dim] += sign * weight
+
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+class SemanticCache:
+    """Caché semántica: reutiliza respuestas de preguntas casi idénticas
+
+    Guarda los embeddings en una matriz NumPy preasignada y busca por
+    similitud coseno (producto escalar de vectores normalizados). Una
+    respuesta se reutiliza si la similitud supera ``SEMANTIC_CACHE_THRESHOLD``
+    y es del mismo modelo. Al llenarse se desaloja la entrada usada hace más
+    tiempo. Solo tiene sentido para prompts sin contexto (primer mensaje).
+    """
+
+    def __init__(self, app=None):
+        self.enabled = False
+        self.embed = None
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0, 'sets': 0, 'evictions': 0}
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        config = app.config
+        self.enabled = config.get('SEMANTIC_CACHE_ENABLED', False)
+        self.threshold = config.get('SEMANTIC_CACHE_THRESHOLD', 0.9)
+        self.max_entries = config.get('SEMANTIC_CACHE_MAX_ENTRIES', 5000)
+        self.ttl = config.get('SEMANTIC_CACHE_TTL', 3600)
+        app.extensions['semantic_cache'] = self
+
+        if not self.enabled:
+            return
+
+        try:
+            import numpy as np
+        except ImportError:
+            app.logger.warning('SEMANTIC_CACHE_ENABLED requires numpy; semantic cache disabled')
+            self.enabled = False
+            return
+
+        embedder_path = config.get('SEMANTIC_CACHE_EMBEDDER')
+        if embedder_path:
+            module_name, attr = embedder_path.rsplit('.', 1)
+            self.embed = getattr(import_module(module_name), attr)
+        else:
+            self.embed = HashingEmbedder(config.get('SEMANTIC_CACHE_DIM', 1024))
+
+        self._allocate(len(self.embed('dimension probe')))
+
+    def _allocate(self, dim):
+        """Reservar el almacenamiento (vacío) para vectores de ``dim`` dimensiones"""
+        import numpy as np
+
+        self._vectors = np.zeros((self.max_entries, dim), dtype=np.float32)
+        self._last_used = np.zeros(self.max_entries, dtype=np.float64)
+        self._expires_at = np.zeros(self.max_entries, dtype=np.float64)
+        self._model_ids = np.full(self.max_entries, -1, dtype=np.int32)
+        self._model_index = {}
+        self._values = [None] * self.max_entries
+        self._size = 0
+
+    def set_embedder(self, embed):
+        """Sustituir la función de embedding (vacía la caché)
+
+        El nuevo embedding puede tener otra dimensión: se reserva de nuevo el
+        almacenamiento.
+        """
+        dim = len(embed('dimension probe')) if self.enabled else None
+        with self._lock:
+            self.embed = embed
+            if dim is not None:
+                self._allocate(dim)
+
+    def get(self, model_name, text):
+        """Buscar la respuesta de una pregunta similar; None si no hay"""
+        if not self.enabled:
+            return None
+
+        vector = self.embed(text)
+        now = time.time()
+        with self._lock:
+            if self._size:
+                similarities = self._vectors[:self._size] @ vector
+                # Descartar entradas caducadas o de otro modelo
+                similarities[self._expires_at[:self._size] <= now] = -1.0
+                model_id = self._model_index.get(model_name, -1)
+                similarities[self._model_ids[:self._size] != model_id] = -1.0
+
+                best = int(similarities.argmax())
+                if similarities[best] >= self.threshold:
+                    self._last_used[best] = now
+                    self._stats['hits'] += 1
+                    count_event('semantic_cache', 'hits')
+                    return self._values[best]
+
+            self._stats['misses'] += 1
+            count_event('semantic_cache', 'misses')
+            return None
+
+    def set(self, model_name, text, value):
+        """Guardar la respuesta de una pregunta"""
+        if not self.enabled or not value:
+            return
+
+        vector = self.embed(text)
+        now = time.time()
+        with self._lock:
+            if self._size < self.max_entries:
+                index = self._size
+                self._size += 1
+            else:
+                # Desalojar la entrada menos usada recientemente
+                index = int(self._last_used.argmin())
+                self._stats['evictions'] += 1
+
+            self._vectors[index] = vector
+            self._last_used[index] = now
+            self._expires_at[index] = now + self.ttl
+            self._model_ids[index] = self._model_index.setdefault(model_name, len(self._model_index))
+            self._values[index] = value
+            self._stats['sets'] += 1
+
+    def stats(self):
+        """Contadores de aciertos y fallos de este proceso"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats['entries'] = self._size if self.enabled else 0
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_rate'] = stats['hits'] / lookups if lookups else 0.0
+        stats['enabled'] = self.enabled
+        return stats
@@ -0,0 +1,251 @@
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from app.metrics import count_event
+
+class _Call:
+    """Llamada en curso dentro de este proceso"""
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.value = None
+        self.error = None
+
+class Flight:
+    """Participación en una llamada: líder (la ejecuta) o seguidor (espera)
+
+    El líder debe terminar con ``complete(valor)`` o ``fail(error)``; en un
+    seguidor esos métodos no hacen nada.
+    """
+
+    def __init__(self, group, key, call, leader, value=None):
+        self.group = group
+        self.key = key
+        self.call = call
+        self.leader = leader
+        self.value = value
+
+    def wait(self):
+        """Esperar al líder: devuelve su resultado, relanza su error o None si se agota el tiempo"""
+        if self.value is not None:
+            return self.value
+
+        if not self.call.event.wait(self.group.timeout):
+            self.group._count('wait_timeouts')
+            return None
+        if self.call.error is not None:
+            raise self.call.error
+        if self.call.value is None:
+            # El líder se interrumpió sin resultado: que cada uno llame por su cuenta
+            return None
+        self.group._count('coalesced_local')
+        return self.call.value
+
+    def complete(self, value):
+        if self.leader:
+            self.group._finish(self, value=value)
+
+    def fail(self, error):
+        if self.leader:
+            self.group._finish(self, error=error)
+
+class SingleFlight:
+    """Deduplicación de llamadas idénticas a Gemini que coinciden en el tiempo
+
+    Si llegan a la vez varias peticiones con la misma clave (modelo + prompt),
+    solo la primera llama a Gemini y el resto esperan su resultado. Dentro del
+    proceso se coordinan con un ``threading.Event``; con
+    ``SINGLE_FLIGHT_DB_PATH`` además se usa una tabla de bloqueos en SQLite para
+    que un único worker de gunicorn haga la llamada y los demás lean el
+    resultado publicado. Un bloqueo caduca a los ``SINGLE_FLIGHT_LOCK_TTL``
+    segundos por si su worker muere.
+    """
+
+    def __init__(self, app=None):
+        self.enabled = False
+        self.timeout = 60.0
+        self._calls = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._owner = uuid.uuid4().hex
+        self.db_path = None
+        self._stats_lock = threading.Lock()
+        self.reset_stats()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        config = app.config
+        self.enabled = config.get('SINGLE_FLIGHT_ENABLED', True)
+        self.timeout = config.get('SINGLE_FLIGHT_TIMEOUT', 60.0)
+        self.lock_ttl = config.get('SINGLE_FLIGHT_LOCK_TTL', 120.0)
+        self.result_ttl = config.get('SINGLE_FLIGHT_RESULT_TTL', 30.0)
+        self.poll_interval = config.get('SINGLE_FLIGHT_POLL_INTERVAL', 0.1)
+
+        self.db_path = config.get('SINGLE_FLIGHT_DB_PATH') if self.enabled else None
+        if self.db_path:
+            os.makedirs(os.path.dirname(os.path.abspath(self.db_path)), exist_ok=True)
+            conn = self._connection()
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS single_flight_locks ('
+                'key TEXT PRIMARY KEY, owner TEXT NOT NULL, expires_at REAL NOT NULL)'
+            )
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS single_flight_results ('
+                'key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)'
+            )
+
+        app.extensions['single_flight'] = self
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=5, isolation_level=None, check_same_thread=False)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def do(self, key, fn):
+        """Ejecutar ``fn()`` una sola vez por clave; devuelve (valor, compartido)"""
+        flight = self.acquire(key)
+        if not flight.leader:
+            value = flight.wait()
+            if value is not None:
+                return value, True
+            # El líder tardó demasiado: llamar directamente
+            return fn(), False
+
+        try:
+            value = fn()
+        except Exception as e:
+            flight.fail(e)
+            raise
+        flight.complete(value)
+        return value, False
+
+    def acquire(self, key):
+        """Unirse a la llamada de ``key``: como líder si nadie la está haciendo"""
+        if not self.enabled:
+            return Flight(self, key, _Call(), leader=True)
+
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                return Flight(self, key, call, leader=False)
+            call = self._calls[key] = _Call()
+
+        flight = Flight(self, key, call, leader=True)
+        if self.db_path:
+            try:
+                value = self._acquire_across_workers(key)
+            except sqlite3.Error:
+                # La coordinación entre workers es una optimización: seguir como líder local
+                value = None
+            if value is not None:
+                # Otro worker hizo la llamada: compartir su resultado con este proceso
+                self._count('coalesced_remote')
+                self._release_local(key, call, value=value)
+                return Flight(self, key, call, leader=False, value=value)
+
+        self._count('upstream_calls')
+        return flight
+
+    def _acquire_across_workers(self, key):
+        """Tomar el bloqueo de ``key`` o esperar el resultado de su dueño
+
+        Devuelve None si este worker pasa a ser el líder.
+        """
+        conn = self._connection()
+        deadline = time.monotonic() + self.timeout
+
+        while True:
+            now = time.time()
+            claimed = conn.execute(
+                'INSERT INTO single_flight_locks (key, owner, expires_at) VALUES (?, ?, ?) '
+                'ON CONFLICT(key) DO UPDATE SET owner = excluded.owner, expires_at = excluded.expires_at '
+                'WHERE single_flight_locks.expires_at <= ? RETURNING owner',
+                (key, self._owner, now + self.lock_ttl, now)
+            ).fetchall()
+            if claimed:
+                return None
+
+            # Otro worker tiene el bloqueo: esperar a que publique el resultado
+            while time.monotonic() < deadline:
+                row = conn.execute(
+                    'SELECT value FROM single_flight_results WHERE key = ? AND expires_at > ?',
+                    (key, time.time())
+                ).fetchone()
+                if row is not None:
+                    return row[0]
+
+                holder = conn.execute(
+                    'SELECT expires_at FROM single_flight_locks WHERE key = ?', (key,)
+                ).fetchone()
+                if holder is None or holder[0] <= time.time():
+                    # El líder falló o murió sin publicar: intentar tomar el relevo
+                    break
+                time.sleep(self.poll_interval)
+            else:
+                self._count('wait_timeouts')
+                return None
+
+    def _finish(self, flight, value=None, error=None):
+        if self.enabled and self.db_path:
+            try:
+                conn = self._connection()
+                if error is None and value is not None:
+                    conn.execute(
+                        'INSERT OR REPLACE INTO single_flight_results (key, value, expires_at) VALUES (?, ?, ?)',
+                        (flight.key, value, time.time() + self.result_ttl)
+                    )
+                conn.execute(
+                    'DELETE FROM single_flight_locks WHERE key = ? AND owner = ?', (flight.key, self._owner)
+                )
+                self._prune(conn)
+            except sqlite3.Error:
+                pass
+
+        if self.enabled:
+            # Solo se comparten errores normales, no GeneratorExit o KeyboardInterrupt
+            if not isinstance(error, Exception):
+                error = None
+            self._release_local(flight.key, flight.call, value=value, error=error)
+
+    def _release_local(self, key, call, value=None, error=None):
+        call.value = value
+        call.error = error
+        with self._lock:
+            if self._calls.get(key) is call:
+                del self._calls[key]
+        call.event.set()
+
+    def _prune(self, conn):
+        """Borrar de vez en cuando resultados publicados ya caducados"""
+        with self._stats_lock:
+            self._finished += 1
+            due = self._finished % 200 == 0
+        if due:
+            conn.execute('DELETE FROM single_flight_results WHERE expires_at <= ?', (time.time(),))
+
+    def _count(self, name):
+        with self._stats_lock:
+            self._stats[name] += 1
+        count_event('single_flight', name)
+
+    def reset_stats(self):
+        self._finished = 0
+        self._stats = {'upstream_calls': 0, 'coalesced_local': 0, 'coalesced_remote': 0, 'wait_timeouts': 0}
+
+    def stats(self):
+        """Llamadas a Gemini hechas y ahorradas por este proceso"""
+        with self._stats_lock:
+            stats = dict(self._stats)
+        stats['saved_calls'] = stats['coalesced_local'] + stats['coalesced_remote']
+        with self._lock:
+            stats['in_flight'] = len(self._calls)
+        stats['enabled'] = self.enabled
+        stats['shared_across_workers'] = self.db_path is not None
+        return stats
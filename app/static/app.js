@@ -5,6 +5,22 @@ let currentUser = null;
 let currentConversation = null;
 let conversations = [];
 
+// Paginación por cursor
+const MESSAGES_PAGE_SIZE = 50;
+const CONVERSATIONS_PAGE_SIZE = 50;
+let olderMessagesCursor = null;
+let hasOlderMessages = false;
+let loadingOlderMessages = false;
+let conversationsCursor = null;
+let hasMoreConversations = false;
+let loadingConversations = false;
+
+// Búsqueda en mensajes
+const SEARCH_PAGE_SIZE = 20;
+const SEARCH_DEBOUNCE_MS = 250;
+let searchTimer = null;
+let searchRequestId = 0;
+
 // ===== ELEMENTOS DEL DOM =====
 const authPanel = document.getElementById('auth-panel');
 const chatPanel = document.getElementById('chat-panel');
@@ -50,6 +66,19 @@ function setupEventListeners() {
     messageInput.addEventListener('input', updateCharCount);
     messageInput.addEventListener('keydown', handleKeyDown);
     
+    // Carga perezosa: mensajes antiguos al subir y más conversaciones al bajar
+    chatMessages.addEventListener('scroll', handleMessagesScroll);
+    const conversationsList = document.getElementById('conversations-list');
+    if (conversationsList) {
+        conversationsList.addEventListener('scroll', handleConversationsScroll);
+    }
+    
+    // Búsqueda mientras se escribe
+    const searchInput = document.getElementById('search-input');
+    if (searchInput) {
+        searchInput.addEventListener('input', handleSearchInput);
+    }
+    
     // Botones
     document.getElementById('logout-btn').addEventListener('click', handleLogout);
     document.getElementById('clear-chat').addEventListener('click', handleClearChat);
@@ -160,7 +189,7 @@ async function loadConversations() {
     if (!currentToken) return;
     
     try {
-        const response = await fetch('/api/chat/conversations', {
+        const response = await fetch(`/api/chat/conversations?limit=${CONVERSATIONS_PAGE_SIZE}`, {
             headers: {
                 'Authorization': `Bearer ${currentToken}`
             }
@@ -169,6 +198,8 @@ async function loadConversations() {
         if (response.ok) {
             const data = await response.json();
             conversations = data.conversations;
+            conversationsCursor = data.next_cursor;
+            hasMoreConversations = data.has_more;
             renderConversationsList();
             
             // Si hay conversaciones, cargar la primera
@@ -186,6 +217,39 @@ async function loadConversations() {
     }
 }
 
+async function loadMoreConversations() {
+    if (!currentToken || !hasMoreConversations || loadingConversations) return;
+    
+    loadingConversations = true;
+    try {
+        const response = await fetch(`/api/chat/conversations?limit=${CONVERSATIONS_PAGE_SIZE}&before=${encodeURIComponent(conversationsCursor)}`, {
+            headers: {
+                'Authorization': `Bearer ${currentToken}`
+            }
+        });
+        
+        if (response.ok) {
+            const data = await response.json();
+            const knownIds = new Set(conversations.map(c => c.id));
+            conversations = conversations.concat(data.conversations.filter(c => !knownIds.has(c.id)));
+            conversationsCursor = data.next_cursor;
+            hasMoreConversations = data.has_more;
+            renderConversationsList();
+        }
+    } catch (error) {
+        console.error('Error loading more conversations:', error);
+    } finally {
+        loadingConversations = false;
+    }
+}
+
+function handleConversationsScroll(e) {
+    const list = e.target;
+    if (list.scrollTop + list.clientHeight >= list.scrollHeight - 100) {
+        loadMoreConversations();
+    }
+}
+
 async function createNewConversation() {
     if (!currentToken) return;
     
@@ -216,8 +280,8 @@ async function selectConversation(conversationId) {
     if (!currentToken) return;
     
     try {
-        // Cargar mensajes de la conversación
-        const response = await fetch(`/api/chat/conversations/${conversationId}/messages`, {
+        // Cargar solo la página más reciente de mensajes
+        const response = await fetch(`/api/chat/conversations/${conversationId}/messages?limit=${MESSAGES_PAGE_SIZE}`, {
             headers: {
                 'Authorization': `Bearer ${currentToken}`
             }
@@ -225,7 +289,10 @@ async function selectConversation(conversationId) {
         
         if (response.ok) {
             const data = await response.json();
-            currentConversation = conversations.find(c => c.id === conversationId);
+            // Un resultado de búsqueda puede ser de una conversación que aún no está en la página cargada
+            currentConversation = conversations.find(c => c.id === conversationId) || await fetchConversation(conversationId);
+            olderMessagesCursor = data.cursors.before;
+            hasOlderMessages = data.has_more;
             
             // Limpiar chat y mostrar mensajes
             clearChatMessages();
@@ -244,6 +311,69 @@ async function selectConversation(conversationId) {
     }
 }
 
+async function fetchConversation(conversationId) {
+    try {
+        const response = await fetch(`/api/chat/conversations/${conversationId}`, {
+            headers: {
+                'Authorization': `Bearer ${currentToken}`
+            }
+        });
+        
+        if (response.ok) {
+            const data = await response.json();
+            return data.conversation;
+        }
+    } catch (error) {
+        console.error('Error loading conversation:', error);
+    }
+    return null;
+}
+
+async function loadOlderMessages() {
+    if (!currentToken || !currentConversation || !hasOlderMessages || loadingOlderMessages) return;
+    
+    loadingOlderMessages = true;
+    const conversationId = currentConversation.id;
+    try {
+        const response = await fetch(`/api/chat/conversations/${conversationId}/messages?limit=${MESSAGES_PAGE_SIZE}&before=${encodeURIComponent(olderMessagesCursor)}`, {
+            headers: {
+                'Authorization': `Bearer ${currentToken}`
+            }
+        });
+        
+        // Ignorar la respuesta si el usuario cambió de conversación mientras tanto
+        if (response.ok && currentConversation && currentConversation.id === conversationId) {
+            const data = await response.json();
+            olderMessagesCursor = data.cursors.before;
+            hasOlderMessages = data.has_more;
+            prependMessages(data.messages);
+        }
+    } catch (error) {
+        console.error('Error loading older messages:', error);
+    } finally {
+        loadingOlderMessages = false;
+    }
+}
+
+function prependMessages(messages) {
+    // Insertar los mensajes antes del primero visible manteniendo la posición del scroll
+    const previousHeight = chatMessages.scrollHeight;
+    const firstMessage = chatMessages.querySelector('.message-container');
+    
+    messages.forEach(message => {
+        const element = createMessageElement(message.content, message.role === 'user' ? 'user' : 'bot', false, message.id);
+        chatMessages.insertBefore(element, firstMessage);
+    });
+    
+    chatMessages.scrollTop += chatMessages.scrollHeight - previousHeight;
+}
+
+function handleMessagesScroll() {
+    if (chatMessages.scrollTop < 100) {
+        loadOlderMessages();
+    }
+}
+
 async function deleteConversation(conversationId) {
     if (!currentToken || !confirm('¿Estás seguro de que quieres eliminar esta conversación?')) return;
     
@@ -270,7 +400,7 @@ async function deleteConversation(conversationId) {
 }
 
 // ===== FUNCIONES DE CHAT =====
-async function sendMessage(messageText) {
+async function sendMessage(messageText, onToken = null) {
     if (!currentToken || !currentConversation) {
         showMessage('No hay conversación activa. Creando una nueva...', 'warning');
         await createNewConversation();
@@ -278,35 +408,53 @@ async function sendMessage(messageText) {
     }
     
     try {
-        const response = await fetch(`/api/chat/conversations/${currentConversation.id}/messages`, {
+        const response = await fetch(`/api/chat/conversations/${currentConversation.id}/messages?stream=true`, {
             method: 'POST',
             headers: {
                 'Content-Type': 'application/json',
+                'Accept': 'text/event-stream',
                 'Authorization': `Bearer ${currentToken}`
             },
             body: JSON.stringify({ content: messageText })
         });
         
-        const data = await response.json();
-        
-        if (response.ok) {
-            return {
-                success: true,
-                userMessage: data.user_message,
-                aiResponse: data.ai_response,
-                conversationUpdated: data.conversation_updated || null,
-                timestamp: new Date().toISOString()
-            };
-        } else {
+        if (!response.ok) {
+            const data = await response.json();
             if (response.status === 401 || response.status === 422) {
                 showMessage('Sesión expirada. Por favor, inicia sesión nuevamente.', 'error');
                 setTimeout(() => handleLogout(), 2000);
             }
+            if (response.status === 429) {
+                const retryAfter = response.headers.get('Retry-After') || data.retry_after;
+                return {
+                    success: false,
+                    error: `Has alcanzado el límite de mensajes. Inténtalo de nuevo en ${retryAfter} s.`
+                };
+            }
             return {
                 success: false,
                 error: data.error || 'Error al enviar mensaje'
             };
         }
+        
+        // Leer los eventos SSE a medida que llegan
+        const data = await readMessageStream(response, onToken);
+        
+        if (data.error) {
+            return {
+                success: false,
+                error: data.error
+            };
+        }
+        
+        return {
+            success: true,
+            userMessage: data.user_message,
+            aiResponse: data.ai_response,
+            conversationUpdated: data.conversation_updated || null,
+            titleJobId: data.title_job_id || null,
+            timestamp: new Date().toISOString()
+        };
     } catch (error) {
         console.error('Send message error:', error);
         return {
@@ -316,6 +464,121 @@ async function sendMessage(messageText) {
     }
 }
 
+async function readMessageStream(response, onToken) {
+    // Parsear el flujo "event: ...\ndata: ...\n\n" enviado por el servidor
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+    let result = { error: 'La respuesta terminó inesperadamente' };
+    
+    while (true) {
+        const { value, done } = await reader.read();
+        if (done) break;
+        
+        buffer += decoder.decode(value, { stream: true });
+        const events = buffer.split('\n\n');
+        buffer = events.pop();
+        
+        for (const rawEvent of events) {
+            let eventName = 'message';
+            let eventData = '';
+            rawEvent.split('\n').forEach(line => {
+                if (line.startsWith('event: ')) eventName = line.slice(7);
+                else if (line.startsWith('data: ')) eventData += line.slice(6);
+            });
+            if (!eventData) continue;
+            
+            const payload = JSON.parse(eventData);
+            if (eventName === 'token') {
+                if (onToken) onToken(payload.text);
+            } else if (eventName === 'done') {
+                result = payload;
+            } else if (eventName === 'error') {
+                result = { error: payload.error || 'Error al enviar mensaje' };
+            }
+        }
+    }
+    
+    return result;
+}
+
+function createStreamingRenderer() {
+    // Crea la burbuja del bot con el primer fragmento y la va completando
+    let messageId = null;
+    let text = '';
+    
+    return {
+        onToken(chunk) {
+            text += chunk;
+            if (!messageId) {
+                hideTypingIndicator();
+                messageId = addMessage(text, 'bot');
+            } else {
+                updateMessageText(messageId, text);
+            }
+        },
+        finish(content) {
+            if (!messageId) {
+                addMessage(content, 'bot');
+            } else if (content !== text) {
+                updateMessageText(messageId, content);
+            }
+        },
+        discard() {
+            if (messageId) {
+                const container = document.querySelector(`[data-message-id="${messageId}"]`);
+                if (container) container.remove();
+            }
+        }
+    };
+}
+
+async function pollTitleJob(jobId, attempts = 20) {
+    // Consultar el trabajo hasta que termine y aplicar el título generado
+    for (let i = 0; i < attempts; i++) {
+        await new Promise(resolve => setTimeout(resolve, 1000));
+        if (!currentToken) return;
+        
+        try {
+            const response = await fetch(`/api/chat/jobs/${jobId}`, {
+                headers: {
+                    'Authorization': `Bearer ${currentToken}`
+                }
+            });
+            if (!response.ok) return;
+            
+            const data = await response.json();
+            if (data.job.status === 'failed') return;
+            if (data.job.status !== 'done') continue;
+            
+            const updated = data.job.result && data.job.result.conversation;
+            if (updated) {
+                const index = conversations.findIndex(c => c.id === updated.id);
+                if (index !== -1) {
+                    conversations[index] = { ...conversations[index], ...updated };
+                }
+                if (currentConversation && currentConversation.id === updated.id) {
+                    currentConversation = { ...currentConversation, ...updated };
+                }
+                renderConversationsList();
+            }
+            return;
+        } catch (error) {
+            console.error('Error polling title job:', error);
+        }
+    }
+}
+
+function updateMessageText(messageId, content) {
+    const messageContainer = document.querySelector(`[data-message-id="${messageId}"]`);
+    if (!messageContainer) return;
+    
+    const messageText = messageContainer.querySelector('.message-text');
+    const formattedContent = content.replace(/\n/g, '<br>');
+    messageText.innerHTML = `<p>${formattedContent}</p>`;
+    scrollToBottom();
+}
+
 async function handleNewConversation() {
     await createNewConversation();
 }
@@ -339,15 +602,16 @@ async function handleSendMessage(e) {
     // Mostrar indicador de escritura
     showTypingIndicator();
     
-    // Enviar mensaje
-    const result = await sendMessage(messageText);
+    // Enviar mensaje (los fragmentos se muestran a medida que llegan)
+    const renderer = createStreamingRenderer();
+    const result = await sendMessage(messageText, renderer.onToken);
     
     // Ocultar indicador de escritura
     hideTypingIndicator();
     
     if (result.success) {
-        // Mostrar respuesta de Gemini
-        addMessage(result.aiResponse.content, 'bot');
+        // Mostrar respuesta completa de Gemini
+        renderer.finish(result.aiResponse.content);
         
         // Si la conversación fue actualizada con nuevo título, actualizar en el frontend
         if (result.conversationUpdated) {
@@ -359,8 +623,14 @@ async function handleSendMessage(e) {
                 renderConversationsList();
             }
         }
+        
+        // El título definitivo se genera en segundo plano
+        if (result.titleJobId) {
+            pollTitleJob(result.titleJobId);
+        }
     } else {
         // Mostrar error
+        renderer.discard();
         addMessage(`Error: ${result.error}`, 'bot', true);
     }
     
@@ -370,6 +640,15 @@ async function handleSendMessage(e) {
 }
 
 function addMessage(content, sender, isError = false, messageId = null) {
+    const messageContainer = createMessageElement(content, sender, isError, messageId);
+    
+    chatMessages.appendChild(messageContainer);
+    scrollToBottom();
+    
+    return messageContainer.getAttribute('data-message-id');
+}
+
+function createMessageElement(content, sender, isError = false, messageId = null) {
     const messageContainer = document.createElement('div');
     messageContainer.className = `message-container ${sender}`;
     
@@ -423,10 +702,7 @@ function addMessage(content, sender, isError = false, messageId = null) {
     messageContainer.appendChild(avatar);
     messageContainer.appendChild(messageContent);
     
-    chatMessages.appendChild(messageContainer);
-    scrollToBottom();
-    
-    return messageId;
+    return messageContainer;
 }
 
 function showTypingIndicator() {
@@ -452,6 +728,8 @@ function handleClearChat() {
 
 function clearChatMessages() {
     chatMessages.innerHTML = '';
+    olderMessagesCursor = null;
+    hasOlderMessages = false;
 }
 
 // ===== FUNCIONES DE EDICIÓN DE MENSAJES =====
@@ -582,14 +860,15 @@ async function saveAndResendMessage(messageId, newText) {
     showTypingIndicator();
     
     // Re-enviar mensaje
-    const result = await sendMessage(newText);
+    const renderer = createStreamingRenderer();
+    const result = await sendMessage(newText, renderer.onToken);
     
     // Ocultar indicador de escritura
     hideTypingIndicator();
     
     if (result.success) {
         // Mostrar nueva respuesta de Gemini
-        addMessage(result.aiResponse.content, 'bot');
+        renderer.finish(result.aiResponse.content);
         
         // Si la conversación fue actualizada con nuevo título, actualizar en el frontend
         if (result.conversationUpdated) {
@@ -601,8 +880,14 @@ async function saveAndResendMessage(messageId, newText) {
                 renderConversationsList();
             }
         }
+        
+        // El título definitivo se genera en segundo plano
+        if (result.titleJobId) {
+            pollTitleJob(result.titleJobId);
+        }
     } else {
         // Mostrar error
+        renderer.discard();
         addMessage(`Error: ${result.error}`, 'bot', true);
     }
     
@@ -794,6 +1079,105 @@ function renderConversationsList() {
     });
 }
 
+// ===== BÚSQUEDA EN MENSAJES =====
+function handleSearchInput(e) {
+    const query = e.target.value.trim();
+    clearTimeout(searchTimer);
+    
+    if (!query) {
+        hideSearchResults();
+        return;
+    }
+    
+    searchTimer = setTimeout(() => searchMessages(query), SEARCH_DEBOUNCE_MS);
+}
+
+async function searchMessages(query, offset = 0) {
+    if (!currentToken) return;
+    
+    // Descartar respuestas de búsquedas anteriores que lleguen tarde
+    const requestId = ++searchRequestId;
+    const params = new URLSearchParams({ q: query, limit: SEARCH_PAGE_SIZE, offset: offset });
+    
+    try {
+        const response = await fetch(`${API_BASE_URL}/api/chat/search?${params}`, {
+            headers: {
+                'Authorization': `Bearer ${currentToken}`
+            }
+        });
+        
+        if (requestId !== searchRequestId) return;
+        
+        if (response.ok) {
+            const data = await response.json();
+            renderSearchResults(query, data, offset > 0);
+        }
+    } catch (error) {
+        console.error('Error buscando mensajes:', error);
+    }
+}
+
+function renderSearchResults(query, data, append) {
+    const resultsContainer = document.getElementById('search-results');
+    const conversationsList = document.getElementById('conversations-list');
+    if (!resultsContainer) return;
+    
+    if (!append) {
+        resultsContainer.innerHTML = '';
+    }
+    resultsContainer.querySelector('.search-more')?.remove();
+    
+    if (!append && data.results.length === 0) {
+        resultsContainer.innerHTML = '<div class="search-empty">Sin resultados</div>';
+    }
+    
+    data.results.forEach(result => {
+        const resultElement = document.createElement('div');
+        resultElement.className = 'search-result';
+        resultElement.innerHTML = `
+            <div class="search-result-title">${escapeHtml(result.conversation_title)}</div>
+            <div class="search-result-snippet">${highlightSnippet(result.snippet)}</div>
+        `;
+        resultElement.addEventListener('click', () => selectConversation(result.conversation_id));
+        resultsContainer.appendChild(resultElement);
+    });
+    
+    if (data.has_more) {
+        const moreButton = document.createElement('button');
+        moreButton.className = 'search-more';
+        moreButton.textContent = 'Más resultados';
+        moreButton.addEventListener('click', () => searchMessages(query, data.next_offset));
+        resultsContainer.appendChild(moreButton);
+    }
+    
+    resultsContainer.style.display = 'block';
+    if (conversationsList) conversationsList.style.display = 'none';
+}
+
+function hideSearchResults() {
+    searchRequestId++;
+    const resultsContainer = document.getElementById('search-results');
+    const conversationsList = document.getElementById('conversations-list');
+    if (resultsContainer) {
+        resultsContainer.style.display = 'none';
+        resultsContainer.innerHTML = '';
+    }
+    if (conversationsList) conversationsList.style.display = '';
+}
+
+function escapeHtml(text) {
+    const div = document.createElement('div');
+    div.textContent = text ?? '';
+    return div.innerHTML;
+}
+
+function highlightSnippet(snippet) {
+    // El servidor marca las coincidencias con <mark>; el resto se escapa
+    return escapeHtml(snippet)
+        .replace(/&lt;mark&gt;/g, '<mark>')
+        .replace(/&lt;\/mark&gt;/g, '</mark>');
+}
+
 // ===== FUNCIONES DE REDIMENSIONAMIENTO DEL SIDEBAR =====
 function setupSidebarResize() {
     const sidebar = document.getElementById('conversations-sidebar');
@@ -0,0 +1,62 @@
+from flask import current_app
+from sqlalchemy import update
+from app import db, job_queue, title_cache
+from app.models import Conversation
+from app.utils import get_gemini_model
+
+DEFAULT_TITLE = 'Nueva Conversación'
+
+def fallback_title(content):
+    """Título de respaldo: las primeras palabras del mensaje"""
+    words = content.split()[:6]
+    return ' '.join(words) + ('...' if len(content.split()) > 6 else '')
+
+def generate_title(model, content):
+    """Pedir a Gemini un título para la conversación a partir del primer mensaje
+
+    Devuelve None si el título generado no es válido; los errores de la API se
+    propagan para que la cola de trabajos reintente.
+    """
+    title_prompt = f"""Genera un título descriptivo y conciso (máximo 6 palabras) para una conversación que comienza con este mensaje: "{content}"
+
+Responde SOLO con el título, sin comillas ni explicaciones adicionales. El título debe ser claro y representar el tema principal."""
+    
+    title_response = model.generate_content(title_prompt)
+    generated_title = title_response.text.strip()
+    
+    # Limpiar el título (remover comillas si las hay)
+    generated_title = generated_title.replace('"', '').replace("'", "").strip()
+    
+    # Validar que el título no esté vacío y no sea muy largo
+    if generated_title and len(generated_title) <= 50:
+        return generated_title
+    return None
+
+@job_queue.handler('generate_title')
+def generate_title_job(payload):
+    """Trabajo: sustituir el título de respaldo por uno generado por Gemini"""
+    conversation = db.session.get(Conversation, payload['conversation_id'])
+    if not conversation:
+        return None
+    
+    model_name = current_app.config['GEMINI_DEFAULT_MODEL']
+    cache_key = title_cache.make_key(model_name, payload['content'])
+    
+    title = title_cache.get(cache_key)
+    if title is None:
+        title = generate_title(get_gemini_model(model_name), payload['content'])
+        title_cache.set(cache_key, title)
+    
+    # No pisar el título si el usuario (u otro trabajo) ya lo cambió. UPDATE
+    # de Core con updated_at explícito: cambiar el título no es actividad de
+    # la conversación (no debe reordenar la lista ni los cursores abiertos)
+    if title and conversation.title == payload['fallback_title']:
+        conversations = Conversation.__table__
+        db.session.execute(
+            update(conversations)
+            .where(conversations.c.id == conversation.id, conversations.c.title == payload['fallback_title'])
+            .values(title=title, updated_at=conversations.c.updated_at)
+        )
+        db.session.commit()
+    
+    return {'conversation': conversation.to_dict()}
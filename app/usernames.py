@@ -0,0 +1,191 @@
+"""Asignación de usernames únicos a partir del email
+
+El username es la parte del email antes de la '@' y, si ya existe, esa base
+con un sufijo numérico (``info``, ``info1``, ``info2``...). En lugar de probar
+candidatos uno a uno, ``username_counters`` guarda el último sufijo usado por
+cada base y un UPSERT con RETURNING reserva el siguiente (o un rango, en las
+importaciones) en una sola sentencia atómica. Si el candidato choca con un
+username existente (p. ej. ``info1`` registrado con el email ``info1@...``) la
+restricción UNIQUE lo rechaza y se reserva otro sufijo.
+"""
+import re
+from datetime import datetime
+from sqlalchemy import select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import IntegrityError
+from app import db
+from app.models import User, UsernameCounter
+from app.passwords import hash_password
+
+# Espacio reservado para el sufijo dentro de los 80 caracteres del username
+MAX_BASE_LENGTH = 70
+
+# Reservas antes de dar por fallido un registro (solo choques muy improbables)
+MAX_ATTEMPTS = 10
+
+class EmailAlreadyExists(ValueError):
+    """Otro registro con el mismo email se guardó antes"""
+
+def username_base(email):
+    """Base del username: la parte del email antes de la '@'"""
+    return email.split('@')[0][:MAX_BASE_LENGTH] or 'user'
+
+def candidate(base, suffix):
+    return base if suffix == 0 else f'{base}{suffix}'
+
+def _reserve(counts):
+    """Un UPSERT ... RETURNING para todas las bases: {base: último sufijo reservado}
+
+    Fila nueva: sufijos 0..n-1. Fila existente: los n siguientes al último.
+    """
+    counters = UsernameCounter.__table__
+    dialect = db.session.get_bind().dialect.name
+    insert = postgresql.insert if dialect == 'postgresql' else sqlite.insert
+
+    # Orden fijo de las filas para que dos reservas simultáneas no se bloqueen en cruz
+    statement = insert(counters).values([
+        {'base': base, 'last_suffix': counts[base] - 1} for base in sorted(counts)
+    ])
+    statement = statement.on_conflict_do_update(
+        index_elements=[counters.c.base],
+        set_={'last_suffix': counters.c.last_suffix + statement.excluded.last_suffix + 1}
+    ).returning(counters.c.base, counters.c.last_suffix)
+    return {row.base: row.last_suffix for row in db.session.execute(statement)}
+
+def reserve_usernames(bases):
+    """Reservar un username por cada base de la lista (puede haber repetidas)
+
+    Devuelve los usernames en el orden de ``bases``. Se ejecuta en la
+    transacción en curso: los contadores quedan bloqueados hasta su commit.
+    """
+    counts = {}
+    for base in bases:
+        counts[base] = counts.get(base, 0) + 1
+
+    last = _reserve(counts)
+    next_suffix = {base: last[base] - count + 1 for base, count in counts.items()}
+    usernames = []
+    for base in bases:
+        usernames.append(candidate(base, next_suffix[base]))
+        next_suffix[base] += 1
+    return usernames
+
+def add_user(user):
+    """Asignar username a un usuario nuevo e insertarlo (sin commit)
+
+    Cada intento va en un SAVEPOINT: si el username choca se deshace solo la
+    inserción y el contador conserva el sufijo gastado. Lanza
+    ``EmailAlreadyExists`` si otro registro simultáneo usó el mismo email.
+    """
+    base = username_base(user.email)
+    for _ in range(MAX_ATTEMPTS):
+        user.username = reserve_usernames([base])[0]
+        if _try_insert(user):
+            return user
+    raise RuntimeError(f'Could not allocate a username for base {base!r}')
+
+def _try_insert(user):
+    """Insertar en un SAVEPOINT; False si el username ya estaba ocupado"""
+    try:
+        with db.session.begin_nested():
+            db.session.add(user)
+        return True
+    except IntegrityError:
+        if email_exists(user.email):
+            raise EmailAlreadyExists(user.email)
+        return False
+
+def email_exists(email):
+    users = User.__table__
+    return db.session.execute(select(users.c.id).where(users.c.email == email)).first() is not None
+
+def import_users(records, batch_size=1000):
+    """Crear usuarios en bloque; devuelve contadores
+
+    Cada registro lleva ``email`` y ``password`` (se hashea con la política
+    actual) o ``password_hash`` (formato werkzeug, p. ej. de otra instancia).
+    Se omiten los emails ya registrados o repetidos y los registros sin
+    contraseña. Por lote: una consulta de emails existentes, un UPSERT para
+    reservar todos los usernames y un INSERT múltiple; si algún username
+    choca, ese lote se inserta fila a fila.
+    """
+    stats = {'imported': 0, 'skipped': 0}
+    batch = []
+    for record in records:
+        batch.append(record)
+        if len(batch) >= batch_size:
+            _import_batch(batch, stats)
+            batch = []
+    if batch:
+        _import_batch(batch, stats)
+    return stats
+
+def _import_batch(records, stats):
+    users = User.__table__
+
+    emails = [(record.get('email') or '').strip() for record in records]
+    existing = set(db.session.execute(select(users.c.email).where(users.c.email.in_(emails))).scalars())
+
+    rows = []
+    for email, record in zip(emails, records):
+        if not email or email in existing or not (record.get('password') or record.get('password_hash')):
+            stats['skipped'] += 1
+            continue
+        existing.add(email)
+        rows.append({
+            'email': email,
+            'password_hash': record.get('password_hash') or hash_password(record['password']),
+            'is_active': True,
+            'token_version': 0,
+            'created_at': datetime.utcnow()
+        })
+    if not rows:
+        return
+
+    for row, username in zip(rows, reserve_usernames([username_base(row['email']) for row in rows])):
+        row['username'] = username
+    try:
+        with db.session.begin_nested():
+            db.session.execute(users.insert(), rows)
+        stats['imported'] += len(rows)
+    except IntegrityError:
+        # Algún username ya existía fuera de los contadores (o un email se
+        # registró mientras tanto): fila a fila, reservando otro si choca
+        for row in rows:
+            user = User(**row)
+            try:
+                if not _try_insert(user):
+                    add_user(user)
+                stats['imported'] += 1
+            except EmailAlreadyExists:
+                stats['skipped'] += 1
+    db.session.commit()
+
+def backfill_counters(connection):
+    """Inicializar los contadores a partir de los usernames existentes
+
+    Para cada base (derivada del email) se guarda el mayor sufijo ya ocupado,
+    de modo que la primera reserva no tenga que ir chocando con ellos. Se
+    ejecuta en la migración que crea ``username_counters``, con su conexión.
+    """
+    users, counters = User.__table__, UsernameCounter.__table__
+    taken = set(connection.execute(select(users.c.username)).scalars())
+    bases = {username_base(email) for email in connection.execute(select(users.c.email)).scalars()}
+
+    last = {}
+    for username in taken:
+        match = re.match(r'^(.*?)(\d*)$', username)
+        prefix, digits = match.group(1), match.group(2)
+        # 'info12' puede ser la base 'info' con sufijo 12 o la base 'info1' con sufijo 2
+        for cut in range(len(digits) + 1):
+            base = prefix + digits[:cut]
+            rest = digits[cut:]
+            if base in bases and (rest == '' or not rest.startswith('0')):
+                suffix = int(rest) if rest else 0
+                if suffix > last.get(base, -1):
+                    last[base] = suffix
+
+    rows = [{'base': base, 'last_suffix': suffix} for base, suffix in last.items()]
+    if rows:
+        connection.execute(counters.insert(), rows)
+    return len(rows)
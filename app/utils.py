@@ -1,29 +1,35 @@
+import base64
 import logging
+import math
+import os
 from datetime import datetime
 from flask import jsonify, current_app
-import google.generativeai as genai
+from marshmallow import ValidationError
 from app.config import Config
 
 def handle_error(error):
     """Manejar errores de forma centralizada"""
-    # Log del error
-    current_app.logger.error(f"Error: {str(error)}")
+    # Log del error (con la causa original si la hay)
+    cause = f" (causa: {error.__cause__!r})" if error.__cause__ else ""
+    current_app.logger.error(f"Error: {str(error)}{cause}")
     
-    # Si es un error conocido, devolver mensaje específico
-    if hasattr(error, 'code'):
-        return jsonify({'error': str(error)}), error.code
+    # Si es un error conocido (con código HTTP), devolver mensaje específico.
+    # Las excepciones de SQLAlchemy también tienen ``code`` (texto) y su
+    # mensaje incluye la sentencia SQL: esas van por el error genérico
+    if isinstance(getattr(error, 'code', None), int):
+        response = jsonify({'error': str(error)})
+        response.status_code = error.code
+        # Errores temporales (cuotas, Gemini no disponible) indican cuándo reintentar
+        if getattr(error, 'retry_after', None):
+            response.headers['Retry-After'] = str(max(1, math.ceil(error.retry_after)))
+        return response
     
     # Error genérico del servidor
     return jsonify({'error': 'Internal server error'}), 500
 
-def configure_gemini():
-    """Configurar la API de Gemini"""
-    api_key = current_app.config.get('GEMINI_API_KEY')
-    
-    if not api_key:
-        raise ValueError('GEMINI_API_KEY not found in configuration')
-    
-    genai.configure(api_key=api_key)
+def get_gemini_model(model_name=None, generation_config=None):
+    """Obtener un modelo de Gemini del registro compartido del proceso"""
+    return current_app.extensions['model_registry'].get(model_name, generation_config)
 
 def validate_gemini_response(response):
     """Validar respuesta de Gemini AI"""
@@ -39,8 +45,11 @@ def setup_logging(app):
     """Configurar logging para la aplicación"""
     if not app.debug and not app.testing:
         # Configurar logging para producción
-        if not app.logger.handlers:
-            file_handler = logging.FileHandler('logs/flask_gemini.log')
+        # Flask ya añade su handler de consola: comprobar solo el de fichero
+        if not any(isinstance(handler, logging.FileHandler) for handler in app.logger.handlers):
+            log_file = app.config.get('LOG_FILE', 'logs/flask_gemini.log')
+            os.makedirs(os.path.dirname(log_file) or '.', exist_ok=True)
+            file_handler = logging.FileHandler(log_file)
             file_handler.setFormatter(logging.Formatter(
                 '%(asctime)s %(levelname)s: %(message)s [in %(pathname)s:%(lineno)d]'
             ))
@@ -61,6 +70,20 @@ def sanitize_input(text):
     
     return text.strip()
 
+def encode_cursor(timestamp, item_id):
+    """Codificar un cursor opaco de paginación a partir de (timestamp, id)"""
+    raw = f"{timestamp.isoformat()}|{item_id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+def decode_cursor(cursor):
+    """Decodificar un cursor de paginación; lanza ValidationError si no es válido"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        timestamp, item_id = base64.urlsafe_b64decode(padded.encode()).decode().split('|')
+        return datetime.fromisoformat(timestamp), int(item_id)
+    except (ValueError, UnicodeDecodeError):
+        raise ValidationError({'cursor': ['Invalid pagination cursor']})
+
 def truncate_text(text, max_length=1000):
     """Truncar texto si es muy largo"""
     if len(text) <= max_length:
@@ -0,0 +1,167 @@
+#!/usr/bin/env python
+"""
+Prueba de carga: servidor síncrono vs servidor gevent con un modelo lento simulado
+
+Levanta la app dos veces (un worker síncrono y un worker gevent) sobre una base
+de datos SQLite temporal, sustituye Gemini por un modelo falso que tarda
+--latency segundos en responder y lanza peticiones concurrentes contra
+POST /api/chat/conversations/<id>/messages.
+
+Con --gemini-timeout se fija el plazo por intento de las llamadas a Gemini
+(GEMINI_TIMEOUT). Si las llamadas tuvieran que esperar turno en un pool de
+hilos limitado, gastarían ese plazo en la cola y el modo gevent acabaría en
+reintentos y errores 503/504 en lugar de atender la concurrencia completa.
+
+Uso:
+    python bench_concurrency.py --requests 200 --concurrency 100 --latency 0.5
+
+    # Más llamadas a Gemini en vuelo que GEMINI_EXECUTOR_WORKERS (32): con
+    # gevent todas deben terminar bien (un greenlet por llamada, sin cola)
+    python bench_concurrency.py --modes gevent --requests 300 --concurrency 150 --latency 1 --gemini-timeout 3
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+
+def serve(mode, port, latency, database_url, gemini_timeout=None):
+    """Levantar la app en el modo indicado (se ejecuta en un subproceso)"""
+    if mode == 'gevent':
+        from gevent import monkey
+        monkey.patch_all()
+
+    os.environ['DATABASE_URL'] = database_url
+    from app import create_app, db, model_registry
+    from app.config import GeventConfig, Config
+    from app.fake_gemini import FakeGeminiModel
+
+    # Toda la carga va con un único usuario: sin desactivar las cuotas casi
+    # todas las peticiones terminarían en 429 y no se mediría nada
+    base = GeventConfig if mode == 'gevent' else Config
+    settings = {'RATE_LIMIT_ENABLED': False}
+    if gemini_timeout:
+        settings['GEMINI_TIMEOUT'] = gemini_timeout
+    app = create_app(type('BenchConfig', (base,), settings))
+    model_registry.use_model(FakeGeminiModel(latency=latency))
+    with app.app_context():
+        db.create_all()
+
+    if mode == 'gevent':
+        from gevent.pywsgi import WSGIServer
+        WSGIServer(('127.0.0.1', port), app, log=None).serve_forever()
+    else:
+        # Equivalente a un worker síncrono de gunicorn: una petición a la vez
+        from werkzeug.serving import make_server
+        make_server('127.0.0.1', port, app, threaded=False).serve_forever()
+
+
+def wait_until_ready(base_url, timeout=15):
+    import requests
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            requests.get(base_url + '/', timeout=1)
+            return True
+        except requests.RequestException:
+            time.sleep(0.2)
+    return False
+
+
+def run_load(base_url, total_requests, concurrency):
+    """Registrar un usuario, crear conversaciones y enviar mensajes concurrentes"""
+    # requests se importa aquí para que el servidor gevent parchee antes
+    import requests
+
+    email = f"bench_{int(time.time() * 1000)}@example.com"
+    response = requests.post(f"{base_url}/api/auth/register", json={'email': email, 'password': 'bench123'})
+    headers = {'Authorization': f"Bearer {response.json()['access_token']}"}
+
+    conversation_ids = []
+    for i in range(concurrency):
+        response = requests.post(f"{base_url}/api/chat/conversations", json={'title': f'Bench {i}'}, headers=headers)
+        conversation_ids.append(response.json()['conversation']['id'])
+
+    def send(i):
+        conversation_id = conversation_ids[i % len(conversation_ids)]
+        started = time.perf_counter()
+        response = requests.post(
+            f"{base_url}/api/chat/conversations/{conversation_id}/messages",
+            json={'content': f'Pregunta de prueba {i}'},
+            headers=headers,
+            timeout=300
+        )
+        return response.status_code, time.perf_counter() - started
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(send, range(total_requests)))
+    elapsed = time.perf_counter() - started
+
+    latencies = sorted(latency for _, latency in results)
+    ok = sum(1 for status, _ in results if status == 200)
+    return {
+        'ok': ok,
+        'errors': total_requests - ok,
+        'elapsed': elapsed,
+        'throughput': total_requests / elapsed,
+        'p50': latencies[len(latencies) // 2],
+        'p95': latencies[int(len(latencies) * 0.95) - 1],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=100)
+    parser.add_argument('--concurrency', type=int, default=50)
+    parser.add_argument('--latency', type=float, default=0.5, help='Latencia simulada de Gemini (s)')
+    parser.add_argument('--modes', default='sync,gevent')
+    parser.add_argument('--gemini-timeout', type=float, help='Plazo por intento de Gemini (GEMINI_TIMEOUT, s)')
+    parser.add_argument('--serve', choices=['sync', 'gevent'], help=argparse.SUPPRESS)
+    parser.add_argument('--port', type=int, default=5055, help=argparse.SUPPRESS)
+    parser.add_argument('--database-url', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args.serve, args.port, args.latency, args.database_url, args.gemini_timeout)
+        return
+
+    print("🎯 PRUEBA DE CARGA: SÍNCRONO vs GEVENT")
+    print(f"   {args.requests} peticiones, {args.concurrency} concurrentes, latencia simulada {args.latency}s")
+    if args.gemini_timeout:
+        print(f"   Plazo por intento de Gemini: {args.gemini_timeout}s")
+
+    for index, mode in enumerate(args.modes.split(',')):
+        port = args.port + index
+        with tempfile.TemporaryDirectory() as tmp:
+            database_url = f"sqlite:///{os.path.join(tmp, 'bench.db')}"
+            command = [
+                sys.executable, __file__, '--serve', mode, '--port', str(port),
+                '--latency', str(args.latency), '--database-url', database_url
+            ]
+            if args.gemini_timeout:
+                command += ['--gemini-timeout', str(args.gemini_timeout)]
+            server = subprocess.Popen(command)
+            try:
+                base_url = f"http://127.0.0.1:{port}"
+                if not wait_until_ready(base_url):
+                    print(f"❌ El servidor {mode} no arrancó")
+                    continue
+                stats = run_load(base_url, args.requests, args.concurrency)
+            finally:
+                server.terminate()
+                server.wait()
+
+        print(f"\n📊 {mode}:")
+        print(f"   OK: {stats['ok']}  Errores: {stats['errors']}")
+        print(f"   Tiempo total: {stats['elapsed']:.2f}s")
+        print(f"   Throughput: {stats['throughput']:.1f} msg/s")
+        print(f"   Latencia p50: {stats['p50']:.3f}s  p95: {stats['p95']:.3f}s")
+
+
+if __name__ == '__main__':
+    main()
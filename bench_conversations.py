@@ -0,0 +1,92 @@
+#!/usr/bin/env python
+"""
+Benchmark: coste de GET /api/chat/conversations según el volumen de mensajes
+
+Crea un usuario con un número fijo de conversaciones y va aumentando el número
+(y tamaño) de mensajes de cada una. Con el contador desnormalizado el tiempo
+y el número de consultas SQL del listado no deberían depender del volumen.
+
+Uso:
+    python bench_conversations.py --conversations 200 --messages 0,10,100,500
+"""
+
+import argparse
+import os
+import tempfile
+import time
+from datetime import datetime
+
+from sqlalchemy import event
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--conversations', type=int, default=200)
+    parser.add_argument('--messages', default='0,10,100,500', help='Mensajes por conversación en cada ronda')
+    parser.add_argument('--message-size', type=int, default=2000, help='Caracteres por mensaje')
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp()
+    os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(tmp, 'bench.db')}"
+
+    from app import create_app, db
+    from app.config import Config
+    from flask_migrate import upgrade
+    from app.models import Conversation, Message
+
+    app = create_app(Config)
+    client = app.test_client()
+
+    with app.app_context():
+        upgrade()
+
+    response = client.post('/api/auth/register', json={'email': 'bench@example.com', 'password': 'bench123'})
+    user_id = response.get_json()['user_id']
+    headers = {'Authorization': f"Bearer {response.get_json()['access_token']}"}
+
+    with app.app_context():
+        now = datetime.utcnow()
+        db.session.execute(Conversation.__table__.insert(), [
+            {'user_id': user_id, 'title': f'Conversación {i}', 'created_at': now, 'updated_at': now}
+            for i in range(args.conversations)
+        ])
+        db.session.commit()
+        conversation_ids = [c.id for c in Conversation.query.filter_by(user_id=user_id)]
+
+        queries = []
+        event.listen(db.engine, 'before_cursor_execute', lambda *a: queries.append(1))
+
+    print("🎯 BENCHMARK DEL LISTADO DE CONVERSACIONES")
+    print(f"   {args.conversations} conversaciones, mensajes de {args.message_size} caracteres\n")
+
+    current = 0
+    content = 'x' * args.message_size
+    for target in (int(n) for n in args.messages.split(',')):
+        with app.app_context():
+            rows = [
+                {'conversation_id': cid, 'content': content, 'role': 'user', 'timestamp': now}
+                for cid in conversation_ids for _ in range(target - current)
+            ]
+            if rows:
+                db.session.execute(Message.__table__.insert(), rows)
+                Conversation.query.update({
+                    'message_count': target,
+                    'last_message_preview': content[:200]
+                }, synchronize_session=False)
+                db.session.commit()
+        current = target
+
+        queries.clear()
+        started = time.perf_counter()
+        for _ in range(args.repeat):
+            client.get('/api/chat/conversations', headers=headers)
+        elapsed = (time.perf_counter() - started) / args.repeat
+
+        total_messages = target * args.conversations
+        print(f"📊 {total_messages:>8} mensajes: {elapsed * 1000:7.2f} ms/petición, "
+              f"{len(queries) / args.repeat:.0f} consultas SQL/petición")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,161 @@
+#!/usr/bin/env python
+"""
+Benchmark: ráfaga de logins con distintas políticas de hash de contraseñas
+
+Varios clientes hacen POST /api/auth/login sin pausa (como tras un despliegue,
+cuando todos los clientes vuelven a entrar) mientras una sonda pide
+/api/status cada 50 ms para medir cuánto se resiente el resto del tráfico.
+Perfiles:
+
+- default: método por defecto de werkzeug en el propio hilo, sin caché
+- cache: igual, con la caché de verificaciones (logins repetidos)
+- pool: hash en un pool de PASSWORD_HASH_WORKERS procesos, sin caché
+- calibrated: PBKDF2 con las iteraciones de ``calibrate_method(--target-ms)``
+
+Se informa de logins/s, latencias, respuestas 503 (pool lleno) y la latencia
+de la sonda.
+
+Uso:
+    python bench_login.py --clients 8 --users 50 --duration 10
+"""
+
+import argparse
+import os
+import tempfile
+import threading
+import time
+
+
+def percentile(values, fraction):
+    if not values:
+        return 0
+    values = sorted(values)
+    return values[max(0, int(len(values) * fraction) - 1)]
+
+
+def bench_config(profile, database_url, args, method):
+    from app.config import Config
+
+    settings = {
+        'SQLALCHEMY_DATABASE_URI': database_url,
+        'JOB_WORKERS': 0,
+        'PASSWORD_CACHE_ENABLED': profile == 'cache',
+        'PASSWORD_HASH_WORKERS': args.pool_workers if profile == 'pool' else 0,
+        'PASSWORD_HASH_METHOD': method,
+    }
+    return type('BenchConfig', (Config,), settings)
+
+
+def create_users(app, password_hashes):
+    """Un usuario por hash (cada uno con su sal, como en producción)"""
+    from app import db
+    from flask_migrate import upgrade
+    from app.models import User
+
+    with app.app_context():
+        upgrade()
+        db.session.execute(User.__table__.insert(), [
+            {'username': f'login{i}', 'email': f'login{i}@example.com', 'password_hash': password_hash, 'is_active': True}
+            for i, password_hash in enumerate(password_hashes)
+        ])
+        db.session.commit()
+
+
+def run_profile(profile, args, method, password_hashes):
+    from app import create_app, password_hasher
+
+    with tempfile.TemporaryDirectory() as tmp:
+        database_url = f"sqlite:///{os.path.join(tmp, 'bench.db')}"
+        app = create_app(bench_config(profile, database_url, args, method))
+        create_users(app, password_hashes)
+        password_hasher.reset_stats()
+
+        latencies, probes = [], []
+        counts = {'ok': 0, 'busy': 0, 'errors': 0}
+        lock = threading.Lock()
+        deadline = time.perf_counter() + args.duration
+
+        def login_loop(index):
+            client = app.test_client()
+            sent = 0
+            while time.perf_counter() < deadline:
+                user = (index + sent * args.clients) % args.users
+                started = time.perf_counter()
+                response = client.post('/api/auth/login', json={
+                    'email': f'login{user}@example.com', 'password': 'bench123'
+                })
+                elapsed = time.perf_counter() - started
+                sent += 1
+                with lock:
+                    if response.status_code == 200:
+                        counts['ok'] += 1
+                    elif response.status_code == 503:
+                        counts['busy'] += 1
+                    else:
+                        counts['errors'] += 1
+                    latencies.append(elapsed)
+
+        def probe_loop():
+            client = app.test_client()
+            while time.perf_counter() < deadline:
+                started = time.perf_counter()
+                client.get('/api/status')
+                probes.append(time.perf_counter() - started)
+                time.sleep(0.05)
+
+        threads = [threading.Thread(target=login_loop, args=(i,)) for i in range(args.clients)]
+        threads.append(threading.Thread(target=probe_loop))
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        stats = password_hasher.stats()
+        password_hasher.shutdown()
+
+    return {
+        'method': stats['method'],
+        'ok': counts['ok'],
+        'busy': counts['busy'],
+        'errors': counts['errors'],
+        'logins_per_second': counts['ok'] / args.duration,
+        'p50': percentile(latencies, 0.5),
+        'p95': percentile(latencies, 0.95),
+        'probe_p95': percentile(probes, 0.95),
+        'cache_hits': stats['cache_hits'],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--clients', type=int, default=8, help='Clientes haciendo login a la vez')
+    parser.add_argument('--users', type=int, default=50, help='Usuarios distintos')
+    parser.add_argument('--duration', type=float, default=10.0, help='Segundos de carga por perfil')
+    parser.add_argument('--pool-workers', type=int, default=os.cpu_count() or 2, help='Procesos del perfil pool')
+    parser.add_argument('--target-ms', type=float, default=50.0, help='Tiempo por hash del perfil calibrated')
+    parser.add_argument('--profiles', default='default,cache,pool,calibrated')
+    args = parser.parse_args()
+
+    print("🎯 BENCHMARK DE LOGIN")
+    print(f"   {args.clients} clientes, {args.users} usuarios, {args.duration:.0f}s por perfil, {os.cpu_count()} CPU")
+
+    from werkzeug.security import generate_password_hash
+    from app.passwords import calibrate_method
+
+    # Hashes de los usuarios con el método de cada perfil (se reutilizan entre perfiles)
+    hashes = {}
+    for profile in args.profiles.split(','):
+        method = calibrate_method(args.target_ms) if profile == 'calibrated' else 'pbkdf2'
+        if method not in hashes:
+            hashes[method] = [generate_password_hash('bench123', method=method) for _ in range(args.users)]
+        stats = run_profile(profile, args, method, hashes[method])
+        print(f"\n📊 {profile} ({stats['method']}):")
+        print(f"   Logins OK: {stats['ok']}  503: {stats['busy']}  Errores: {stats['errors']}")
+        print(f"   Throughput: {stats['logins_per_second']:.1f} logins/s")
+        print(f"   Latencia p50: {stats['p50'] * 1000:.1f} ms  p95: {stats['p95'] * 1000:.1f} ms")
+        print(f"   /api/status p95 durante la ráfaga: {stats['probe_p95'] * 1000:.1f} ms")
+        print(f"   Aciertos de caché: {stats['cache_hits']}")
+
+
+if __name__ == '__main__':
+    main()
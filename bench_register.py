@@ -0,0 +1,122 @@
+#!/usr/bin/env python
+"""
+Benchmark: asignación de usernames en el registro a medida que crecen los usuarios
+
+Registra usuarios cuyos emails repiten unos pocos prefijos populares
+(info@, admin@, contact@... en dominios distintos) y compara dos estrategias:
+
+- legacy: la de antes, probar ``base``, ``base1``, ``base2``... con una
+  consulta por candidato hasta encontrar uno libre
+- counter: ``add_user``, que reserva el sufijo con un UPSERT en
+  ``username_counters`` (una sentencia por registro)
+
+Mide solo la asignación y el INSERT (el hash de la contraseña se calcula una
+vez y se reutiliza), con un commit por usuario como en POST /api/auth/register.
+Se informa del ritmo de registros por tramos del 10% para ver si decae con
+el número de usuarios existentes. La estrategia legacy crece de forma
+cuadrática, por eso usa menos usuarios por defecto.
+
+Uso:
+    python bench_register.py --users 100000 --legacy-users 5000
+"""
+
+import argparse
+import os
+import random
+import tempfile
+import time
+
+POPULAR_PREFIXES = ['info', 'admin', 'contact', 'sales', 'hello', 'support', 'office', 'mail']
+
+
+def make_emails(count, popular_share, seed=1):
+    rng = random.Random(seed)
+    emails = []
+    for i in range(count):
+        if rng.random() < popular_share:
+            emails.append(f'{rng.choice(POPULAR_PREFIXES)}@domain{i}.example.com')
+        else:
+            emails.append(f'user{i}.{rng.randrange(10 ** 6)}@example.com')
+    return emails
+
+
+def legacy_username(email):
+    """Estrategia anterior: una consulta por candidato"""
+    from app.models import User
+
+    username = email.split('@')[0]
+    counter = 1
+    original_username = username
+    while User.query.filter_by(username=username).first():
+        username = f"{original_username}{counter}"
+        counter += 1
+    return username
+
+
+def run_strategy(strategy, count, args):
+    from werkzeug.security import generate_password_hash
+    from app import create_app, db
+    from app.config import Config
+    from flask_migrate import downgrade, upgrade
+    from app.models import User
+    from app.usernames import add_user
+
+    password_hash = generate_password_hash('bench123')
+    emails = make_emails(count, args.popular_share)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        config = type('BenchConfig', (Config,), {
+            'SQLALCHEMY_DATABASE_URI': args.database_url or f"sqlite:///{os.path.join(tmp, 'bench.db')}",
+            'JOB_WORKERS': 0,
+        })
+        app = create_app(config)
+        with app.app_context():
+            if args.database_url:
+                downgrade(revision='base')
+            upgrade()
+
+            slices = []
+            slice_size = max(1, count // 10)
+            started = slice_started = time.perf_counter()
+            for i, email in enumerate(emails, start=1):
+                user = User(email=email, password_hash=password_hash)
+                if strategy == 'legacy':
+                    user.username = legacy_username(email)
+                    db.session.add(user)
+                else:
+                    add_user(user)
+                db.session.commit()
+
+                if i % slice_size == 0 or i == count:
+                    now = time.perf_counter()
+                    slices.append((i, (i - (len(slices) * slice_size)) / (now - slice_started)))
+                    slice_started = now
+            elapsed = time.perf_counter() - started
+
+            distinct = db.session.query(User.username).distinct().count()
+
+    return {'elapsed': elapsed, 'rate': count / elapsed, 'slices': slices, 'distinct': distinct}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', type=int, default=100000, help='Registros con la estrategia counter')
+    parser.add_argument('--legacy-users', type=int, default=5000, help='Registros con la estrategia legacy')
+    parser.add_argument('--popular-share', type=float, default=0.5, help='Fracción de emails con prefijo popular')
+    parser.add_argument('--database-url', help='Base de datos (por defecto un SQLite temporal)')
+    parser.add_argument('--strategies', default='legacy,counter')
+    args = parser.parse_args()
+
+    print("🎯 BENCHMARK DE REGISTRO DE USUARIOS")
+    print(f"   {args.popular_share:.0%} de emails con {len(POPULAR_PREFIXES)} prefijos populares")
+
+    for strategy in args.strategies.split(','):
+        count = args.legacy_users if strategy == 'legacy' else args.users
+        stats = run_strategy(strategy, count, args)
+        print(f"\n📊 {strategy}: {count} usuarios en {stats['elapsed']:.1f}s ({stats['rate']:.0f} registros/s)")
+        print(f"   Usernames distintos: {stats['distinct']}")
+        print("   Registros/s por tramo: " + '  '.join(f"{rate:.0f}" for _, rate in stats['slices']))
+
+
+if __name__ == '__main__':
+    main()
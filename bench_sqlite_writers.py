@@ -0,0 +1,157 @@
+#!/usr/bin/env python
+"""
+Benchmark: escrituras concurrentes en SQLite con y sin el perfil de producción
+
+Lanza varios procesos (como los workers de gunicorn) que envían mensajes sin
+pausa a POST /api/chat/conversations/<id>/messages contra el mismo fichero
+SQLite, con Gemini sustituido por un modelo falso instantáneo. Cada mensaje
+escribe el turno del usuario y la respuesta, así que el cuello de botella es
+la base de datos. Se compara la configuración por defecto (journal DELETE,
+synchronous FULL) con la de ProductionConfig (WAL, synchronous NORMAL, mmap,
+caché y busy_timeout) y se informa de mensajes/s sostenidos y errores
+("database is locked").
+
+Uso:
+    python bench_sqlite_writers.py --workers 4 --threads 2 --duration 10
+"""
+
+import argparse
+import multiprocessing
+import os
+import tempfile
+import time
+
+
+def bench_config(profile, database_url):
+    """Configuración del perfil indicado apuntando a la base de datos temporal"""
+    from app.config import Config, ProductionConfig
+
+    base = ProductionConfig if profile == 'production' else Config
+    return type('BenchConfig', (base,), {
+        'SQLALCHEMY_DATABASE_URI': database_url,
+        'RATE_LIMIT_ENABLED': False,
+        'JOB_WORKERS': 0,
+    })
+
+
+def setup(profile, database_url):
+    """Crear el esquema (se ejecuta en un proceso aparte)"""
+    from app import create_app
+    from flask_migrate import upgrade
+
+    app = create_app(bench_config(profile, database_url))
+    with app.app_context():
+        upgrade()
+
+
+def worker(profile, database_url, index, threads, duration, barrier, results):
+    """Un worker: ``threads`` clientes enviando mensajes hasta agotar el tiempo"""
+    import threading
+    from app import create_app
+    from app.fake_gemini import FakeGeminiModel
+
+    app = create_app(bench_config(profile, database_url))
+    app.extensions['model_registry'].use_model(FakeGeminiModel(latency=0))
+
+    client = app.test_client()
+    response = client.post('/api/auth/register', json={
+        'email': f'writer{index}@example.com', 'password': 'bench123'
+    })
+    headers = {'Authorization': f"Bearer {response.get_json()['access_token']}"}
+
+    conversation_ids = []
+    for i in range(threads):
+        response = client.post('/api/chat/conversations', json={'title': f'Bench {index}-{i}'}, headers=headers)
+        conversation_ids.append(response.get_json()['conversation']['id'])
+
+    counts = {'ok': 0, 'errors': 0}
+    latencies = []
+    lock = threading.Lock()
+
+    def send_loop(conversation_id, deadline):
+        thread_client = app.test_client()
+        sent = 0
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            response = thread_client.post(
+                f'/api/chat/conversations/{conversation_id}/messages',
+                json={'content': f'Mensaje {sent} del worker {index}'},
+                headers=headers
+            )
+            elapsed = time.perf_counter() - started
+            sent += 1
+            with lock:
+                counts['ok' if response.status_code == 200 else 'errors'] += 1
+                latencies.append(elapsed)
+
+    # Todos los workers empiezan a la vez
+    barrier.wait()
+    deadline = time.perf_counter() + duration
+    pool = [threading.Thread(target=send_loop, args=(cid, deadline)) for cid in conversation_ids]
+    for thread in pool:
+        thread.start()
+    for thread in pool:
+        thread.join()
+
+    results.put((counts['ok'], counts['errors'], latencies))
+
+
+def run_profile(context, profile, args):
+    with tempfile.TemporaryDirectory() as tmp:
+        database_url = f"sqlite:///{os.path.join(tmp, 'bench.db')}"
+
+        process = context.Process(target=setup, args=(profile, database_url))
+        process.start()
+        process.join()
+
+        barrier = context.Barrier(args.workers)
+        results = context.Queue()
+        processes = [
+            context.Process(target=worker, args=(
+                profile, database_url, index, args.threads, args.duration, barrier, results
+            ))
+            for index in range(args.workers)
+        ]
+        for process in processes:
+            process.start()
+        collected = [results.get() for _ in processes]
+        for process in processes:
+            process.join()
+
+    ok = sum(item[0] for item in collected)
+    errors = sum(item[1] for item in collected)
+    latencies = sorted(latency for item in collected for latency in item[2])
+    return {
+        'ok': ok,
+        'errors': errors,
+        # Cada petición correcta guarda dos mensajes (usuario y respuesta)
+        'messages_per_second': ok * 2 / args.duration,
+        'p50': latencies[len(latencies) // 2] if latencies else 0,
+        'p95': latencies[int(len(latencies) * 0.95) - 1] if latencies else 0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--workers', type=int, default=4, help='Procesos escritores')
+    parser.add_argument('--threads', type=int, default=1, help='Clientes por proceso')
+    parser.add_argument('--duration', type=float, default=10.0, help='Segundos de carga por perfil')
+    parser.add_argument('--profiles', default='default,production')
+    args = parser.parse_args()
+
+    # spawn: cada proceso importa la app desde cero, como un worker de gunicorn
+    context = multiprocessing.get_context('spawn')
+
+    print("🎯 BENCHMARK DE ESCRITURAS CONCURRENTES EN SQLITE")
+    print(f"   {args.workers} procesos x {args.threads} clientes, {args.duration:.0f}s por perfil")
+
+    for profile in args.profiles.split(','):
+        stats = run_profile(context, profile, args)
+        print(f"\n📊 {profile}:")
+        print(f"   Peticiones OK: {stats['ok']}  Errores: {stats['errors']}")
+        print(f"   Mensajes guardados: {stats['messages_per_second']:.1f} msg/s")
+        print(f"   Latencia p50: {stats['p50'] * 1000:.1f} ms  p95: {stats['p95'] * 1000:.1f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,46 @@
+"""Configuración de gunicorn
+
+Uso:
+    gunicorn run:app                                  # workers síncronos
+    GUNICORN_WORKER_CLASS=gevent gunicorn run:app     # modo asíncrono
+
+En modo gevent cada worker atiende cientos de conversaciones a la vez: las
+peticiones que esperan a Gemini ceden el control en lugar de bloquear el
+proceso. Para ello la API de Gemini se usa por REST (la librería gRPC no
+coopera con gevent) y se activa la configuración 'gevent' de la app.
+"""
+import multiprocessing
+import os
+
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:5000')
+worker_class = os.environ.get('GUNICORN_WORKER_CLASS', 'sync')
+workers = int(os.environ.get('GUNICORN_WORKERS', multiprocessing.cpu_count() * 2 + 1))
+threads = int(os.environ.get('GUNICORN_THREADS', 1))
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 120))
+
+if worker_class == 'gevent':
+    # Conexiones simultáneas por worker (peticiones en vuelo)
+    worker_connections = int(os.environ.get('GUNICORN_WORKER_CONNECTIONS', 1000))
+    workers = int(os.environ.get('GUNICORN_WORKERS', multiprocessing.cpu_count()))
+    os.environ.setdefault('FLASK_CONFIG', 'gevent')
+    os.environ.setdefault('GEMINI_TRANSPORT', 'rest')
+
+
+def on_starting(server):
+    """Métricas de Prometheus: vaciar el directorio multiproceso de ejecuciones anteriores"""
+    path = os.environ.get('PROMETHEUS_MULTIPROC_DIR')
+    if path:
+        os.makedirs(path, exist_ok=True)
+        for name in os.listdir(path):
+            if name.endswith('.db'):
+                os.remove(os.path.join(path, name))
+
+
+def child_exit(server, worker):
+    """Descartar las métricas de estado (gauges) del worker que termina"""
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        try:
+            from prometheus_client import multiprocess
+        except ImportError:
+            return
+        multiprocess.mark_process_dead(worker.pid)
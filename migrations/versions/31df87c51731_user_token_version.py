@@ -0,0 +1,26 @@
+"""user token version
+
+Versión de los tokens del usuario (revocación y desactivación).
+
+Revision ID: 31df87c51731
+Revises: 3e3f5c5fa082
+Create Date: 2026-10-18 10:40:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '31df87c51731'
+down_revision = '3e3f5c5fa082'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('users', sa.Column('token_version', sa.Integer(), server_default='0', nullable=False))
+
+
+def downgrade():
+    op.drop_column('users', 'token_version')
@@ -0,0 +1,35 @@
+"""conversation archive
+
+Conversaciones inactivas archivadas con sus mensajes comprimidos.
+
+Revision ID: 3e3f5c5fa082
+Revises: 6d1bd0e4f37e
+Create Date: 2026-10-18 10:35:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3e3f5c5fa082'
+down_revision = '6d1bd0e4f37e'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('conversation_archives',
+    sa.Column('conversation_id', sa.Integer(), nullable=False),
+    sa.Column('data', sa.LargeBinary(), nullable=False),
+    sa.Column('message_count', sa.Integer(), nullable=False),
+    sa.Column('archived_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['conversation_id'], ['conversations.id'], ),
+    sa.PrimaryKeyConstraint('conversation_id')
+    )
+    op.add_column('conversations', sa.Column('archived_at', sa.DateTime(), nullable=True))
+
+
+def downgrade():
+    op.drop_column('conversations', 'archived_at')
+    op.drop_table('conversation_archives')
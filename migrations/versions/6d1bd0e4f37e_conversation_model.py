@@ -0,0 +1,26 @@
+"""conversation model
+
+Modelo de Gemini fijado por conversación.
+
+Revision ID: 6d1bd0e4f37e
+Revises: e3768ba6c6dd
+Create Date: 2026-10-18 10:30:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '6d1bd0e4f37e'
+down_revision = 'e3768ba6c6dd'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('conversations', sa.Column('model', sa.String(length=50), nullable=True))
+
+
+def downgrade():
+    op.drop_column('conversations', 'model')
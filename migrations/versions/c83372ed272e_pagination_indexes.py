@@ -0,0 +1,28 @@
+"""pagination indexes
+
+Índices compuestos para la paginación por cursor.
+
+Revision ID: c83372ed272e
+Revises: e1a7a3973a99
+Create Date: 2026-10-18 10:20:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c83372ed272e'
+down_revision = 'e1a7a3973a99'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_conversations_user_updated_id', 'conversations', ['user_id', 'updated_at', 'id'], unique=False)
+    op.create_index('ix_messages_conversation_timestamp_id', 'messages', ['conversation_id', 'timestamp', 'id'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_messages_conversation_timestamp_id', table_name='messages')
+    op.drop_index('ix_conversations_user_updated_id', table_name='conversations')
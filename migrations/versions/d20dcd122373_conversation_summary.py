@@ -0,0 +1,28 @@
+"""conversation summary
+
+Resumen incremental de los turnos que salen de la ventana de contexto.
+
+Revision ID: d20dcd122373
+Revises: c3cf6d91441b
+Create Date: 2026-10-18 10:05:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd20dcd122373'
+down_revision = 'c3cf6d91441b'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('conversations', sa.Column('summary', sa.Text(), nullable=True))
+    op.add_column('conversations', sa.Column('summary_until_id', sa.Integer(), server_default='0', nullable=False))
+
+
+def downgrade():
+    op.drop_column('conversations', 'summary_until_id')
+    op.drop_column('conversations', 'summary')
@@ -0,0 +1,34 @@
+"""username counters
+
+Contadores de sufijos de username, inicializados a partir de los usernames
+ya asignados.
+
+Revision ID: d2b27c5c595f
+Revises: 31df87c51731
+Create Date: 2026-10-18 10:45:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd2b27c5c595f'
+down_revision = '31df87c51731'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    from app.usernames import backfill_counters
+
+    op.create_table('username_counters',
+    sa.Column('base', sa.String(length=80), nullable=False),
+    sa.Column('last_suffix', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('base')
+    )
+    backfill_counters(op.get_bind())
+
+
+def downgrade():
+    op.drop_table('username_counters')
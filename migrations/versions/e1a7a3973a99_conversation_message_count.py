@@ -0,0 +1,41 @@
+"""conversation message count
+
+Contador de mensajes y vista previa desnormalizados en conversations; las
+filas existentes se rellenan con una sola consulta agregada.
+
+Revision ID: e1a7a3973a99
+Revises: f7f93e85785b
+Create Date: 2026-10-18 10:15:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e1a7a3973a99'
+down_revision = 'f7f93e85785b'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('conversations', sa.Column('message_count', sa.Integer(), server_default='0', nullable=False))
+    op.add_column('conversations', sa.Column('last_message_preview', sa.String(length=200), nullable=True))
+
+    op.execute("""
+        UPDATE conversations SET
+            message_count = (
+                SELECT COUNT(*) FROM messages WHERE messages.conversation_id = conversations.id
+            ),
+            last_message_preview = (
+                SELECT SUBSTR(content, 1, 200) FROM messages
+                WHERE messages.conversation_id = conversations.id
+                ORDER BY messages.id DESC LIMIT 1
+            )
+    """)
+
+
+def downgrade():
+    op.drop_column('conversations', 'last_message_preview')
+    op.drop_column('conversations', 'message_count')
@@ -0,0 +1,62 @@
+"""message search index
+
+Índice de búsqueda de texto completo (FTS5) sincronizado con triggers. Solo
+en SQLite; con otros motores la búsqueda usa ILIKE.
+
+Revision ID: e3768ba6c6dd
+Revises: c83372ed272e
+Create Date: 2026-10-18 10:25:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e3768ba6c6dd'
+down_revision = 'c83372ed272e'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    if op.get_bind().dialect.name != 'sqlite':
+        return
+
+    # owner = 'u<user_id>' permite filtrar por usuario dentro del propio índice
+    op.execute("""
+        CREATE VIRTUAL TABLE messages_fts USING fts5(
+            content, owner, tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3'
+        )
+    """)
+    op.execute("""
+        INSERT INTO messages_fts (rowid, content, owner)
+        SELECT m.id, m.content, 'u' || c.user_id
+        FROM messages m JOIN conversations c ON c.id = m.conversation_id
+    """)
+    op.execute("""
+        CREATE TRIGGER messages_fts_insert AFTER INSERT ON messages BEGIN
+            INSERT INTO messages_fts (rowid, content, owner)
+            SELECT new.id, new.content, 'u' || c.user_id FROM conversations c WHERE c.id = new.conversation_id;
+        END
+    """)
+    op.execute("""
+        CREATE TRIGGER messages_fts_delete AFTER DELETE ON messages BEGIN
+            DELETE FROM messages_fts WHERE rowid = old.id;
+        END
+    """)
+    op.execute("""
+        CREATE TRIGGER messages_fts_update AFTER UPDATE OF content ON messages BEGIN
+            UPDATE messages_fts SET content = new.content WHERE rowid = old.id;
+        END
+    """)
+
+
+def downgrade():
+    if op.get_bind().dialect.name != 'sqlite':
+        return
+
+    op.execute('DROP TRIGGER IF EXISTS messages_fts_update')
+    op.execute('DROP TRIGGER IF EXISTS messages_fts_delete')
+    op.execute('DROP TRIGGER IF EXISTS messages_fts_insert')
+    op.execute('DROP TABLE IF EXISTS messages_fts')
@@ -1,12 +1,18 @@
+import json
 import os
+import sys
+import click
 from dotenv import load_dotenv
-from app import create_app, db
-from app.models import User, Conversation, Message
 
-# Cargar variables de entorno
+# Cargar variables de entorno (antes de importar la configuración)
 load_dotenv()
 
-app = create_app()
+from app import create_app, db
+from app.config import config_by_name
+from flask_migrate import downgrade, upgrade
+from app.models import User, Conversation, Message
+
+app = create_app(config_by_name[os.environ.get('FLASK_CONFIG', 'default')])
 
 @app.shell_context_processor
 def make_shell_context():
@@ -20,22 +26,163 @@ def make_shell_context():
 
 @app.cli.command()
 def create_db():
-    """Crear todas las tablas de la base de datos"""
-    db.create_all()
+    """Crear todas las tablas de la base de datos (equivale a ``flask db upgrade``)"""
+    upgrade()
     print("Database tables created successfully!")
 
 @app.cli.command()
 def drop_db():
-    """Eliminar todas las tablas de la base de datos"""
-    db.drop_all()
+    """Eliminar todas las tablas de la base de datos (deshaciendo las migraciones)"""
+    downgrade(revision='base')
     print("Database tables dropped successfully!")
 
 @app.cli.command()
 def reset_db():
     """Resetear la base de datos"""
-    db.drop_all()
-    db.create_all()
+    downgrade(revision='base')
+    upgrade()
     print("Database reset successfully!")
 
+@app.cli.command('batch-messages')
+@click.argument('input_file', type=click.File('r', encoding='utf-8'))
+@click.option('--email', required=True, help='Usuario en cuyo nombre se envían los mensajes')
+@click.option('--concurrency', type=int, default=None, help='Llamadas simultáneas a Gemini')
+@click.option('--output', type=click.File('w', encoding='utf-8'), default='-', help='Fichero NDJSON de resultados')
+def batch_messages(input_file, email, concurrency, output):
+    """Enviar en bloque los prompts de un fichero JSONL
+
+    Cada línea es un elemento como los de POST /api/chat/batch, por ejemplo
+    {"conversation_id": 1, "content": "..."}. Los resultados se escriben en
+    NDJSON a medida que se guardan.
+    """
+    from marshmallow import ValidationError
+    from app.batch import run_batch, ndjson_lines
+    from app.schemas import BatchItemSchema
+    
+    user = User.query.filter_by(email=email).first()
+    if user is None:
+        raise click.ClickException(f'User not found: {email}')
+    
+    schema = BatchItemSchema()
+    try:
+        items = [schema.load(json.loads(line)) for line in input_file if line.strip()]
+    except (ValueError, ValidationError) as e:
+        raise click.ClickException(f'Invalid input: {e}')
+    
+    # Trocear en lotes del tamaño máximo permitido
+    max_items = app.config['BATCH_MAX_ITEMS']
+    for start in range(0, len(items), max_items):
+        for line in ndjson_lines(run_batch(user.id, items[start:start + max_items], concurrency)):
+            output.write(line)
+            output.flush()
+    
+    print(f"Processed {len(items)} prompts", file=sys.stderr)
+
+@app.cli.command('export-conversations')
+@click.argument('output_file', type=click.Path(dir_okay=False, writable=True))
+@click.option('--email', default=None, help='Exportar solo las conversaciones de este usuario')
+@click.option('--compression', type=click.Choice(['auto', 'gzip', 'zstd', 'none']), default='auto',
+              help='Por defecto según la extensión (.gz, .zst)')
+def export_conversations(output_file, email, compression):
+    """Exportar conversaciones y mensajes a JSONL (todos los usuarios o uno)"""
+    from app.export import compression_from_filename, export_chunks, export_records
+    
+    user_id = None
+    if email:
+        user = User.query.filter_by(email=email).first()
+        if user is None:
+            raise click.ClickException(f'User not found: {email}')
+        user_id = user.id
+    
+    if compression == 'auto':
+        compression = compression_from_filename(output_file)
+    
+    records = {'conversation': 0, 'message': 0}
+    
+    def counted():
+        for record in export_records(user_id):
+            if record['type'] in records:
+                records[record['type']] += 1
+            yield record
+    
+    try:
+        with open(output_file, 'wb') as f:
+            for chunk in export_chunks(counted(), compression):
+                f.write(chunk)
+    except ValueError as e:
+        raise click.ClickException(str(e))
+    
+    print(f"Exported {records['conversation']} conversations and {records['message']} messages to {output_file}")
+
+@app.cli.command('import-conversations')
+@click.argument('input_file', type=click.Path(exists=True, dir_okay=False))
+@click.option('--email', default=None, help='Asignar todo a este usuario (si no, se usa el email de cada conversación)')
+@click.option('--batch-size', type=int, default=None, help='Filas por commit (IMPORT_BATCH_SIZE)')
+def import_conversations(input_file, email, batch_size):
+    """Importar un fichero de export-conversations (JSONL, .gz o .zst)"""
+    from app.export import import_records, open_import_file, read_records
+    
+    user_id = None
+    if email:
+        user = User.query.filter_by(email=email).first()
+        if user is None:
+            raise click.ClickException(f'User not found: {email}')
+        user_id = user.id
+    
+    try:
+        with open_import_file(input_file) as f:
+            stats = import_records(read_records(f), user_id, batch_size)
+    except ValueError as e:
+        db.session.rollback()
+        raise click.ClickException(str(e))
+    
+    print(f"Imported {stats['conversations']} conversations and {stats['messages']} messages "
+          f"({stats['skipped']} records skipped)")
+
+@app.cli.command('archive-conversations')
+@click.option('--days', type=int, default=None, help='Días sin actividad (ARCHIVE_AFTER_DAYS)')
+@click.option('--batch-size', type=int, default=None, help='Conversaciones por transacción (ARCHIVE_BATCH_SIZE)')
+@click.option('--limit', type=int, default=None, help='Máximo de conversaciones en esta ejecución')
+@click.option('--pause', type=float, default=0.0, help='Segundos de espera entre lotes')
+def archive_conversations(days, batch_size, limit, pause):
+    """Archivar las conversaciones inactivas (por lotes, sin bloqueos largos)"""
+    from app.archive import archive_conversations as run_archive
+    
+    totals = run_archive(days, batch_size, limit, pause)
+    print(f"Archived {totals['conversations']} conversations ({totals['messages']} messages) "
+          f"in {totals['batches']} batches")
+
+@app.cli.command('import-users')
+@click.argument('input_file', type=click.Path(exists=True, dir_okay=False))
+@click.option('--batch-size', type=int, default=1000, help='Usuarios por transacción')
+def import_users(input_file, batch_size):
+    """Crear usuarios desde un CSV con columnas email y password (o password_hash)"""
+    import csv
+    from app.usernames import import_users as run_import
+    
+    with open(input_file, newline='', encoding='utf-8') as f:
+        stats = run_import(csv.DictReader(f), batch_size)
+    print(f"Imported {stats['imported']} users ({stats['skipped']} skipped)")
+
+@app.cli.command('calibrate-password-hash')
+@click.option('--target-ms', type=float, default=100.0, help='Tiempo objetivo por hash en milisegundos')
+def calibrate_password_hash(target_ms):
+    """Proponer un PASSWORD_HASH_METHOD para el tiempo objetivo en esta máquina"""
+    import time
+    from werkzeug.security import generate_password_hash
+    from app.passwords import calibrate_method, normalize_method
+    
+    method = calibrate_method(target_ms)
+    started = time.perf_counter()
+    generate_password_hash('calibration', method=method)
+    elapsed = (time.perf_counter() - started) * 1000
+    
+    print(f"Current: {normalize_method(app.config['PASSWORD_HASH_METHOD'] or 'pbkdf2')}")
+    print(f"Suggested: PASSWORD_HASH_METHOD={method} ({elapsed:.0f} ms per hash)")
+
 if __name__ == '__main__':
+    # Asegurar que el esquema está al día antes de arrancar
+    with app.app_context():
+        upgrade()
+    
     app.run(debug=True, host='0.0.0.0', port=5000) 
\ No newline at end of file
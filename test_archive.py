@@ -0,0 +1,78 @@
+#!/usr/bin/env python
+"""
+Pruebas del archivo de conversaciones inactivas con el modelo local
+simulado (no necesitan la API en marcha ni API key). Se pueden ejecutar con
+pytest o directamente: python test_archive.py
+"""
+
+from app import db
+from app.archive import archive_conversations
+from app.fake_gemini import FakeGeminiModel
+from app.models import Conversation
+from test_chat import auth_headers, make_app
+from test_export import OLD_DATE, contents, conversation_with_messages, make_inactive
+
+def print_separator(title):
+    print(f"\n{'='*50}")
+    print(f"🧪 {title}")
+    print('='*50)
+
+def test_archive_and_restore():
+    """Las conversaciones inactivas se archivan y vuelven intactas al abrirlas"""
+    print_separator("ARCHIVO Y RESTAURACIÓN")
+    app = make_app(FakeGeminiModel(reply='ok'))
+    client = app.test_client()
+    headers = auth_headers(client)
+    inactive_id = conversation_with_messages(client, headers, ['viejo 1', 'viejo 2'])
+    active_id = conversation_with_messages(client, headers, ['reciente'])
+
+    with app.app_context():
+        make_inactive(inactive_id)
+        expected = contents(inactive_id)
+
+        totals = archive_conversations(days=90, batch_size=10)
+        print(f"Archivado: {totals}")
+        assert totals == {'conversations': 1, 'messages': 4, 'batches': 1}
+        assert contents(inactive_id) == []
+        assert len(contents(active_id)) == 2
+        assert db.session.get(Conversation, inactive_id).archived_at is not None
+
+    # El listado no cambia y al abrirla los mensajes vuelven a la tabla
+    listed = client.get('/api/chat/conversations', headers=headers).get_json()['conversations']
+    assert {conversation['id']: conversation['message_count'] for conversation in listed}[inactive_id] == 4
+    messages = client.get(f'/api/chat/conversations/{inactive_id}/messages', headers=headers).get_json()['messages']
+    assert [(m['role'], m['content']) for m in messages] == expected
+
+    with app.app_context():
+        conversation = db.session.get(Conversation, inactive_id)
+        assert conversation.archived_at is None
+        assert conversation.updated_at == OLD_DATE
+        assert contents(inactive_id) == expected
+
+def main():
+    """Ejecutar todas las pruebas"""
+    print("🎯 PRUEBAS DEL ARCHIVO")
+
+    tests = [
+        ("Archivo y restauración", test_archive_and_restore),
+    ]
+
+    results = []
+    for name, test in tests:
+        try:
+            test()
+            results.append((name, True))
+        except AssertionError as e:
+            print(f"❌ Error: {e}")
+            results.append((name, False))
+
+    print_separator("RESUMEN DE PRUEBAS")
+    for test_name, result in results:
+        status = "✅ PASS" if result else "❌ FAIL"
+        print(f"{test_name}: {status}")
+
+    passed_tests = sum(1 for _, result in results if result)
+    print(f"\n📊 Resultado: {passed_tests}/{len(results)} pruebas pasaron")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+#!/usr/bin/env python
+"""
+Pruebas del envío de mensajes por lotes con el modelo local simulado (no
+necesitan la API en marcha ni API key). Se pueden ejecutar con pytest o
+directamente: python test_batch.py
+"""
+
+import json
+
+from app.fake_gemini import FakeGeminiModel
+from test_chat import auth_headers, make_app, new_conversation
+
+def print_separator(title):
+    print(f"\n{'='*50}")
+    print(f"🧪 {title}")
+    print('='*50)
+
+def test_batch_returns_ndjson():
+    """El lote devuelve una línea NDJSON por elemento y un resumen al final"""
+    print_separator("LOTES NDJSON")
+    app = make_app(FakeGeminiModel(reply='ok'))
+    client = app.test_client()
+    headers = auth_headers(client)
+    conversation_id = new_conversation(client, headers)
+
+    items = [
+        {'content': 'primero', 'ref': 'a'},
+        {'content': 'segundo', 'ref': 'b', 'conversation_id': conversation_id},
+        {'content': 'tercero', 'ref': 'c', 'conversation_id': 999999}
+    ]
+    response = client.post('/api/chat/batch', json={'items': items}, headers=headers)
+    assert response.status_code == 200
+    assert response.mimetype == 'application/x-ndjson'
+
+    lines = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    for line in lines:
+        print(line)
+    summary = lines.pop()
+    assert summary['done'] is True and summary['ok'] == 2 and summary['errors'] == 1
+
+    by_ref = {line['ref']: line for line in lines}
+    assert sorted(by_ref) == ['a', 'b', 'c']
+    assert by_ref['a']['status'] == 'ok' and by_ref['a']['content'] == 'ok'
+    assert by_ref['b']['status'] == 'ok' and by_ref['b']['conversation_id'] == conversation_id
+    assert by_ref['c']['status'] == 'error'
+
+    messages = client.get(f'/api/chat/conversations/{conversation_id}/messages', headers=headers).get_json()['messages']
+    assert [m['content'] for m in messages] == ['segundo', 'ok']
+
+def test_batch_failure_keeps_user_message():
+    """Si Gemini falla, el elemento es una línea de error y el turno del usuario queda guardado"""
+    print_separator("FALLO EN UN ELEMENTO DEL LOTE")
+    app = make_app(FakeGeminiModel(error_rate=1.0), GEMINI_MAX_RETRIES=0, GEMINI_RETRY_BASE_DELAY=0)
+    client = app.test_client()
+    headers = auth_headers(client)
+    conversation_id = new_conversation(client, headers)
+
+    items = [{'content': 'sin respuesta', 'ref': 'a', 'conversation_id': conversation_id}]
+    response = client.post('/api/chat/batch', json={'items': items}, headers=headers)
+    assert response.status_code == 200
+
+    lines = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    print(lines)
+    assert lines[-1]['done'] is True and lines[-1]['ok'] == 0 and lines[-1]['errors'] == 1
+    error = lines[0]
+    assert error['status'] == 'error' and error['code'] == 503
+    assert error['user_message_id'] is not None
+
+    messages = client.get(f'/api/chat/conversations/{conversation_id}/messages', headers=headers).get_json()['messages']
+    assert [(m['id'], m['content']) for m in messages] == [(error['user_message_id'], 'sin respuesta')]
+    conversation = client.get(f'/api/chat/conversations/{conversation_id}', headers=headers).get_json()['conversation']
+    assert conversation['message_count'] == 1
+
+def main():
+    """Ejecutar todas las pruebas"""
+    print("🎯 PRUEBAS DE LOS LOTES")
+
+    tests = [
+        ("Lotes NDJSON", test_batch_returns_ndjson),
+        ("Fallo en un elemento del lote", test_batch_failure_keeps_user_message),
+    ]
+
+    results = []
+    for name, test in tests:
+        try:
+            test()
+            results.append((name, True))
+        except AssertionError as e:
+            print(f"❌ Error: {e}")
+            results.append((name, False))
+
+    print_separator("RESUMEN DE PRUEBAS")
+    for test_name, result in results:
+        status = "✅ PASS" if result else "❌ FAIL"
+        print(f"{test_name}: {status}")
+
+    passed_tests = sum(1 for _, result in results if result)
+    print(f"\n📊 Resultado: {passed_tests}/{len(results)} pruebas pasaron")
+
+if __name__ == "__main__":
+    main()
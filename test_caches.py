@@ -0,0 +1,151 @@
+#!/usr/bin/env python
+"""
+Pruebas de las cachés de respuestas y semántica (no necesitan la API en
+marcha ni API key). Se pueden ejecutar con pytest o directamente:
+python test_caches.py
+"""
+
+from flask import Flask
+
+from app.cache import ResponseCache
+from app.fake_gemini import FakeGeminiModel
+from app.semantic_cache import HashingEmbedder, SemanticCache
+from test_chat import auth_headers, make_app, new_conversation
+
+def print_separator(title):
+    print(f"\n{'='*50}")
+    print(f"🧪 {title}")
+    print('='*50)
+
+def make_semantic_cache(**overrides):
+    app = Flask(__name__)
+    app.config.update(dict(SEMANTIC_CACHE_ENABLED=True, SEMANTIC_CACHE_MAX_ENTRIES=100, **overrides))
+    return SemanticCache(app)
+
+def test_semantic_cache_reuses_paraphrases():
+    """Una paráfrasis con las mismas palabras clave reutiliza la respuesta"""
+    print_separator("PARÁFRASIS")
+    cache = make_semantic_cache()
+    cache.set('gemini', 'How do I reverse a list in Python?', 'Usa lista[::-1]')
+
+    embed = HashingEmbedder()
+    similarity = float(embed('How do I reverse a list in Python?') @ embed('how can I reverse a list in python'))
+    print(f"Similitud: {similarity:.3f}")
+    assert cache.get('gemini', 'how can I reverse a list in python') == 'Usa lista[::-1]'
+    assert cache.get('gemini', 'reverse a list in python please') == 'Usa lista[::-1]'
+    # Las respuestas no se comparten entre modelos
+    assert cache.get('otro-modelo', 'How do I reverse a list in Python?') is None
+
+def test_semantic_cache_is_order_sensitive():
+    """Las mismas palabras en otro orden (otro significado) no comparten respuesta"""
+    print_separator("ORDEN DE LAS PALABRAS")
+    embed = HashingEmbedder()
+    pairs = [
+        ('convert int to str', 'convert str to int'),
+        ('dog bites man', 'man bites dog'),
+        ('copy config from staging to production', 'copy config from production to staging'),
+    ]
+    cache = make_semantic_cache()
+    for first, second in pairs:
+        similarity = float(embed(first) @ embed(second))
+        print(f"{first!r} / {second!r}: {similarity:.3f}")
+        assert similarity < cache.threshold
+
+        cache.set('gemini', first, f'respuesta a {first}')
+        assert cache.get('gemini', second) is None
+        assert cache.get('gemini', first) == f'respuesta a {first}'
+
+def test_semantic_cache_embedder_with_other_dimension():
+    """Cambiar a un embedding de otra dimensión vacía la caché y sigue funcionando"""
+    print_separator("CAMBIO DE EMBEDDING")
+    cache = make_semantic_cache(SEMANTIC_CACHE_DIM=1024)
+    cache.set('gemini', 'what is a closure', 'respuesta')
+
+    cache.set_embedder(HashingEmbedder(dim=64))
+    assert cache.stats()['entries'] == 0
+    assert cache.get('gemini', 'what is a closure') is None
+    cache.set('gemini', 'what is a closure', 'nueva respuesta')
+    assert cache.get('gemini', 'what is a closure') == 'nueva respuesta'
+
+def ask(client, headers, content):
+    """Primer mensaje de una conversación nueva; devuelve el texto de la respuesta"""
+    conversation_id = new_conversation(client, headers)
+    response = client.post(f'/api/chat/conversations/{conversation_id}/messages',
+                           json={'content': content}, headers=headers)
+    assert response.status_code == 200, response.get_json()
+    return response.get_json()['ai_response']['content']
+
+def test_response_cache_reuses_identical_prompts():
+    """Un prompt idéntico se responde desde la caché sin llamar al modelo"""
+    print_separator("CACHÉ DE RESPUESTAS")
+    model = FakeGeminiModel()
+    app = make_app(model, RESPONSE_CACHE_ENABLED=True)
+    client = app.test_client()
+    headers = auth_headers(client)
+
+    first = ask(client, headers, '¿Qué es un decorador?')
+    second = ask(client, headers, '¿Qué es un decorador?')
+    ask(client, headers, '¿Qué es un generador?')
+
+    stats = client.get('/api/chat/cache/stats', headers=headers).get_json()['response_cache']
+    print(f"Llamadas: {model.calls}, estadísticas: {stats}")
+    assert second == first
+    assert model.calls == 2
+    assert stats['memory_hits'] == 1
+
+def test_response_cache_key_keeps_case():
+    """La clave colapsa los espacios pero distingue mayúsculas"""
+    print_separator("CLAVE DE LA CACHÉ")
+    cache = ResponseCache('RESPONSE_CACHE')
+    key = cache.make_key('gemini-1.5-flash', 'Fix myVar')
+    assert cache.make_key('gemini-1.5-flash', '  Fix \n myVar ') == key
+    assert cache.make_key('gemini-1.5-flash', 'fix myvar') != key
+
+def test_semantic_cache_via_api():
+    """El primer mensaje de otra conversación reutiliza la respuesta de una paráfrasis"""
+    print_separator("CACHÉ SEMÁNTICA EN LA API")
+    model = FakeGeminiModel()
+    app = make_app(model, SEMANTIC_CACHE_ENABLED=True)
+    client = app.test_client()
+    headers = auth_headers(client)
+
+    first = ask(client, headers, 'How do I reverse a list in Python?')
+    second = ask(client, headers, 'how can I reverse a list in python')
+    ask(client, headers, 'convert str to int')
+
+    print(f"Llamadas: {model.calls}")
+    assert second == first
+    assert model.calls == 2
+
+def main():
+    """Ejecutar todas las pruebas"""
+    print("🎯 PRUEBAS DE LAS CACHÉS")
+
+    tests = [
+        ("Paráfrasis", test_semantic_cache_reuses_paraphrases),
+        ("Orden de las palabras", test_semantic_cache_is_order_sensitive),
+        ("Cambio de embedding", test_semantic_cache_embedder_with_other_dimension),
+        ("Caché de respuestas", test_response_cache_reuses_identical_prompts),
+        ("Clave de la caché", test_response_cache_key_keeps_case),
+        ("Caché semántica en la API", test_semantic_cache_via_api),
+    ]
+
+    results = []
+    for name, test in tests:
+        try:
+            test()
+            results.append((name, True))
+        except AssertionError as e:
+            print(f"❌ Error: {e}")
+            results.append((name, False))
+
+    print_separator("RESUMEN DE PRUEBAS")
+    for test_name, result in results:
+        status = "✅ PASS" if result else "❌ FAIL"
+        print(f"{test_name}: {status}")
+
+    passed_tests = sum(1 for _, result in results if result)
+    print(f"\n📊 Resultado: {passed_tests}/{len(results)} pruebas pasaron")
+
+if __name__ == "__main__":
+    main()
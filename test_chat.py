@@ -0,0 +1,105 @@
+#!/usr/bin/env python
+"""
+Pruebas del envío de mensajes en streaming (SSE) con el modelo local simulado
+(no necesitan la API en marcha ni API key). Las demás pruebas de la API usan
+las funciones auxiliares de este script. Se pueden ejecutar con pytest o
+directamente: python test_chat.py
+"""
+
+import json
+
+from app import create_app, db
+from app.config import TestingConfig
+from app.fake_gemini import FakeGeminiModel
+
+def print_separator(title):
+    print(f"\n{'='*50}")
+    print(f"🧪 {title}")
+    print('='*50)
+
+def make_app(model=None, **overrides):
+    """Aplicación de pruebas con base de datos vacía y el modelo simulado"""
+    app = create_app(type('TestConfig', (TestingConfig,), overrides))
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+    if model is not None:
+        app.extensions['model_registry'].use_model(model)
+    return app
+
+def auth_headers(client, email='test@example.com'):
+    response = client.post('/api/auth/register', json={'email': email, 'password': 'secret1'})
+    assert response.status_code == 201, response.get_json()
+    return {'Authorization': f"Bearer {response.get_json()['access_token']}"}
+
+def new_conversation(client, headers):
+    response = client.post('/api/chat/conversations', json={}, headers=headers)
+    assert response.status_code == 201, response.get_json()
+    return response.get_json()['conversation']['id']
+
+def parse_sse(body):
+    """Lista de (evento, datos) de una respuesta Server-Sent Events"""
+    events = []
+    for block in body.strip().split('\n\n'):
+        lines = dict(line.split(': ', 1) for line in block.splitlines())
+        events.append((lines['event'], json.loads(lines['data'])))
+    return events
+
+def test_stream_sends_start_tokens_and_done():
+    """El streaming envía start, los fragmentos y done, y guarda la respuesta"""
+    print_separator("STREAMING SSE")
+    reply = 'uno dos tres cuatro cinco seis siete ocho nueve'
+    app = make_app(FakeGeminiModel(reply=reply, chunk_size=2))
+    client = app.test_client()
+    headers = auth_headers(client)
+    conversation_id = new_conversation(client, headers)
+
+    response = client.post(f'/api/chat/conversations/{conversation_id}/messages?stream=true',
+                           json={'content': 'Cuenta hasta nueve'}, headers=headers)
+    assert response.status_code == 200
+    assert response.mimetype == 'text/event-stream'
+
+    events = parse_sse(response.get_data(as_text=True))
+    names = [name for name, _ in events]
+    print(f"Eventos: {names}")
+    assert names[0] == 'start' and names[-1] == 'done'
+    assert set(names[1:-1]) == {'token'} and len(names) > 3
+    assert events[0][1] == {'conversation_id': conversation_id}
+    assert ''.join(data['text'] for name, data in events if name == 'token') == reply
+
+    done = events[-1][1]
+    assert done['ai_response']['content'] == reply
+    assert done['user_message']['content'] == 'Cuenta hasta nueve'
+
+    # Tras el stream la respuesta está guardada en la conversación
+    messages = client.get(f'/api/chat/conversations/{conversation_id}/messages', headers=headers).get_json()['messages']
+    assert [(m['role'], m['content']) for m in messages] == [('user', 'Cuenta hasta nueve'), ('assistant', reply)]
+    assert messages[1]['id'] == done['ai_response']['id']
+
+def main():
+    """Ejecutar todas las pruebas"""
+    print("🎯 PRUEBAS DEL STREAMING")
+
+    tests = [
+        ("Streaming SSE", test_stream_sends_start_tokens_and_done),
+    ]
+
+    results = []
+    for name, test in tests:
+        try:
+            test()
+            results.append((name, True))
+        except AssertionError as e:
+            print(f"❌ Error: {e}")
+            results.append((name, False))
+
+    print_separator("RESUMEN DE PRUEBAS")
+    for test_name, result in results:
+        status = "✅ PASS" if result else "❌ FAIL"
+        print(f"{test_name}: {status}")
+
+    passed_tests = sum(1 for _, result in results if result)
+    print(f"\n📊 Resultado: {passed_tests}/{len(results)} pruebas pasaron")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+#!/usr/bin/env python
+"""
+Pruebas de la ventana de contexto y el resumen de la conversación con el
+modelo local simulado (no necesitan la API en marcha ni API key). Se pueden
+ejecutar con pytest o directamente: python test_context.py
+"""
+
+from app import db
+from app.fake_gemini import FakeGeminiModel
+from app.models import Conversation
+from test_chat import auth_headers, make_app, new_conversation
+from test_messages import ConnectionCheckingModel
+
+def print_separator(title):
+    print(f"\n{'='*50}")
+    print(f"🧪 {title}")
+    print('='*50)
+
+class RecordingModel(FakeGeminiModel):
+    """Modelo simulado que guarda los prompts y responde a los de resumen"""
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.prompts = []
+        self.summaries = 0
+
+    def _reply_for(self, prompt):
+        if prompt.startswith('Actualiza el resumen'):
+            self.summaries += 1
+            return 'RESUMEN'
+        self.prompts.append(prompt)
+        return super()._reply_for(prompt)
+
+def test_context_window_and_summary():
+    """Solo los mensajes recientes van literales; los anteriores, en el resumen"""
+    print_separator("VENTANA DE CONTEXTO Y RESUMEN")
+    model = RecordingModel(reply='ok')
+    app = make_app(model, CONTEXT_MAX_MESSAGES=4)
+    client = app.test_client()
+    headers = auth_headers(client)
+    conversation_id = new_conversation(client, headers)
+
+    for number in range(6):
+        response = client.post(f'/api/chat/conversations/{conversation_id}/messages',
+                               json={'content': f'mensaje {number}'}, headers=headers)
+        assert response.status_code == 200, response.get_json()
+
+    prompt = model.prompts[-1]
+    print(prompt)
+    assert prompt.startswith('Resumen de la conversación anterior: RESUMEN')
+    assert prompt.endswith('user: mensaje 5')
+    # Como mucho CONTEXT_MAX_MESSAGES mensajes anteriores más el nuevo
+    assert prompt.count('\nuser: ') + prompt.count('\nassistant: ') <= 5
+    assert 'mensaje 0' not in prompt
+
+    with app.app_context():
+        conversation = db.session.get(Conversation, conversation_id)
+        assert conversation.summary == 'RESUMEN'
+        assert conversation.summary_until_id > 0
+
+def test_token_limit_checked_before_summary():
+    """Sin cuota de tokens no se paga el resumen; con cuota se guarda aparte"""
+    print_separator("CUOTA ANTES DEL RESUMEN")
+    model = RecordingModel(reply='ok')
+    # Cada mensaje corto estima ~516 tokens: caben dos y el tercero es 429
+    app = make_app(model, CONTEXT_MAX_MESSAGES=2,
+                   RATE_LIMIT_USER_TOKENS_PER_MINUTE=1, RATE_LIMIT_USER_TOKENS_BURST=1100)
+    client = app.test_client()
+    headers = auth_headers(client)
+    conversation_id = new_conversation(client, headers)
+    url = f'/api/chat/conversations/{conversation_id}/messages'
+
+    for number in range(2):
+        response = client.post(url, json={'content': f'mensaje {number}'}, headers=headers)
+        assert response.status_code == 200, response.get_json()
+
+    # El tercero necesita resumir, pero la cuota se comprueba antes
+    response = client.post(url, json={'content': 'mensaje 2'}, headers=headers)
+    print(f"Sin cuota: {response.status_code}, resúmenes: {model.summaries}")
+    assert response.status_code == 429
+    assert model.summaries == 0
+
+    app.extensions['rate_limiter'].store.clear()
+    response = client.post(url, json={'content': 'mensaje 2'}, headers=headers)
+    assert response.status_code == 200, response.get_json()
+    assert model.summaries == 1
+
+    with app.app_context():
+        conversation = db.session.get(Conversation, conversation_id)
+        assert conversation.summary == 'RESUMEN'
+        assert conversation.message_count == 6
+
+def test_no_connection_held_during_summary():
+    """El resumen tampoco se genera con una conexión (ni transacción) abierta"""
+    print_separator("SIN TRANSACCIÓN DURANTE EL RESUMEN")
+    app = make_app(CONTEXT_MAX_MESSAGES=2)
+    with app.app_context():
+        model = ConnectionCheckingModel(db.engine, reply='ok')
+    app.extensions['model_registry'].use_model(model)
+    client = app.test_client()
+    headers = auth_headers(client)
+    conversation_id = new_conversation(client, headers)
+
+    for number in range(3):
+        response = client.post(f'/api/chat/conversations/{conversation_id}/messages',
+                               json={'content': f'mensaje {number}'}, headers=headers)
+        assert response.status_code == 200, response.get_json()
+
+    print(f"Conexiones en uso durante cada llamada: {model.seen}")
+    # Tres respuestas y un resumen
+    assert model.seen == [0, 0, 0, 0]
+
+def main():
+    """Ejecutar todas las pruebas"""
+    print("🎯 PRUEBAS DEL CONTEXTO")
+
+    tests = [
+        ("Ventana de contexto y resumen", test_context_window_and_summary),
+        ("Cuota antes del resumen", test_token_limit_checked_before_summary),
+        ("Sin transacción durante el resumen", test_no_connection_held_during_summary),
+    ]
+
+    results = []
+    for name, test in tests:
+        try:
+            test()
+            results.append((name, True))
+        except AssertionError as e:
+            print(f"❌ Error: {e}")
+            results.append((name, False))
+
+    print_separator("RESUMEN DE PRUEBAS")
+    for test_name, result in results:
+        status = "✅ PASS" if result else "❌ FAIL"
+        print(f"{test_name}: {status}")
+
+    passed_tests = sum(1 for _, result in results if result)
+    print(f"\n📊 Resultado: {passed_tests}/{len(results)} pruebas pasaron")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+#!/usr/bin/env python
+"""
+Pruebas de la exportación e importación de conversaciones con el modelo
+local simulado (no necesitan la API en marcha ni API key). Se pueden
+ejecutar con pytest o directamente: python test_export.py
+"""
+
+import json
+from datetime import datetime
+
+from sqlalchemy import update
+
+from app import db
+from app.export import export_records, import_records, read_records
+from app.fake_gemini import FakeGeminiModel
+from app.models import Conversation, Message, User
+from test_chat import auth_headers, make_app, new_conversation
+
+OLD_DATE = datetime(2020, 1, 2, 3, 4, 5)
+
+def print_separator(title):
+    print(f"\n{'='*50}")
+    print(f"🧪 {title}")
+    print('='*50)
+
+def conversation_with_messages(client, headers, contents):
+    """Conversación con un intercambio por cada contenido"""
+    conversation_id = new_conversation(client, headers)
+    for content in contents:
+        response = client.post(f'/api/chat/conversations/{conversation_id}/messages',
+                               json={'content': content}, headers=headers)
+        assert response.status_code == 200, response.get_json()
+    return conversation_id
+
+def make_inactive(conversation_id, **values):
+    """Llevar la última actividad de la conversación a OLD_DATE"""
+    conversations = Conversation.__table__
+    db.session.execute(
+        update(conversations).where(conversations.c.id == conversation_id).values(updated_at=OLD_DATE, **values)
+    )
+    db.session.commit()
+
+def contents(conversation_id):
+    return [
+        (message.role, message.content)
+        for message in Message.query.filter_by(conversation_id=conversation_id).order_by(Message.id)
+    ]
+
+def test_export_import_round_trip():
+    """Exportar e importar conserva mensajes, resumen y fechas de la conversación"""
+    print_separator("EXPORTAR E IMPORTAR")
+    app = make_app(FakeGeminiModel(reply='ok'))
+    client = app.test_client()
+    conversation_id = conversation_with_messages(client, auth_headers(client), ['uno', 'dos'])
+    auth_headers(client, 'copia@example.com')
+
+    with app.app_context():
+        boundary = Message.query.filter_by(conversation_id=conversation_id).order_by(Message.id).all()[1]
+        make_inactive(conversation_id, summary='resumen', summary_until_id=boundary.id)
+
+        lines = [json.dumps(record) for record in export_records(User.query.filter_by(email='test@example.com').one().id)]
+        target = User.query.filter_by(email='copia@example.com').one()
+        stats = import_records(read_records(lines), user_id=target.id, batch_size=2)
+        print(f"Importado: {stats}")
+        assert stats == {'conversations': 1, 'messages': 4, 'skipped': 0}
+
+        original = db.session.get(Conversation, conversation_id)
+        copy = Conversation.query.filter_by(user_id=target.id).one()
+        assert copy.id != original.id
+        assert (copy.title, copy.summary, copy.message_count) == (original.title, original.summary, original.message_count)
+        assert copy.created_at == original.created_at
+        assert copy.updated_at == OLD_DATE
+        assert contents(copy.id) == contents(original.id)
+        # El límite del resumen apunta al mismo mensaje con su id nuevo
+        assert db.session.get(Message, copy.summary_until_id).content == boundary.content
+
+def main():
+    """Ejecutar todas las pruebas"""
+    print("🎯 PRUEBAS DE LA EXPORTACIÓN")
+
+    tests = [
+        ("Exportar e importar", test_export_import_round_trip),
+    ]
+
+    results = []
+    for name, test in tests:
+        try:
+            test()
+            results.append((name, True))
+        except AssertionError as e:
+            print(f"❌ Error: {e}")
+            results.append((name, False))
+
+    print_separator("RESUMEN DE PRUEBAS")
+    for test_name, result in results:
+        status = "✅ PASS" if result else "❌ FAIL"
+        print(f"{test_name}: {status}")
+
+    passed_tests = sum(1 for _, result in results if result)
+    print(f"\n📊 Resultado: {passed_tests}/{len(results)} pruebas pasaron")
+
+if __name__ == "__main__":
+    main()
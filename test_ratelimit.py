@@ -0,0 +1,60 @@
+#!/usr/bin/env python
+"""
+Pruebas de las cuotas de peticiones y tokens con el modelo local simulado
+(no necesitan la API en marcha ni API key). Se pueden ejecutar con pytest
+o directamente: python test_ratelimit.py
+"""
+
+from app.fake_gemini import FakeGeminiModel
+from test_chat import auth_headers, make_app, new_conversation
+
+def print_separator(title):
+    print(f"\n{'='*50}")
+    print(f"🧪 {title}")
+    print('='*50)
+
+def test_rate_limit_returns_retry_after():
+    """Al agotar la cuota de peticiones se responde 429 con Retry-After"""
+    print_separator("CUOTA DE PETICIONES")
+    app = make_app(FakeGeminiModel(reply='ok'), RATE_LIMIT_USER_REQUESTS_BURST=2,
+                   RATE_LIMIT_USER_REQUESTS_PER_MINUTE=1)
+    client = app.test_client()
+    headers = auth_headers(client)
+    conversation_id = new_conversation(client, headers)
+
+    statuses = []
+    for number in range(3):
+        response = client.post(f'/api/chat/conversations/{conversation_id}/messages',
+                               json={'content': f'hola {number}'}, headers=headers)
+        statuses.append(response.status_code)
+    print(f"Estados: {statuses}, Retry-After: {response.headers.get('Retry-After')}")
+    assert statuses == [200, 200, 429]
+    assert int(response.headers['Retry-After']) > 0
+
+def main():
+    """Ejecutar todas las pruebas"""
+    print("🎯 PRUEBAS DE LAS CUOTAS")
+
+    tests = [
+        ("Cuota de peticiones", test_rate_limit_returns_retry_after),
+    ]
+
+    results = []
+    for name, test in tests:
+        try:
+            test()
+            results.append((name, True))
+        except AssertionError as e:
+            print(f"❌ Error: {e}")
+            results.append((name, False))
+
+    print_separator("RESUMEN DE PRUEBAS")
+    for test_name, result in results:
+        status = "✅ PASS" if result else "❌ FAIL"
+        print(f"{test_name}: {status}")
+
+    passed_tests = sum(1 for _, result in results if result)
+    print(f"\n📊 Resultado: {passed_tests}/{len(results)} pruebas pasaron")
+
+if __name__ == "__main__":
+    main()
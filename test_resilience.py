@@ -0,0 +1,216 @@
+#!/usr/bin/env python
+"""
+Pruebas del cliente resiliente de Gemini contra el modelo local simulado
+(no necesitan la API en marcha ni API key). Se pueden ejecutar con pytest
+o directamente: python test_resilience.py
+"""
+
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from app.fake_gemini import FakeGeminiModel, FakeUpstreamError
+from app.resilience import CircuitBreaker, CircuitOpenError, ResilientModel, UpstreamError, UpstreamTimeout
+
+EXECUTOR = ThreadPoolExecutor(max_workers=8)
+
+CONFIG = {
+    'GEMINI_TIMEOUT': 0.5,
+    'GEMINI_DEADLINE': 2.0,
+    'GEMINI_MAX_RETRIES': 2,
+    'GEMINI_RETRY_BASE_DELAY': 0.01,
+    'GEMINI_RETRY_MAX_DELAY': 0.05,
+    'GEMINI_HEDGE_DELAY': 0
+}
+
+def print_separator(title):
+    print(f"\n{'='*50}")
+    print(f"🧪 {title}")
+    print('='*50)
+
+def make_client(model, breaker=None, **overrides):
+    config = dict(CONFIG, **overrides)
+    return ResilientModel(model, breaker or CircuitBreaker(min_calls=100), EXECUTOR, config)
+
+def test_retry_transient_errors():
+    """Los errores transitorios (503) se reintentan hasta obtener respuesta"""
+    print_separator("REINTENTOS")
+    model = FakeGeminiModel(reply='hola', fail_times=2)
+    client = make_client(model)
+
+    response = client.generate_content('prompt')
+    print(f"Llamadas: {model.calls}, reintentos: {client.stats['retries']}")
+    assert response.text == 'hola'
+    assert model.calls == 3
+
+def test_non_transient_errors_are_not_retried():
+    """Un error de la petición (400) se propaga sin reintentar"""
+    print_separator("ERRORES NO TRANSITORIOS")
+    model = FakeGeminiModel(fail_times=5, error=lambda: FakeUpstreamError(400, 'Bad request'))
+    client = make_client(model)
+
+    try:
+        client.generate_content('prompt')
+        assert False, 'debería haber fallado'
+    except FakeUpstreamError as e:
+        print(f"Error propagado: {e}")
+        assert e.code == 400
+    assert model.calls == 1
+
+def test_retries_exhausted():
+    """Sin éxito tras los reintentos se lanza UpstreamError (503)"""
+    print_separator("REINTENTOS AGOTADOS")
+    model = FakeGeminiModel(error_rate=1.0)
+    client = make_client(model)
+
+    try:
+        client.generate_content('prompt')
+        assert False, 'debería haber fallado'
+    except UpstreamError as e:
+        print(f"Error: {e} (HTTP {e.code})")
+        assert e.code == 503
+    assert model.calls == CONFIG['GEMINI_MAX_RETRIES'] + 1
+
+def test_timeout():
+    """Una llamada más lenta que el plazo termina en UpstreamTimeout (504)"""
+    print_separator("PLAZO POR LLAMADA")
+    model = FakeGeminiModel(latency=1.0)
+    client = make_client(model, GEMINI_MAX_RETRIES=0)
+
+    started = time.monotonic()
+    try:
+        client.generate_content('prompt')
+        assert False, 'debería haber agotado el plazo'
+    except UpstreamTimeout as e:
+        elapsed = time.monotonic() - started
+        print(f"Plazo agotado en {elapsed:.2f}s (HTTP {e.code})")
+        assert e.code == 504
+        assert elapsed < 0.9
+
+def test_circuit_breaker_opens_and_recovers():
+    """El cortocircuito se abre con muchos errores y se cierra tras una prueba correcta"""
+    print_separator("CORTOCIRCUITO")
+    breaker = CircuitBreaker(window=10, min_calls=4, error_rate=0.5, open_seconds=0.2)
+    model = FakeGeminiModel(reply='ok', error_rate=1.0)
+    client = make_client(model, breaker=breaker, GEMINI_MAX_RETRIES=0)
+
+    for _ in range(4):
+        try:
+            client.generate_content('prompt')
+        except UpstreamError:
+            pass
+    print(f"Estado tras 4 errores: {breaker.state}")
+    assert breaker.state == 'open'
+
+    # Con el circuito abierto se falla al instante sin llamar al modelo
+    calls_before = model.calls
+    try:
+        client.generate_content('prompt')
+        assert False, 'el circuito debería estar abierto'
+    except CircuitOpenError as e:
+        assert e.retry_after is not None
+    assert model.calls == calls_before
+
+    # Tras open_seconds una llamada de prueba correcta cierra el circuito
+    time.sleep(0.25)
+    model.error_rate = 0.0
+    assert client.generate_content('prompt').text == 'ok'
+    print(f"Estado tras la prueba: {breaker.state}")
+    assert breaker.state == 'closed'
+
+def test_hedged_requests_cut_tail_latency():
+    """Con hedging, las llamadas de la cola lenta se cubren con una segunda llamada"""
+    print_separator("HEDGING")
+
+    def p95(client, calls=40):
+        durations = []
+        for _ in range(calls):
+            started = time.monotonic()
+            client.generate_content('prompt')
+            durations.append(time.monotonic() - started)
+        durations.sort()
+        return durations[int(len(durations) * 0.95) - 1]
+
+    slow_tail = dict(latency=0.01, tail_rate=0.2, tail_latency=0.4, seed=7)
+    plain = p95(make_client(FakeGeminiModel(**slow_tail), GEMINI_TIMEOUT=1.0))
+    hedged_client = make_client(FakeGeminiModel(**slow_tail), GEMINI_TIMEOUT=1.0, GEMINI_HEDGE_DELAY=0.05)
+    hedged = p95(hedged_client)
+
+    print(f"p95 sin hedging: {plain*1000:.0f} ms, con hedging: {hedged*1000:.0f} ms "
+          f"({hedged_client.stats['hedges']} llamadas de cobertura)")
+    assert hedged < plain / 2
+
+def test_streaming_retries_before_first_chunk():
+    """En streaming se reintenta si falla antes del primer fragmento"""
+    print_separator("STREAMING")
+    model = FakeGeminiModel(reply='uno dos tres cuatro cinco', chunk_size=2, fail_times=1)
+    client = make_client(model)
+
+    text = ''.join(chunk.text for chunk in client.generate_content('prompt', stream=True))
+    print(f"Texto: {text!r}, llamadas: {model.calls}")
+    assert text == 'uno dos tres cuatro cinco'
+    assert model.calls == 2
+
+def test_send_message_returns_503_when_gemini_fails():
+    """La API responde 503 (no 500) si Gemini no está disponible"""
+    print_separator("API CON GEMINI CAÍDO")
+    from app import create_app, db
+    from app.config import TestingConfig
+
+    class FailingConfig(TestingConfig):
+        GEMINI_RETRY_BASE_DELAY = 0.01
+
+    app = create_app(FailingConfig)
+    with app.app_context():
+        # Con TEST_DATABASE_URL la base de datos persiste entre ejecuciones
+        db.drop_all()
+        db.create_all()
+    app.extensions['model_registry'].use_model(FakeGeminiModel(error_rate=1.0))
+
+    client = app.test_client()
+    token = client.post('/api/auth/register', json={
+        'email': 'resilience@example.com', 'password': 'test123456'
+    }).get_json()['access_token']
+    headers = {'Authorization': f'Bearer {token}'}
+    conversation = client.post('/api/chat/conversations', json={'title': 'Prueba'}, headers=headers).get_json()
+
+    response = client.post(
+        f"/api/chat/conversations/{conversation['conversation']['id']}/messages",
+        json={'content': 'Hola'}, headers=headers
+    )
+    print(f"Status Code: {response.status_code}, Response: {response.get_json()}")
+    assert response.status_code == 503
+
+def main():
+    """Ejecutar todas las pruebas"""
+    print("🎯 PRUEBAS DEL CLIENTE RESILIENTE DE GEMINI")
+
+    tests = [
+        ("Reintentos", test_retry_transient_errors),
+        ("Errores no transitorios", test_non_transient_errors_are_not_retried),
+        ("Reintentos agotados", test_retries_exhausted),
+        ("Plazo por llamada", test_timeout),
+        ("Cortocircuito", test_circuit_breaker_opens_and_recovers),
+        ("Hedging", test_hedged_requests_cut_tail_latency),
+        ("Streaming", test_streaming_retries_before_first_chunk),
+        ("API con Gemini caído", test_send_message_returns_503_when_gemini_fails),
+    ]
+
+    results = []
+    for name, test in tests:
+        try:
+            test()
+            results.append((name, True))
+        except AssertionError as e:
+            print(f"❌ Error: {e}")
+            results.append((name, False))
+
+    print_separator("RESUMEN DE PRUEBAS")
+    for test_name, result in results:
+        status = "✅ PASS" if result else "❌ FAIL"
+        print(f"{test_name}: {status}")
+
+    passed_tests = sum(1 for _, result in results if result)
+    print(f"\n📊 Resultado: {passed_tests}/{len(results)} pruebas pasaron")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+#!/usr/bin/env python
+"""
+Pruebas de la búsqueda de mensajes con el modelo local simulado (no necesitan
+la API en marcha ni API key). Se pueden ejecutar con pytest o directamente:
+python test_search.py
+"""
+
+from app.fake_gemini import FakeGeminiModel
+from test_chat import auth_headers, make_app, new_conversation
+
+def print_separator(title):
+    print(f"\n{'='*50}")
+    print(f"🧪 {title}")
+    print('='*50)
+
+def test_search_result_outside_loaded_page():
+    """Un resultado de una conversación fuera de la primera página se puede abrir por id"""
+    print_separator("RESULTADO FUERA DE LA PÁGINA CARGADA")
+    app = make_app(FakeGeminiModel(reply='ok'))
+    client = app.test_client()
+    headers = auth_headers(client)
+
+    ids = []
+    for content in ('receta de paella', 'horario del tren', 'lista de la compra'):
+        conversation_id = new_conversation(client, headers)
+        response = client.post(f'/api/chat/conversations/{conversation_id}/messages',
+                               json={'content': content}, headers=headers)
+        assert response.status_code == 200, response.get_json()
+        ids.append(conversation_id)
+
+    # La primera página del listado solo tiene la más reciente
+    page = client.get('/api/chat/conversations?limit=1', headers=headers).get_json()
+    assert [c['id'] for c in page['conversations']] == [ids[-1]]
+
+    results = client.get('/api/chat/search?q=paella', headers=headers).get_json()['results']
+    print(f"Resultados: {[(r['conversation_id'], r['snippet']) for r in results]}")
+    assert [r['conversation_id'] for r in results] == [ids[0]]
+
+    response = client.get(f'/api/chat/conversations/{ids[0]}', headers=headers)
+    assert response.status_code == 200
+    conversation = response.get_json()['conversation']
+    assert conversation['id'] == ids[0]
+    assert conversation['message_count'] == 2
+
+    # Solo las conversaciones propias
+    other = auth_headers(client, 'otro@example.com')
+    assert client.get(f'/api/chat/conversations/{ids[0]}', headers=other).status_code == 404
+
+def main():
+    """Ejecutar todas las pruebas"""
+    print("🎯 PRUEBAS DE LA BÚSQUEDA")
+
+    tests = [
+        ("Resultado fuera de la página cargada", test_search_result_outside_loaded_page),
+    ]
+
+    results = []
+    for name, test in tests:
+        try:
+            test()
+            results.append((name, True))
+        except AssertionError as e:
+            print(f"❌ Error: {e}")
+            results.append((name, False))
+
+    print_separator("RESUMEN DE PRUEBAS")
+    for test_name, result in results:
+        status = "✅ PASS" if result else "❌ FAIL"
+        print(f"{test_name}: {status}")
+
+    passed_tests = sum(1 for _, result in results if result)
+    print(f"\n📊 Resultado: {passed_tests}/{len(results)} pruebas pasaron")
+
+if __name__ == "__main__":
+    main()
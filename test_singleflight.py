@@ -0,0 +1,68 @@
+#!/usr/bin/env python
+"""
+Pruebas de las llamadas compartidas a Gemini con el modelo local simulado
+(no necesitan la API en marcha ni API key). Se pueden ejecutar con pytest
+o directamente: python test_singleflight.py
+"""
+
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from flask import Flask
+
+from app.fake_gemini import FakeGeminiModel
+from app.singleflight import SingleFlight
+
+def print_separator(title):
+    print(f"\n{'='*50}")
+    print(f"🧪 {title}")
+    print('='*50)
+
+def test_single_flight_deduplicates_concurrent_calls():
+    """Llamadas simultáneas con la misma clave comparten una sola llamada al modelo"""
+    print_separator("LLAMADAS COMPARTIDAS")
+    app = Flask(__name__)
+    app.config.update(SINGLE_FLIGHT_ENABLED=True)
+    group = SingleFlight(app)
+    model = FakeGeminiModel(reply='compartida', latency=0.3)
+
+    def call(delay):
+        time.sleep(delay)
+        return group.do('clave', lambda: model.generate_content('prompt').text)
+
+    with ThreadPoolExecutor(max_workers=3) as pool:
+        results = list(pool.map(call, [0, 0.05, 0.1]))
+
+    print(f"Resultados: {results}, llamadas: {model.calls}")
+    assert model.calls == 1
+    assert [value for value, _ in results] == ['compartida'] * 3
+    assert sorted(shared for _, shared in results) == [False, True, True]
+    assert group.stats()['upstream_calls'] == 1
+
+def main():
+    """Ejecutar todas las pruebas"""
+    print("🎯 PRUEBAS DE LAS LLAMADAS COMPARTIDAS")
+
+    tests = [
+        ("Llamadas compartidas", test_single_flight_deduplicates_concurrent_calls),
+    ]
+
+    results = []
+    for name, test in tests:
+        try:
+            test()
+            results.append((name, True))
+        except AssertionError as e:
+            print(f"❌ Error: {e}")
+            results.append((name, False))
+
+    print_separator("RESUMEN DE PRUEBAS")
+    for test_name, result in results:
+        status = "✅ PASS" if result else "❌ FAIL"
+        print(f"{test_name}: {status}")
+
+    passed_tests = sum(1 for _, result in results if result)
+    print(f"\n📊 Resultado: {passed_tests}/{len(results)} pruebas pasaron")
+
+if __name__ == "__main__":
+    main()
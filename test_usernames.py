@@ -0,0 +1,76 @@
+#!/usr/bin/env python
+"""
+Pruebas de la asignación de usernames (no necesitan la API en marcha ni
+API key). Se pueden ejecutar con pytest o directamente:
+python test_usernames.py
+"""
+
+from app.models import User
+from app.usernames import import_users
+from test_chat import auth_headers, make_app
+
+def print_separator(title):
+    print(f"\n{'='*50}")
+    print(f"🧪 {title}")
+    print('='*50)
+
+def test_username_allocation():
+    """Los usernames repetidos reciben sufijos y esquivan los ya ocupados"""
+    print_separator("USERNAMES")
+    app = make_app()
+    client = app.test_client()
+
+    for email in ('info@a.com', 'info@b.com', 'info2@c.com', 'info@d.com'):
+        auth_headers(client, email)
+
+    with app.app_context():
+        stats = import_users([
+            {'email': 'info@e.com', 'password': 'secret1'},
+            {'email': 'info@f.com', 'password': 'secret1'},
+            {'email': 'info@a.com', 'password': 'secret1'}
+        ])
+        print(f"Importado: {stats}")
+        assert stats == {'imported': 2, 'skipped': 1}
+
+        usernames = {user.email: user.username for user in User.query}
+        print(usernames)
+        assert usernames == {
+            'info@a.com': 'info',
+            'info@b.com': 'info1',
+            'info2@c.com': 'info2',
+            # info2 ya estaba ocupado: se reserva el siguiente sufijo
+            'info@d.com': 'info3',
+            'info@e.com': 'info4',
+            'info@f.com': 'info5'
+        }
+
+    response = client.post('/api/auth/register', json={'email': 'info@b.com', 'password': 'secret1'})
+    assert response.status_code == 400
+
+def main():
+    """Ejecutar todas las pruebas"""
+    print("🎯 PRUEBAS DE LOS USERNAMES")
+
+    tests = [
+        ("Usernames", test_username_allocation),
+    ]
+
+    results = []
+    for name, test in tests:
+        try:
+            test()
+            results.append((name, True))
+        except AssertionError as e:
+            print(f"❌ Error: {e}")
+            results.append((name, False))
+
+    print_separator("RESUMEN DE PRUEBAS")
+    for test_name, result in results:
+        status = "✅ PASS" if result else "❌ FAIL"
+        print(f"{test_name}: {status}")
+
+    passed_tests = sum(1 for _, result in results if result)
+    print(f"\n📊 Resultado: {passed_tests}/{len(results)} pruebas pasaron")
+
+if __name__ == "__main__":
+    main()